@@ -7,7 +7,7 @@ for different scenarios (Vanilla and Self-Employed applicants).
 """
 
 import pandas as pd
-import numpy as np
+from statistics_engine import results_statistics, scenario_statistics
 from openpyxl import Workbook
 from openpyxl.styles import Font, Border, Side, PatternFill, Alignment
 from openpyxl.utils.dataframe import dataframe_to_rows
@@ -137,21 +137,34 @@ class AffordabilityTool:
         if not valid_amounts:
             return {'average': 0, 'gen_h_diff': 0, 'gen_h_rank': 0}
         
-        # Calculate average
-        average = np.mean(list(valid_amounts.values()))
-        
-        # Gen H specific calculations
-        gen_h_amount = valid_amounts.get('Gen H', 0)
-        gen_h_diff = gen_h_amount - average
-        
-        # Calculate rank (1 = highest amount)
-        sorted_amounts = sorted(valid_amounts.values(), reverse=True)
-        gen_h_rank = sorted_amounts.index(gen_h_amount) + 1 if gen_h_amount in sorted_amounts else len(sorted_amounts)
+        stats = scenario_statistics(valid_amounts)
+        return {
+            'average': stats['average'],
+            'gen_h_diff': stats['gen_h_amount'] - stats['average'],
+            'gen_h_rank': stats['gen_h_rank']
+        }
+    
+    def calculate_run_statistics(self, borrowing_data: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        """
+        calculate_statistics for every scenario at once.
         
+        Args:
+            borrowing_data: Dictionary of scenario ID to lender amounts
+            
+        Returns:
+            Dictionary of scenario ID to calculated statistics
+        """
+        all_stats = results_statistics({
+            scenario_id: {'lender_results': {k: float(v) for k, v in amounts.items() if v is not None and v != ''}}
+            for scenario_id, amounts in borrowing_data.items()
+        })
         return {
-            'average': average,
-            'gen_h_diff': gen_h_diff,
-            'gen_h_rank': gen_h_rank
+            scenario_id: {
+                'average': stats['average'],
+                'gen_h_diff': stats['gen_h_amount'] - stats['average'],
+                'gen_h_rank': stats['gen_h_rank']
+            }
+            for scenario_id, stats in all_stats.items()
         }
     
     def create_results_dataframe(self, scenario_type: str) -> pd.DataFrame:
@@ -169,6 +182,7 @@ class AffordabilityTool:
         
         scenarios = self.scenarios[scenario_type]
         data = []
+        all_stats = self.calculate_run_statistics(self.borrowing_data[scenario_type])
         
         for scenario in scenarios:
             scenario_id = scenario['id']
@@ -176,7 +190,7 @@ class AffordabilityTool:
                 continue
             
             amounts = self.borrowing_data[scenario_type][scenario_id]
-            stats = self.calculate_statistics(amounts)
+            stats = all_stats[scenario_id]
             
             # Create row data
             row = {
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark lender result persistence: legacy per-row path vs transactional bulk writes
+Usage: python3 benchmark_history_writes.py [--scenarios 64 10000] [--lenders 23]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date
+
+from history_database import DatabaseManager
+
+SOURCE_DB = "mbt_affordability_history.db"
+
+
+def make_results(scenario_count, lender_count):
+    """Build a synthetic results dict in the automation results file shape."""
+    results = {}
+    for i in range(scenario_count):
+        lenders = {f"Lender {j}": 100000 + ((i * 7919 + j * 104729) % 250000) for j in range(lender_count)}
+        lenders["Gen H"] = 100000 + (i * 31 % 250000)
+        amounts = sorted(lenders.values(), reverse=True)
+        average = sum(amounts) / len(amounts)
+        results[f"bench_scenario_{i}"] = {
+            'lender_results': lenders,
+            'statistics': {
+                'gen_h_amount': lenders["Gen H"],
+                'average': average,
+                'gen_h_difference': lenders["Gen H"] - average,
+                'gen_h_rank': amounts.index(lenders["Gen H"]) + 1
+            }
+        }
+    return results
+
+
+def legacy_save(db_path, session_id, results):
+    """The original DatabaseManager write path: connect/commit/close per call, one INSERT per lender."""
+    today = date.today().isoformat()
+    for scenario_id, scenario_data in results.items():
+        stats = scenario_data['statistics']
+        lenders = scenario_data['lender_results']
+
+        conn = sqlite3.connect(db_path)
+        conn.execute('''
+            INSERT INTO scenario_results
+            (session_id, scenario_id, run_date, gen_h_amount, average_amount,
+             gen_h_difference, gen_h_rank, total_lenders)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (session_id, scenario_id, today, stats['gen_h_amount'], int(stats['average']),
+              int(stats['gen_h_difference']), stats['gen_h_rank'], len(lenders)))
+        conn.commit()
+        conn.close()
+
+        conn = sqlite3.connect(db_path)
+        sorted_lenders = sorted(lenders.items(), key=lambda x: x[1], reverse=True)
+        for rank, (lender_name, amount) in enumerate(sorted_lenders, 1):
+            conn.execute('''
+                INSERT INTO lender_results
+                (session_id, scenario_id, run_date, lender_name, amount, rank_position)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (session_id, scenario_id, today, lender_name, amount, rank))
+        conn.commit()
+        conn.close()
+
+
+def per_scenario_bulk_save(db, session_id, results):
+    """One atomic executemany transaction per scenario, as used during a live run."""
+    for scenario_id, scenario_data in results.items():
+        stats = scenario_data['statistics']
+        db.save_scenario_bundle(session_id, scenario_id, stats['gen_h_amount'], int(stats['average']),
+                                int(stats['gen_h_difference']), stats['gen_h_rank'],
+                                scenario_data['lender_results'])
+
+
+def fresh_db_path(tmp_dir, name):
+    db_path = os.path.join(tmp_dir, f"{name}.db")
+    shutil.copy(SOURCE_DB, db_path)
+    return db_path
+
+
+def fresh_manager(tmp_dir, name):
+    """A DatabaseManager whose one-off schema migration has already run."""
+    db = DatabaseManager(fresh_db_path(tmp_dir, name))
+    with db.connection():
+        pass
+    return db
+
+
+def run_benchmark(scenario_count, lender_count, tmp_dir):
+    results = make_results(scenario_count, lender_count)
+    rows = scenario_count * lender_count
+    print(f"\n📊 {scenario_count} scenarios × {lender_count} lenders ({rows:,} lender rows)")
+
+    db_path = fresh_db_path(tmp_dir, f"legacy_{scenario_count}")
+    start = time.perf_counter()
+    legacy_save(db_path, "bench-legacy", results)
+    legacy_time = time.perf_counter() - start
+    print(f"   legacy per-row path:      {legacy_time:8.3f}s")
+
+    db = fresh_manager(tmp_dir, f"bundle_{scenario_count}")
+    start = time.perf_counter()
+    per_scenario_bulk_save(db, "bench-bundle", results)
+    bundle_time = time.perf_counter() - start
+    db.close_all()
+    print(f"   save_scenario_bundle:     {bundle_time:8.3f}s  ({legacy_time / bundle_time:5.1f}x)")
+
+    db = fresh_manager(tmp_dir, f"batch_{scenario_count}")
+    start = time.perf_counter()
+    db.save_run_batch("bench-batch", results)
+    batch_time = time.perf_counter() - start
+    db.close_all()
+    print(f"   save_run_batch:           {batch_time:8.3f}s  ({legacy_time / batch_time:5.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[64, 10000])
+    parser.add_argument("--lenders", type=int, default=23)
+    args = parser.parse_args()
+
+    print("⏱️  HISTORY WRITE BENCHMARK")
+    print("=" * 50)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for scenario_count in args.scenarios:
+            run_benchmark(scenario_count, args.lenders, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
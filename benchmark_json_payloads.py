@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization and response compression on realistic payloads
+Usage: python3 benchmark_json_payloads.py [--runs 90] [--repeat 50]
+"""
+
+import argparse
+import gzip
+import json
+import time
+
+from fast_json import ORJSON_AVAILABLE, dumps_bytes
+from response_compression import BROTLI_AVAILABLE
+from results_materializer import build_materialized_results
+
+FULL_RESULTS = "full_automation_full-session-20250724-180800.json"
+CREDIT_RESULTS = "credit_automation_credit-session-20250815-164136.json"
+
+
+def complete_run_document():
+    """A 64-scenario materialized document: the latest full and credit runs combined."""
+    with open(FULL_RESULTS) as f:
+        full = json.load(f)
+    with open(CREDIT_RESULTS) as f:
+        credit = json.load(f)
+    data = {**full, 'session_id': 'complete-session-benchmark',
+            'results': {**full['results'], **credit['results']}}
+    return build_materialized_results(data)
+
+
+def history_payload(document, runs):
+    """Per-lender trend rows for every scenario over `runs` runs, as /api/lender-trends returns."""
+    trends = []
+    for run in range(runs):
+        date = f"2025-{1 + run // 28 % 12:02d}-{1 + run % 28:02d} 12:00:00"
+        for scenario_id, scenario in document['results'].items():
+            ranked = sorted(scenario.get('lender_results', {}).items(), key=lambda x: x[1], reverse=True)
+            for rank, (lender, amount) in enumerate(ranked, 1):
+                trends.append({"date": date, "scenario_id": scenario_id, "lender": lender,
+                               "scenario_description": scenario.get('description', ''),
+                               "amount": amount + run * 250, "rank": rank})
+    return {"lender_name": "all", "trends": trends}
+
+
+def stdlib_response(data):
+    """What starlette's JSONResponse.render does."""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def benchmark(name, data, repeat):
+    print(f"\n📦 {name}")
+    std_ms, std_body = timed(lambda: stdlib_response(data), repeat)
+    fast_ms, fast_body = timed(lambda: dumps_bytes(data), repeat)
+    print(f"   serialize  stdlib: {std_ms:8.2f} ms   fast: {fast_ms:8.2f} ms  ({std_ms / fast_ms:4.1f}x)"
+          f"   {len(fast_body):,} bytes")
+
+    pretty_ms, pretty = timed(lambda: json.dumps(data, indent=2).encode("utf-8"), max(1, repeat // 5))
+    print(f"   file       indent=2: {len(pretty):,} bytes ({pretty_ms:.2f} ms)   compact: {len(fast_body):,} bytes"
+          f"  ({len(fast_body) / len(pretty):.0%})")
+
+    gzip_ms, gzipped = timed(lambda: gzip.compress(fast_body, compresslevel=6), max(1, repeat // 5))
+    print(f"   gzip-6:    {len(gzipped):>10,} bytes ({len(gzipped) / len(fast_body):.1%})  {gzip_ms:7.2f} ms")
+    if BROTLI_AVAILABLE:
+        import brotli
+        br_ms, brotlied = timed(lambda: brotli.compress(fast_body, quality=4), max(1, repeat // 5))
+        print(f"   brotli-4:  {len(brotlied):>10,} bytes ({len(brotlied) / len(fast_body):.1%})  {br_ms:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print("⏱️  JSON PAYLOAD BENCHMARK")
+    print("=" * 50)
+    print(f"orjson: {'yes' if ORJSON_AVAILABLE else 'no'}   brotli: {'yes' if BROTLI_AVAILABLE else 'no'}")
+
+    document = complete_run_document()
+    benchmark(f"latest results, {len(document['results'])} scenarios", document, args.repeat)
+    history = history_payload(document, args.runs)
+    benchmark(f"history, {args.runs} runs ({len(history['trends']):,} rows)", history, max(1, args.repeat // 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Bounded thread pool for blocking persistence and file I/O
+Keeps sqlite3, large JSON reads/writes and the synchronous Supabase client
+off the asyncio event loop, and measures event-loop lag so regressions
+show up as a metric instead of as a sluggish dashboard.
+"""
+
+import asyncio
+import functools
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from fast_json import dumps_bytes, loads
+
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="mbt-io")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the bounded I/O pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def load_json_file(path):
+    """Read a JSON file (blocking - call through run_blocking from async code)."""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def save_json_file(path, data, indent=False):
+    """Write a compact JSON file atomically (blocking - call through run_blocking from async code)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps_bytes(data, indent))
+    os.replace(tmp_path, path)
+
+
+def shutdown_executor():
+    """Stop accepting new blocking work and wait for in-flight jobs."""
+    _executor.shutdown(wait=True)
+
+
+class EventLoopLagMonitor:
+    """Samples how late the event loop wakes up from a fixed-interval sleep."""
+
+    def __init__(self, interval: float = 0.25, window: int = 240):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self.total_samples = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append(lag)
+            self.total_samples += 1
+            self.max_lag = max(self.max_lag, lag)
+
+    def snapshot(self) -> Dict:
+        """Current lag statistics in milliseconds."""
+        if not self.samples:
+            return {'samples': 0, 'last_ms': 0, 'mean_ms': 0, 'p99_ms': 0, 'max_ms': 0}
+
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {
+            'samples': self.total_samples,
+            'window': len(ordered),
+            'interval_ms': round(self.interval * 1000, 1),
+            'last_ms': round(self.samples[-1] * 1000, 2),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p99_ms': round(p99 * 1000, 2),
+            'max_ms': round(self.max_lag * 1000, 2),
+            'sampled_at': time.time()
+        }
+
+
+def executor_stats() -> Dict:
+    """Queue depth of the blocking I/O pool."""
+    return {
+        'max_workers': BLOCKING_IO_WORKERS,
+        'queued_jobs': _executor._work_queue.qsize()
+    }
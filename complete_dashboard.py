@@ -8,36 +8,26 @@ import json
 import os
 from datetime import datetime
 from collections import defaultdict
+from statistics_engine import rank_summary, results_lender_ranks
 
 def calculate_summary_stats(results_data):
     """Calculate Gen H performance summary statistics."""
     if not results_data or 'results' not in results_data:
         return {"average_rank": "N/A", "pct_ranked_1st": "N/A", "pct_ranked_top3": "N/A", "total_scenarios": 0}
     
-    ranks = []
-    ranked_1st = 0
-    ranked_top3 = 0
+    summary = rank_summary(
+        scenario_data.get('statistics', {}).get('gen_h_rank') for scenario_data in results_data['results'].values()
+    )
     
-    for scenario_data in results_data['results'].values():
-        if 'statistics' in scenario_data:
-            rank = scenario_data['statistics'].get('gen_h_rank')
-            if rank and isinstance(rank, int):
-                ranks.append(rank)
-                if rank == 1:
-                    ranked_1st += 1
-                if rank <= 3:
-                    ranked_top3 += 1
-    
-    total_scenarios = len(ranks)
+    total_scenarios = summary['ranked']
     if total_scenarios == 0:
         return {"average_rank": "N/A", "pct_ranked_1st": "N/A", "pct_ranked_top3": "N/A", "total_scenarios": 0}
     
-    average_rank = sum(ranks) / len(ranks)
-    pct_1st = (ranked_1st / total_scenarios) * 100
-    pct_top3 = (ranked_top3 / total_scenarios) * 100
+    pct_1st = (summary['rank_counts'][1] / total_scenarios) * 100
+    pct_top3 = (summary['top_3'] / total_scenarios) * 100
     
     return {
-        "average_rank": round(average_rank, 1),
+        "average_rank": round(summary['average_rank'], 1),
         "pct_ranked_1st": round(pct_1st, 1),
         "pct_ranked_top3": round(pct_top3, 1),
         "total_scenarios": total_scenarios
@@ -86,7 +76,7 @@ def group_scenarios_by_income(results_data):
         
         if income_level:
             key = f"{applicant_type} {employment_type}"
-            grouped[income_level][key] = scenario_data
+            grouped[income_level][key] = dict(scenario_data, scenario_id=scenario_id)
     
     return dict(grouped)
 
@@ -119,6 +109,9 @@ def create_complete_dashboard(results_data):
     
     # Get all lenders
     all_lenders = get_all_lenders(results_data)
+
+    # Rank every scenario's lenders in one pass
+    scenario_ranks = results_lender_ranks((results_data or {}).get('results', {}))
     
     html_content = f"""
 <!DOCTYPE html>
@@ -399,9 +392,7 @@ def create_complete_dashboard(results_data):
                                 <td><strong>Rank</strong></td>
 """
                         
-                        # Calculate ranks for all lenders
-                        sorted_lenders = sorted(lender_results.items(), key=lambda x: x[1] if x[1] != 'N/A' else 0, reverse=True)
-                        lender_ranks = {lender: i+1 for i, (lender, amount) in enumerate(sorted_lenders) if amount != 'N/A'}
+                        lender_ranks = scenario_ranks.get(scenario_data['scenario_id'], {})
                         
                         # Add ranks for each lender
                         for lender in all_lenders:
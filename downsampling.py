@@ -0,0 +1,100 @@
+"""
+Largest-Triangle-Three-Buckets downsampling for chart series
+Keeps the first and last points and, from each of the remaining buckets,
+the point forming the largest triangle with the previously kept point and
+the next bucket's average, so peaks and troughs survive. Bucket averages
+and per-bucket triangle areas are computed with numpy.
+"""
+
+import numpy as np
+
+# Smallest budget LTTB can honour (first, one bucket, last)
+MIN_POINTS = 3
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Indices of at most `threshold` points of the series (x ascending) to keep,
+    in ascending order. Series already within budget are returned whole.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < MIN_POINTS:
+        return np.arange(n)
+
+    # Interior points 1..n-2 split into threshold-2 non-empty buckets [edges[i], edges[i+1])
+    buckets = threshold - 2
+    edges = (np.arange(buckets + 1) * (n - 2) // buckets + 1).astype(np.intp)
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    average_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # Each bucket looks ahead to the next bucket's average; the last one to the final point
+    next_x = np.append(average_x[1:], x[-1])
+    next_y = np.append(average_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(buckets):
+        low, high = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        areas = np.abs((ax - next_x[bucket]) * (y[low:high] - ay) - (ax - x[low:high]) * (next_y[bucket] - ay))
+        previous = low + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def budget_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Like lttb_indices, but never more than `threshold` points even below
+    MIN_POINTS: the endpoints are kept, newest first, then nothing.
+    """
+    n = len(x)
+    if threshold >= MIN_POINTS or threshold >= n:
+        return lttb_indices(x, y, threshold)
+    return np.array([0, n - 1][2 - threshold:], dtype=np.intp)
+
+
+def grouped_lttb_indices(groups, x, y, threshold: int) -> np.ndarray:
+    """
+    Downsample several interleaved series (one per value of `groups`, each in
+    x order) so that together they keep at most `threshold` points, shared
+    as evenly as possible (any remainder goes to the first groups in sort
+    order). Returns positions into the inputs, ascending.
+    """
+    groups = np.unique(np.asarray(groups), return_inverse=True)[1]
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(groups) <= threshold:
+        return np.arange(len(groups))
+
+    order = np.argsort(groups, kind='stable')
+    boundaries = np.flatnonzero(np.diff(groups[order])) + 1
+    series = np.split(order, boundaries)
+    # The first threshold % len(series) series take one point of the remainder each
+    shares = threshold // len(series) + (np.arange(len(series)) < threshold % len(series))
+    kept = [positions[budget_indices(x[positions], y[positions], int(share))]
+            for positions, share in zip(series, shares)]
+    return np.sort(np.concatenate(kept))
+
+
+def timestamps_to_seconds(timestamps) -> np.ndarray:
+    """'YYYY-MM-DD HH:MM:SS' (or ISO) strings as seconds since the epoch, for use as x."""
+    return np.array(timestamps, dtype='datetime64[s]').astype(np.int64)
+
+
+def downsample_rows(rows, points: int, value_index: int, group_index=None) -> list:
+    """
+    Newest-first history rows (run timestamp first) reduced by LTTB on
+    row[value_index], one series per row[group_index] when given. Returns
+    the kept rows, newest first.
+    """
+    oldest_first = rows[::-1]
+    x = timestamps_to_seconds([row[0] for row in oldest_first])
+    y = [row[value_index] or 0 for row in oldest_first]
+    if group_index is None:
+        kept = lttb_indices(x, y, points)
+    else:
+        kept = grouped_lttb_indices([row[group_index] for row in oldest_first], x, y, points)
+    return [oldest_first[index] for index in kept[::-1]]
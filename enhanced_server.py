@@ -5,15 +5,40 @@ Enhanced with 3 new lenders: Bank of Ireland, Hinckley & Rugby, Market Harboroug
 
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+import itertools
 import os
-import sqlite3
 import csv
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import traceback
 import json
+from history_database import DatabaseManager, HISTORY_EXPORT_COLUMNS
+from blocking_io import (run_blocking, load_json_file, save_json_file, EventLoopLagMonitor,
+                         executor_stats, shutdown_executor)
+from results_materializer import (build_materialized_results, strip_materialized_fields, MaterializedResultsCache,
+                                  MATERIALIZED_FORMAT_VERSION)
+from history_schema import ANY_RUN_TYPE
+from fast_json import dumps as json_dumps, dumps_bytes as json_dumps_bytes, loads as json_loads
+from response_compression import CompressionMiddleware
+from results_export import (iter_result_rows, stream_csv, stream_results_json, stream_jsonl, stream_record_pages,
+                            export_filename, attachment_headers, MEDIA_TYPES)
+from xlsx_export import stream_results_xlsx, stream_rows_xlsx, XLSX_MEDIA_TYPE
+from parquet_history import write_run as write_parquet_run, PYARROW_AVAILABLE
+from statistics_engine import scenario_statistics
+from run_aggregates import RunAggregates
+from http_caching import make_etag, http_date, cache_headers, check_not_modified
+from history_cache import HistoryCache
+from downsampling import MIN_POINTS, downsample_rows
+from rank_movements import DEFAULT_RUNS, MAX_RUNS
+from history_backends import create_history_backend, HISTORY_BACKEND
+from history_rollups import (GRANULARITIES, ALL_GROUPS, choose_granularity, period_bounds, parse_range,
+                             group_rollup_points, lender_rollup_points)
+from history_query import (SORT_KEYS, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, parse_fields, parse_list, encode_cursor,
+                           decode_cursor, lender_result_records)
+from supabase_outbox import SupabaseOutbox
+from supabase_replica import SupabaseReplica, REPLICA_SYNC_INTERVAL
 # Import automation only if Playwright is available (for production deployment)
 try:
     from real_mbt_automation import RealMBTAutomation
@@ -24,18 +49,25 @@ except ImportError as e:
     print(f"⚠️ MBT Automation not available: {e}")
 
 try:
-    from supabase_client import supabase_manager
+    from supabase_async_client import supabase_manager, SCENARIO_RESULT_COLUMNS
     SUPABASE_AVAILABLE = True
     print("✅ Supabase client available")
 except ImportError as e:
     SUPABASE_AVAILABLE = False
     print(f"⚠️ Supabase not available: {e}")
 
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast encoder."""
+
+    def render(self, content) -> bytes:
+        return json_dumps_bytes(content)
+
 # Create FastAPI app
 app = FastAPI(
     title="MBT Affordability Benchmarking Tool - Enhanced with Historical Data",
     description="Full automation with 32 scenarios and historical trend tracking",
-    version="3.0.0"
+    version="3.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -47,132 +79,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON/text responses (brotli when available, else gzip)
+app.add_middleware(CompressionMiddleware)
+
 # Create templates
 templates = Jinja2Templates(directory="templates")
 
-class DatabaseManager:
-    """Manages database operations for historical data."""
-    
-    def __init__(self, db_path="mbt_affordability_history.db"):
-        self.db_path = db_path
-    
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
-    
-    def save_automation_run(self, session_id, total_scenarios, successful_scenarios, status="completed"):
-        """Save automation run details."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        today = date.today().isoformat()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO automation_runs 
-            (session_id, run_date, total_scenarios, successful_scenarios, status)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (session_id, today, total_scenarios, successful_scenarios, status))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_scenario_result(self, session_id, scenario_id, gen_h_amount, average_amount, 
-                           gen_h_difference, gen_h_rank, total_lenders):
-        """Save scenario result summary."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        today = date.today().isoformat()
-        
-        cursor.execute('''
-            INSERT INTO scenario_results 
-            (session_id, scenario_id, run_date, gen_h_amount, average_amount, 
-             gen_h_difference, gen_h_rank, total_lenders)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (session_id, scenario_id, today, gen_h_amount, average_amount, 
-              gen_h_difference, gen_h_rank, total_lenders))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_lender_results(self, session_id, scenario_id, lender_results):
-        """Save individual lender results."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        today = date.today().isoformat()
-        
-        # Sort lenders by amount for ranking
-        sorted_lenders = sorted(lender_results.items(), key=lambda x: x[1], reverse=True)
-        
-        for rank, (lender_name, amount) in enumerate(sorted_lenders, 1):
-            cursor.execute('''
-                INSERT INTO lender_results 
-                (session_id, scenario_id, run_date, lender_name, amount, rank_position)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (session_id, scenario_id, today, lender_name, amount, rank))
-        
-        conn.commit()
-        conn.close()
-    
-    def get_historical_data(self, scenario_id=None, lender_name=None, days=30):
-        """Get historical data for trends."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if scenario_id and lender_name:
-            # Get specific lender history for a scenario
-            cursor.execute('''
-                SELECT run_date, amount, rank_position
-                FROM lender_results 
-                WHERE scenario_id = ? AND lender_name = ?
-                ORDER BY run_date DESC
-                LIMIT ?
-            ''', (scenario_id, lender_name, days))
-            
-        elif scenario_id:
-            # Get scenario summary history
-            cursor.execute('''
-                SELECT run_date, gen_h_amount, average_amount, gen_h_difference, gen_h_rank
-                FROM scenario_results 
-                WHERE scenario_id = ?
-                ORDER BY run_date DESC
-                LIMIT ?
-            ''', (scenario_id, days))
-            
-        else:
-            # Get all recent data
-            cursor.execute('''
-                SELECT run_date, scenario_id, gen_h_amount, average_amount, gen_h_rank
-                FROM scenario_results 
-                ORDER BY run_date DESC, scenario_id
-                LIMIT ?
-            ''', (days * 10,))
-        
-        results = cursor.fetchall()
-        conn.close()
-        return results
-
 # Initialize database manager
 db_manager = DatabaseManager()
 
+# Materialized per-run results, keyed by run version
+materialized_cache = MaterializedResultsCache()
+
+# Columnar copy of the run history; trend and rank endpoints are served from memory
+history_cache = HistoryCache()
+
+# Optional local mirror of Supabase (SUPABASE_REPLICA_INTERVAL > 0); while it runs every
+# historical endpoint reads the mirror and reports its staleness
+supabase_replica = None
+if SUPABASE_AVAILABLE and supabase_manager.is_connected() and REPLICA_SYNC_INTERVAL > 0:
+    supabase_replica = SupabaseReplica(db_manager, supabase_manager, interval=REPLICA_SYNC_INTERVAL,
+                                       on_change=lambda session_ids: history_cache.add_runs(db_manager, session_ids))
+
+# Source of the historical analytics endpoints, chosen by HISTORY_BACKEND (memory, sqlite, supabase)
+history_backend = create_history_backend(HISTORY_BACKEND, db_manager, history_cache,
+                                         supabase_manager if SUPABASE_AVAILABLE and not supabase_replica else None)
+
+# Finished runs are queued locally and upserted to Supabase in the background
+supabase_outbox = SupabaseOutbox(db_manager, supabase_manager if SUPABASE_AVAILABLE else None)
+
+# Online aggregates of runs in progress, keyed by session ID
+active_runs = {}
+
+# Event-loop lag is sampled continuously so blocking calls show up as a metric
+loop_lag_monitor = EventLoopLagMonitor()
+
 def get_all_scenarios():
     """Get all 32 predefined scenarios from database."""
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT scenario_id, description, case_type, income FROM scenarios ORDER BY income')
-    scenarios = cursor.fetchall()
-    conn.close()
-    
-    return [
-        {
-            "scenario_id": row[0],
-            "description": row[1], 
-            "case_type": row[2],
-            "income": row[3]
-        }
-        for row in scenarios
-    ]
+    return db_manager.get_scenarios()
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    """Start sampling event-loop lag and the Supabase outbox worker, and register pre-catalog results files."""
+    loop_lag_monitor.start()
+    supabase_outbox.start()
+    try:
+        await run_blocking(backfill_run_catalog)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not backfill run catalog: {e}")
+    try:
+        await run_blocking(history_cache.load, db_manager)
+        usage = history_cache.memory_usage()
+        print(f"🧠 History cache loaded: {usage['runs']} runs, {usage['lender_rows']} lender rows, "
+              f"{usage['total_bytes'] / 1024 / 1024:.1f} MB")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not load history cache: {e}")
+    if supabase_replica:
+        supabase_replica.start()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    """Stop background monitors, drain blocking I/O and release pooled SQLite connections."""
+    await loop_lag_monitor.stop()
+    await supabase_outbox.stop()
+    if supabase_replica:
+        await supabase_replica.stop()
+    if SUPABASE_AVAILABLE:
+        await supabase_manager.aclose()
+    shutdown_executor()
+    db_manager.close_all()
 
 @app.get("/", response_class=HTMLResponse)
 async def dashboard(request: Request):
@@ -191,7 +166,7 @@ async def run_sample_scenarios():
         try:
             login_success = await automation.login()
             if not login_success:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=400,
                     content={"error": "MBT login failed. Please check credentials."}
                 )
@@ -210,20 +185,14 @@ async def run_sample_scenarios():
                 lender_amounts = result['lenders_data']
                 gen_h_amount = lender_amounts.get('Gen H', 0)
                 
-                if lender_amounts:
-                    amounts = list(lender_amounts.values())
-                    average = sum(amounts) / len(amounts)
-                    gen_h_difference = gen_h_amount - average if gen_h_amount else 0
-                    sorted_amounts = sorted(amounts, reverse=True)
-                    gen_h_rank = sorted_amounts.index(gen_h_amount) + 1 if gen_h_amount in sorted_amounts else 0
-                else:
-                    average = gen_h_difference = gen_h_rank = 0
+                stats = scenario_statistics(lender_amounts)
+                average, gen_h_difference, gen_h_rank = stats['average'], stats['gen_h_difference'], stats['gen_h_rank']
                 
-                # Save to database
-                db_manager.save_automation_run(session_id, 1, 1, "completed")
-                db_manager.save_scenario_result(session_id, "single_employed_30k", gen_h_amount, 
-                                               int(average), int(gen_h_difference), gen_h_rank, len(lender_amounts))
-                db_manager.save_lender_results(session_id, "single_employed_30k", lender_amounts)
+                # Save to database, marking the run completed once its scenario is in so the rollups include it
+                await run_blocking(db_manager.save_automation_run, session_id, 1, 0, "running")
+                await run_blocking(db_manager.save_scenario_bundle, session_id, "single_employed_30k", gen_h_amount,
+                                   int(average), int(gen_h_difference), gen_h_rank, lender_amounts)
+                await run_blocking(db_manager.save_automation_run, session_id, 1, 1, "completed")
                 
                 final_result = {
                     'session_id': session_id,
@@ -244,10 +213,14 @@ async def run_sample_scenarios():
                     },
                     'timestamp': datetime.now().isoformat()
                 }
+                try:
+                    await run_blocking(materialize_run, final_result, "sample")
+                except Exception as materialize_error:
+                    print(f"⚠️ Warning: Could not materialize results: {materialize_error}")
                 
-                return JSONResponse(content=final_result)
+                return FastJSONResponse(content=final_result)
             else:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=500,
                     content={"error": "No data extracted from sample scenario"}
                 )
@@ -257,7 +230,7 @@ async def run_sample_scenarios():
         
     except Exception as e:
         print(f"❌ Error in sample automation: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500, 
             content={"error": str(e)}
         )
@@ -268,27 +241,29 @@ async def run_full_automation():
     try:
         print("🚀 Starting FULL 32-scenario MBT automation...")
         
+        session_id = None
         automation = RealMBTAutomation()
         await automation.start_browser()
         
         try:
             login_success = await automation.login()
             if not login_success:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=400,
                     content={"error": "MBT login failed for full automation."}
                 )
             
             # Get all scenarios from database
-            scenarios = get_all_scenarios()
+            scenarios = await run_blocking(get_all_scenarios)
             print(f"📊 Running {len(scenarios)} scenarios...")
             
             session_id = f'full-session-{datetime.now().strftime("%Y%m%d-%H%M%S")}'
             results = {}
             successful_count = 0
+            aggregates = active_runs[session_id] = RunAggregates()
             
             # Save initial run record
-            db_manager.save_automation_run(session_id, len(scenarios), 0, "running")
+            await run_blocking(db_manager.save_automation_run, session_id, len(scenarios), 0, "running")
             
             for i, scenario in enumerate(scenarios, 1):
                 print(f"\\n📊 Scenario {i}/{len(scenarios)}: {scenario['description']}")
@@ -303,21 +278,15 @@ async def run_full_automation():
                         lender_amounts = result['lenders_data']
                         gen_h_amount = lender_amounts.get('Gen H', 0)
                         
-                        if lender_amounts:
-                            amounts = list(lender_amounts.values())
-                            average = sum(amounts) / len(amounts)
-                            gen_h_difference = gen_h_amount - average if gen_h_amount else 0
-                            sorted_amounts = sorted(amounts, reverse=True)
-                            gen_h_rank = sorted_amounts.index(gen_h_amount) + 1 if gen_h_amount in sorted_amounts else 0
-                        else:
-                            average = gen_h_difference = gen_h_rank = 0
+                        stats = scenario_statistics(lender_amounts)
+                        average, gen_h_difference, gen_h_rank = stats['average'], stats['gen_h_difference'], stats['gen_h_rank']
                         
                         # Save to database
-                        db_manager.save_scenario_result(
+                        await run_blocking(
+                            db_manager.save_scenario_bundle,
                             session_id, scenario['scenario_id'], gen_h_amount,
-                            int(average), int(gen_h_difference), gen_h_rank, len(lender_amounts)
+                            int(average), int(gen_h_difference), gen_h_rank, lender_amounts
                         )
-                        db_manager.save_lender_results(session_id, scenario['scenario_id'], lender_amounts)
                         
                         # Add to results
                         results[scenario['scenario_id']] = {
@@ -331,6 +300,8 @@ async def run_full_automation():
                                 'gen_h_rank': gen_h_rank
                             }
                         }
+                        aggregates.add_scenario(scenario['scenario_id'], lender_amounts,
+                                                results[scenario['scenario_id']]['statistics'])
                         
                         successful_count += 1
                         print(f"✅ Scenario {i} completed: {len(lender_amounts)} lenders")
@@ -340,7 +311,7 @@ async def run_full_automation():
                     continue
             
             # Update run record with final counts
-            db_manager.save_automation_run(session_id, len(scenarios), successful_count, "completed")
+            await run_blocking(db_manager.save_automation_run, session_id, len(scenarios), successful_count, "completed")
             
             final_result = {
                 'session_id': session_id,
@@ -356,69 +327,30 @@ async def run_full_automation():
             }
             
             # Save complete results  
-            with open(f"full_automation_{session_id}.json", "w") as f:
-                json.dump(final_result, f, indent=2)
+            await run_blocking(save_json_file, f"full_automation_{session_id}.json", final_result)
             
             # Also save as latest results for easy access
-            with open("latest_automation_results.json", "w") as f:
-                json.dump(final_result, f, indent=2)
+            await run_blocking(save_json_file, "latest_automation_results.json", final_result)
+            try:
+                await run_blocking(materialize_run, final_result, "full", results_file="latest_automation_results.json",
+                                   aggregates=aggregates)
+            except Exception as materialize_error:
+                print(f"⚠️ Warning: Could not materialize results: {materialize_error}")
             
             print(f"🎉 Full automation completed: {successful_count}/{len(scenarios)} scenarios")
-            return JSONResponse(content=final_result)
+            return FastJSONResponse(content=final_result)
             
         finally:
             await automation.close()
+            active_runs.pop(session_id, None)
         
     except Exception as e:
         print(f"❌ Error in full automation: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500, 
             content={"error": str(e)}
         )
 
-def calculate_summary_statistics(results):
-    """Calculate summary statistics from scenario results."""
-    if not results:
-        return {
-            'average_gen_h_rank': 0,
-            'rank_percentages': {'rank_1_percent': 0, 'rank_2_percent': 0, 'rank_3_percent': 0},
-            'top_3_percent': 0
-        }
-    
-    # Extract Gen H ranks
-    gen_h_ranks = []
-    for scenario_data in results.values():
-        stats = scenario_data.get('statistics', {})
-        rank = stats.get('gen_h_rank', 0)
-        if rank > 0:
-            gen_h_ranks.append(rank)
-    
-    if not gen_h_ranks:
-        return {
-            'average_gen_h_rank': 0,
-            'rank_percentages': {'rank_1_percent': 0, 'rank_2_percent': 0, 'rank_3_percent': 0},
-            'top_3_percent': 0
-        }
-    
-    # Calculate statistics
-    avg_rank = sum(gen_h_ranks) / len(gen_h_ranks)
-    rank_1_count = sum(1 for rank in gen_h_ranks if rank == 1)
-    rank_2_count = sum(1 for rank in gen_h_ranks if rank == 2)
-    rank_3_count = sum(1 for rank in gen_h_ranks if rank == 3)
-    top_3_count = rank_1_count + rank_2_count + rank_3_count
-    
-    total_scenarios = len(gen_h_ranks)
-    
-    return {
-        'average_gen_h_rank': round(avg_rank, 2),
-        'rank_percentages': {
-            'rank_1_percent': round((rank_1_count / total_scenarios) * 100, 1),
-            'rank_2_percent': round((rank_2_count / total_scenarios) * 100, 1),
-            'rank_3_percent': round((rank_3_count / total_scenarios) * 100, 1)
-        },
-        'top_3_percent': round((top_3_count / total_scenarios) * 100, 1)
-    }
-
 @app.get("/api/run-credit-scenarios")
 async def run_credit_scenarios():
     """Run ONLY the 32 credit commitment scenarios (much faster than full 64)."""
@@ -426,13 +358,14 @@ async def run_credit_scenarios():
         print("💳 Starting CREDIT COMMITMENT ONLY automation...")
         print("   This will run only the 32 scenarios with credit commitments")
         
+        session_id = None
         automation = RealMBTAutomation()
         await automation.start_browser()
         
         try:
             login_success = await automation.login()
             if not login_success:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=400,
                     content={"error": "MBT login failed. Please check credentials."}
                 )
@@ -440,26 +373,7 @@ async def run_credit_scenarios():
             print("✅ MBT login successful, running CREDIT COMMITMENT scenarios...")
             
             # Get ONLY credit commitment scenarios from database
-            credit_scenarios = []
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT scenario_id, description, case_type, income 
-                FROM scenarios 
-                WHERE has_credit_commitments = 1
-                ORDER BY income
-            ''')
-            credit_rows = cursor.fetchall()
-            conn.close()
-            
-            for row in credit_rows:
-                credit_scenarios.append({
-                    "scenario_id": row[0],
-                    "description": row[1], 
-                    "case_type": row[2],
-                    "income": row[3]
-                })
+            credit_scenarios = await run_blocking(db_manager.get_scenarios, credit_only=True)
             
             print(f"📋 Found {len(credit_scenarios)} credit commitment scenarios to run")
             
@@ -469,6 +383,7 @@ async def run_credit_scenarios():
             # Run credit scenarios
             successful_count = 0
             results = {}
+            aggregates = active_runs[session_id] = RunAggregates()
             
             for i, scenario in enumerate(credit_scenarios, 1):
                 try:
@@ -481,19 +396,12 @@ async def run_credit_scenarios():
                         lender_amounts = result['lenders_data']
                         gen_h_amount = lender_amounts.get('Gen H', 0)
                         
-                        if lender_amounts:
-                            amounts = list(lender_amounts.values())
-                            average = sum(amounts) / len(amounts)
-                            gen_h_difference = gen_h_amount - average if gen_h_amount else 0
-                            sorted_amounts = sorted(amounts, reverse=True)
-                            gen_h_rank = sorted_amounts.index(gen_h_amount) + 1 if gen_h_amount in sorted_amounts else 0
-                        else:
-                            average = gen_h_difference = gen_h_rank = 0
+                        stats = scenario_statistics(lender_amounts)
+                        average, gen_h_difference, gen_h_rank = stats['average'], stats['gen_h_difference'], stats['gen_h_rank']
                         
                         # Save to database
-                        db_manager.save_scenario_result(session_id, scenario["scenario_id"], gen_h_amount, 
-                                                       int(average), int(gen_h_difference), gen_h_rank, len(lender_amounts))
-                        db_manager.save_lender_results(session_id, scenario["scenario_id"], lender_amounts)
+                        await run_blocking(db_manager.save_scenario_bundle, session_id, scenario["scenario_id"], gen_h_amount,
+                                           int(average), int(gen_h_difference), gen_h_rank, lender_amounts)
                         
                         # Add to results
                         results[scenario['scenario_id']] = {
@@ -507,6 +415,8 @@ async def run_credit_scenarios():
                                 'gen_h_rank': gen_h_rank
                             }
                         }
+                        aggregates.add_scenario(scenario['scenario_id'], lender_amounts,
+                                                results[scenario['scenario_id']]['statistics'])
                         
                         successful_count += 1
                         print(f"   ✅ Success: {len(lender_amounts)} lenders, Gen H: £{gen_h_amount:,}")
@@ -518,10 +428,10 @@ async def run_credit_scenarios():
                     continue
             
             # Save automation run details
-            db_manager.save_automation_run(session_id, len(credit_scenarios), successful_count, "completed")
+            await run_blocking(db_manager.save_automation_run, session_id, len(credit_scenarios), successful_count, "completed")
             
-            # Calculate summary statistics for final result
-            summary_stats = calculate_summary_statistics(results)
+            # Summary statistics straight from the run's online aggregates
+            summary_stats = aggregates.summary_statistics()
             
             # Create final result
             final_result = {
@@ -536,44 +446,36 @@ async def run_credit_scenarios():
                 'timestamp': datetime.now().isoformat()
             }
             
-            # Save to Supabase for historical tracking
-            print("💾 Saving results to Supabase for historical analysis...")
+            # Queue for Supabase; the outbox worker uploads in the background
             try:
-                # Save automation run summary
-                await supabase_manager.save_automation_run(
-                    session_id=session_id,
-                    run_type='credit',
-                    total_scenarios=len(credit_scenarios),
-                    successful_scenarios=successful_count,
-                    results_data=final_result
-                )
-                
-                # Save individual scenario results
-                for scenario_id, scenario_data in results.items():
-                    await supabase_manager.save_scenario_results(session_id, scenario_id, scenario_data)
-                
-                print("✅ Results saved to Supabase successfully")
-            except Exception as supabase_error:
-                print(f"⚠️ Warning: Could not save to Supabase: {supabase_error}")
-                # Continue with local storage - don't fail the automation
+                queued = await run_blocking(supabase_outbox.enqueue_run, session_id, 'credit', len(credit_scenarios),
+                                            successful_count, final_result)
+                supabase_outbox.wake()
+                print(f"📤 Queued {queued} records for Supabase")
+            except Exception as outbox_error:
+                print(f"⚠️ Warning: Could not queue results for Supabase: {outbox_error}")
             
             # Save complete results  
-            with open(f"credit_automation_{session_id}.json", "w") as f:
-                json.dump(final_result, f, indent=2)
+            await run_blocking(save_json_file, f"credit_automation_{session_id}.json", final_result)
             
             # Also save as latest credit results
-            with open("latest_credit_results.json", "w") as f:
-                json.dump(final_result, f, indent=2)
+            await run_blocking(save_json_file, "latest_credit_results.json", final_result)
+            try:
+                await run_blocking(materialize_run, final_result, "credit", results_file="latest_credit_results.json",
+                                   aggregates=aggregates)
+            except Exception as materialize_error:
+                print(f"⚠️ Warning: Could not materialize results: {materialize_error}")
             
             print(f"💳 Credit automation completed: {successful_count}/{len(credit_scenarios)} scenarios")
-            return JSONResponse(content=final_result)
+            return FastJSONResponse(content=final_result)
             
         finally:
             await automation.close()
+            active_runs.pop(session_id, None)
         
     except Exception as e:
         print(f"❌ Error in credit automation: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500, 
             content={"error": str(e)}
         )
@@ -586,13 +488,14 @@ async def run_all_scenarios():
         print("   This will run ALL scenarios: 32 without credit + 32 with credit commitments")
         print("   Enhanced with 3 additional lenders: Bank of Ireland, Hinckley & Rugby, Market Harborough")
         
+        session_id = None
         automation = RealMBTAutomation()
         await automation.start_browser()
         
         try:
             login_success = await automation.login()
             if not login_success:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=400,
                     content={"error": "MBT login failed. Please check credentials."}
                 )
@@ -600,25 +503,7 @@ async def run_all_scenarios():
             print("✅ MBT login successful, running ALL 64 scenarios...")
             
             # Get ALL scenarios from database (both credit and non-credit)
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT scenario_id, description, case_type, income 
-                FROM scenarios 
-                ORDER BY has_credit_commitments, income
-            ''')
-            all_scenarios = cursor.fetchall()
-            conn.close()
-            
-            scenarios = []
-            for row in all_scenarios:
-                scenarios.append({
-                    "scenario_id": row[0],
-                    "description": row[1], 
-                    "case_type": row[2],
-                    "income": row[3]
-                })
+            scenarios = await run_blocking(db_manager.get_scenarios, order_by="credit_then_income")
             
             print(f"📋 Found {len(scenarios)} total scenarios to run")
             print(f"   Expected: 64 scenarios (32 without credit + 32 with credit commitments)")
@@ -629,6 +514,7 @@ async def run_all_scenarios():
             # Run all scenarios
             successful_count = 0
             results = {}
+            aggregates = active_runs[session_id] = RunAggregates()
             
             for i, scenario in enumerate(scenarios, 1):
                 try:
@@ -641,19 +527,12 @@ async def run_all_scenarios():
                         lender_amounts = result['lenders_data']
                         gen_h_amount = lender_amounts.get('Gen H', 0)
                         
-                        if lender_amounts:
-                            amounts = list(lender_amounts.values())
-                            average = sum(amounts) / len(amounts)
-                            gen_h_difference = gen_h_amount - average if gen_h_amount else 0
-                            sorted_amounts = sorted(amounts, reverse=True)
-                            gen_h_rank = sorted_amounts.index(gen_h_amount) + 1 if gen_h_amount in sorted_amounts else 0
-                        else:
-                            average = gen_h_difference = gen_h_rank = 0
+                        stats = scenario_statistics(lender_amounts)
+                        average, gen_h_difference, gen_h_rank = stats['average'], stats['gen_h_difference'], stats['gen_h_rank']
                         
                         # Save to database
-                        db_manager.save_scenario_result(session_id, scenario["scenario_id"], gen_h_amount, 
-                                                       int(average), int(gen_h_difference), gen_h_rank, len(lender_amounts))
-                        db_manager.save_lender_results(session_id, scenario["scenario_id"], lender_amounts)
+                        await run_blocking(db_manager.save_scenario_bundle, session_id, scenario["scenario_id"], gen_h_amount,
+                                           int(average), int(gen_h_difference), gen_h_rank, lender_amounts)
                         
                         # Add to results
                         results[scenario['scenario_id']] = {
@@ -667,6 +546,8 @@ async def run_all_scenarios():
                                 'gen_h_rank': gen_h_rank
                             }
                         }
+                        aggregates.add_scenario(scenario['scenario_id'], lender_amounts,
+                                                results[scenario['scenario_id']]['statistics'])
                         
                         successful_count += 1
                         print(f"   ✅ Success: {len(lender_amounts)} lenders, Gen H: £{gen_h_amount:,}")
@@ -686,10 +567,10 @@ async def run_all_scenarios():
                     continue
             
             # Save automation run details
-            db_manager.save_automation_run(session_id, len(scenarios), successful_count, "completed")
+            await run_blocking(db_manager.save_automation_run, session_id, len(scenarios), successful_count, "completed")
             
-            # Calculate summary statistics for final result
-            summary_stats = calculate_summary_statistics(results)
+            # Summary statistics straight from the run's online aggregates
+            summary_stats = aggregates.summary_statistics()
             
             # Create final result
             final_result = {
@@ -709,106 +590,58 @@ async def run_all_scenarios():
                 }
             }
             
-            # Save to Supabase for historical tracking
-            print("💾 Saving results to Supabase for historical analysis...")
+            # Queue for Supabase; the outbox worker uploads in the background
             try:
-                # Save automation run summary
-                await supabase_manager.save_automation_run(
-                    session_id=session_id,
-                    run_type='complete',
-                    total_scenarios=len(scenarios),
-                    successful_scenarios=successful_count,
-                    results_data=final_result
-                )
-                
-                # Save individual scenario results
-                for scenario_id, scenario_data in results.items():
-                    await supabase_manager.save_scenario_results(session_id, scenario_id, scenario_data)
-                
-                print("✅ Results saved to Supabase successfully")
-            except Exception as supabase_error:
-                print(f"⚠️ Warning: Could not save to Supabase: {supabase_error}")
-                # Continue with local storage - don't fail the automation
+                queued = await run_blocking(supabase_outbox.enqueue_run, session_id, 'complete', len(scenarios),
+                                            successful_count, final_result)
+                supabase_outbox.wake()
+                print(f"📤 Queued {queued} records for Supabase")
+            except Exception as outbox_error:
+                print(f"⚠️ Warning: Could not queue results for Supabase: {outbox_error}")
             
             # Save complete results  
-            with open(f"complete_automation_{session_id}.json", "w") as f:
-                json.dump(final_result, f, indent=2)
+            await run_blocking(save_json_file, f"complete_automation_{session_id}.json", final_result)
             
             # Also save as latest complete results
-            with open("latest_complete_results.json", "w") as f:
-                json.dump(final_result, f, indent=2)
+            await run_blocking(save_json_file, "latest_complete_results.json", final_result)
+            try:
+                await run_blocking(materialize_run, final_result, "complete", results_file="latest_complete_results.json",
+                                   aggregates=aggregates)
+            except Exception as materialize_error:
+                print(f"⚠️ Warning: Could not materialize results: {materialize_error}")
             
             print(f"🎉 Complete automation finished: {successful_count}/{len(scenarios)} scenarios")
             print(f"📊 Results include enhanced lender coverage with 3 new lenders")
-            return JSONResponse(content=final_result)
+            return FastJSONResponse(content=final_result)
             
         finally:
             await automation.close()
+            active_runs.pop(session_id, None)
         
     except Exception as e:
         print(f"❌ Error in complete automation: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500, 
             content={"error": str(e)}
         )
 
 @app.get("/api/latest-results")
-async def get_latest_results():
-    """Get latest automation results with enhanced grouping and statistics."""
+async def get_latest_results(request: Request, run_type: str = ANY_RUN_TYPE):
+    """Get latest automation results (optionally of one run type) with enhanced grouping and statistics."""
+    print("🔍 API /api/latest-results called")
     try:
-        print("🔍 API /api/latest-results called")
-        
-        # Try to load latest saved results first - check credit, normal, and complete results
-        credit_file = "latest_credit_results.json"
-        normal_file = "latest_automation_results.json"
-        complete_file = "latest_complete_results.json"
-        
-        # Check all files and determine which to load (prefer the most recent one)
-        files_to_check = []
-        if os.path.exists(credit_file):
-            files_to_check.append((credit_file, os.path.getmtime(credit_file), "credit"))
-        if os.path.exists(normal_file):
-            files_to_check.append((normal_file, os.path.getmtime(normal_file), "normal"))
-        if os.path.exists(complete_file):
-            files_to_check.append((complete_file, os.path.getmtime(complete_file), "complete"))
-        
-        results_file = None
-        if files_to_check:
-            # Sort by modification time (newest first)
-            files_to_check.sort(key=lambda x: x[1], reverse=True)
-            results_file = files_to_check[0][0]
-            file_type = files_to_check[0][2]
-            print(f"📁 Loading {results_file} ({file_type} results - most recent)")
+        latest = await run_blocking(db_manager.get_latest_run, run_type)
+        if latest is None:
+            print("❌ No catalogued runs found")
+            return {"message": "No results found. Run some scenarios first."}
         
-        if results_file:
-            with open(results_file, 'r') as f:
-                data = json.load(f)
-            print(f"📊 Loaded {len(data.get('results', {}))} scenarios from {results_file}")
-            enhanced = enhance_results_with_grouping_and_stats(data)
-            print(f"🔑 Returning enhanced data with keys: {list(enhanced.keys())}")
-            return enhanced
+        etag, last_modified = latest_run_validators("latest-results", run_type, latest)
+        not_modified = check_not_modified(request, etag, last_modified)
+        if not_modified:
+            return not_modified
         
-        # Try to load latest results file
-        import glob
-        result_files = glob.glob("full_automation_*.json")
-        if result_files:
-            latest_file = max(result_files, key=os.path.getctime)
-            print(f"📁 Loading {latest_file}")
-            with open(latest_file, 'r') as f:
-                data = json.load(f)
-            enhanced = enhance_results_with_grouping_and_stats(data)
-            return enhanced
-        
-        # Fallback to sample results
-        if os.path.exists("real_mbt_results.json"):
-            print("📁 Loading real_mbt_results.json")
-            with open("real_mbt_results.json", 'r') as f:
-                data = json.load(f)
-            enhanced = enhance_results_with_grouping_and_stats(data)
-            return enhanced
-        
-        print("❌ No results files found")
-        return {"message": "No results found. Run some scenarios first."}
+        document = await run_blocking(load_materialized_version, latest['materialized_version'])
+        return FastJSONResponse(content=document, headers=cache_headers(etag, last_modified))
         
     except Exception as e:
         print(f"❌ API Error: {e}")
@@ -816,152 +649,124 @@ async def get_latest_results():
         traceback.print_exc()
         return {"error": f"Error loading results: {e}"}
 
-def enhance_results_with_grouping_and_stats(data):
-    """Enhance results with grouping and summary statistics."""
-    print(f"🔍 enhance_results_with_grouping_and_stats called with {len(data.get('results', {}))} scenarios")
-    
-    if not data.get('results'):
-        print("❌ No results data found")
-        return data
-    
-    # Group scenarios by type (handle both normal and credit commitment scenarios)
-    grouped_results = {
-        'sole_employed': {},
-        'sole_self_employed': {},
-        'joint_employed': {},
-        'joint_self_employed': {},
-        'sole_employed_credit': {},
-        'sole_self_employed_credit': {},
-        'joint_employed_credit': {},
-        'joint_self_employed_credit': {}
-    }
-    
-    # Helper function to extract income from scenario description
-    def extract_income_amount(description):
-        import re
-        match = re.search(r'£(\d+)k', description)
-        if match:
-            return int(match.group(1)) * 1000
+def latest_run_validators(variant, run_type, latest):
+    """ETag and Last-Modified for a response derived from a catalogued run."""
+    etag = make_etag(variant, run_type, latest['materialized_version'], MATERIALIZED_FORMAT_VERSION)
+    return etag, http_date(latest['finished_at'])
+
+def materialize_run(data, run_type, results_file=None, finished_at=None, aggregates=None):
+    """Group a finished run, store it as a new materialized version and catalog it as latest (blocking)."""
+    document = build_materialized_results(data, aggregates)
+    version = db_manager.record_finished_run(
+        data.get('session_id', 'unknown'), run_type, MATERIALIZED_FORMAT_VERSION, json_dumps(document),
+        results_file=results_file, scenario_count=len(data.get('results', {})), finished_at=finished_at
+    )
+    document = {**document, 'materialized_version': version}
+    materialized_cache.put(version, document)
+    print(f"🧊 Materialized {run_type} run {data.get('session_id')} as version {version}")
+    append_run_to_parquet(data.get('session_id', 'unknown'))
+    add_run_to_history_cache(data.get('session_id', 'unknown'))
+    return version
+
+def add_run_to_history_cache(session_id):
+    """Extend the in-memory history cache with a finished run (blocking, best effort)."""
+    try:
+        history_cache.add_run(db_manager, session_id)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not add run to history cache: {e}")
+
+def append_run_to_parquet(session_id):
+    """Add a finished run to the partitioned Parquet history (blocking, best effort)."""
+    if not PYARROW_AVAILABLE:
+        return None
+    try:
+        path = write_parquet_run(db_manager, session_id)
+        if path:
+            print(f"🗂️ Appended run {session_id} to Parquet history: {path}")
+        return path
+    except Exception as e:
+        print(f"⚠️ Warning: Could not append run to Parquet history: {e}")
+        return None
+
+def backfill_run_catalog():
+    """Register results files written before the run catalog existed (blocking, runs once)."""
+    if db_manager.has_catalogued_runs():
         return 0
     
-    # Statistics tracking
-    all_ranks = []
-    rank_counts = {1: 0, 2: 0, 3: 0}
-    total_scenarios_with_ranks = 0
-    
-    print("📊 Processing scenarios for grouping:")
-    
-    # First, collect scenarios with their income amounts
-    scenarios_with_income = []
-    for scenario_id, scenario_data in data['results'].items():
-        # Determine scenario group based on actual scenario ID patterns (handle credit scenarios)
-        if '_credit' in scenario_id:
-            # Credit commitment scenarios
-            if scenario_id.startswith('single_employed'):
-                group = 'sole_employed_credit'
-            elif scenario_id.startswith('single_self_employed'):
-                group = 'sole_self_employed_credit'
-            elif scenario_id.startswith('joint_employed'):
-                group = 'joint_employed_credit'
-            elif scenario_id.startswith('joint_self_employed'):
-                group = 'joint_self_employed_credit'
-            else:
-                print(f"⚠️ Unknown credit scenario type: {scenario_id}")
-                group = 'sole_employed_credit'  # fallback
-        else:
-            # Normal scenarios
-            if scenario_id.startswith('single_employed'):
-                group = 'sole_employed'
-            elif scenario_id.startswith('single_self_employed'):
-                group = 'sole_self_employed'
-            elif scenario_id.startswith('joint_employed'):
-                group = 'joint_employed'
-            elif scenario_id.startswith('joint_self_employed'):
-                group = 'joint_self_employed'
-            else:
-                print(f"⚠️ Unknown scenario type: {scenario_id}")
-                group = 'sole_employed'  # fallback
-        
-        # Extract income amount for sorting
-        description = scenario_data.get('description', '')
-        income_amount = extract_income_amount(description)
-        
-        scenarios_with_income.append((scenario_id, scenario_data, group, income_amount))
-        print(f"  {scenario_id} -> {group} (£{income_amount:,})")
-    
-    # Sort scenarios within each group by income amount
-    # Define group order: sole_employed, sole_self_employed, joint_employed, joint_self_employed, then credit versions
-    group_order = {
-        'sole_employed': 0, 'sole_self_employed': 1, 'joint_employed': 2, 'joint_self_employed': 3,
-        'sole_employed_credit': 4, 'sole_self_employed_credit': 5, 'joint_employed_credit': 6, 'joint_self_employed_credit': 7
-    }
-    scenarios_with_income.sort(key=lambda x: (group_order.get(x[2], 8), x[3]))  # Sort by group order, then income
-    
-    print(f"🔧 Sorted scenarios order:")
-    for scenario_id, scenario_data, group, income_amount in scenarios_with_income:
-        print(f"  {scenario_id} -> {group} (£{income_amount:,})")
-    
-    # Now populate grouped_results in sorted order
-    for scenario_id, scenario_data, group, income_amount in scenarios_with_income:
-        grouped_results[group][scenario_id] = scenario_data
-        
-        # Track ranking statistics
-        gen_h_rank = scenario_data.get('statistics', {}).get('gen_h_rank')
-        if gen_h_rank and isinstance(gen_h_rank, int) and gen_h_rank > 0:
-            all_ranks.append(gen_h_rank)
-            total_scenarios_with_ranks += 1
-            
-            if gen_h_rank in rank_counts:
-                rank_counts[gen_h_rank] += 1
-    
-    # Calculate summary statistics
-    summary_stats = {
-        'total_scenarios': len(data['results']),
-        'scenarios_with_ranks': total_scenarios_with_ranks,
-        'average_gen_h_rank': round(sum(all_ranks) / len(all_ranks), 2) if all_ranks else 0,
-        'rank_percentages': {
-            'rank_1_percent': round((rank_counts[1] / total_scenarios_with_ranks) * 100, 1) if total_scenarios_with_ranks > 0 else 0,
-            'rank_2_percent': round((rank_counts[2] / total_scenarios_with_ranks) * 100, 1) if total_scenarios_with_ranks > 0 else 0,
-            'rank_3_percent': round((rank_counts[3] / total_scenarios_with_ranks) * 100, 1) if total_scenarios_with_ranks > 0 else 0,
-        },
-        'top_3_percent': round(((rank_counts[1] + rank_counts[2] + rank_counts[3]) / total_scenarios_with_ranks) * 100, 1) if total_scenarios_with_ranks > 0 else 0
-    }
-    
-    # Enhanced data structure
-    enhanced_data = {
-        **data,
-        'grouped_results': grouped_results,
-        'summary_statistics': summary_stats,
-        'group_headers': {
-            'sole_employed': '👤 Sole Employed Scenarios (£20k - £200k)',
-            'sole_self_employed': '👤 Sole Self-Employed Scenarios (£20k - £200k)', 
-            'joint_employed': '👥 Joint Employed Scenarios (£40k - £200k total)',
-            'joint_self_employed': '👥 Joint Self-Employed Scenarios (£40k - £200k total)',
-            'sole_employed_credit': '👤💳 Sole Employed with Credit Commitments (£20k - £100k)',
-            'sole_self_employed_credit': '👤💳 Sole Self-Employed with Credit Commitments (£20k - £100k)',
-            'joint_employed_credit': '👥💳 Joint Employed with Credit Commitments (£40k - £200k total)',
-            'joint_self_employed_credit': '👥💳 Joint Self-Employed with Credit Commitments (£40k - £200k total)'
-        }
-    }
+    candidates = [
+        ("latest_credit_results.json", "credit"),
+        ("latest_automation_results.json", "full"),
+        ("latest_complete_results.json", "complete"),
+    ]
+    if not any(os.path.exists(path) for path, _ in candidates):
+        import glob
+        result_files = glob.glob("full_automation_*.json")
+        if result_files:
+            candidates.append((max(result_files, key=os.path.getctime), "full"))
+        elif os.path.exists("real_mbt_results.json"):
+            # Fallback to sample results
+            candidates.append(("real_mbt_results.json", "sample"))
     
-    print("✅ Grouping completed:")
-    for group_key, scenarios in grouped_results.items():
-        print(f"  {group_key}: {len(scenarios)} scenarios")
+    registered = 0
+    existing = sorted((os.path.getmtime(path), path, run_type) for path, run_type in candidates if os.path.exists(path))
+    for mtime, path, run_type in existing:
+        data = load_json_file(path)
+        if not data.get('results'):
+            continue
+        finished_at = datetime.fromtimestamp(mtime).isoformat(sep=' ', timespec='seconds')
+        materialize_run(data, run_type, results_file=path, finished_at=finished_at)
+        registered += 1
     
-    print(f"🔑 Enhanced data keys: {list(enhanced_data.keys())}")
-    return enhanced_data
+    print(f"📚 Run catalog backfilled from {registered} results files")
+    return registered
+
+def load_latest_run_data(run_type=ANY_RUN_TYPE):
+    """Materialized document of the newest run of a type via the run catalog, or None (blocking)."""
+    latest = db_manager.get_latest_run(run_type)
+    if latest is None:
+        return None
+    return load_materialized_version(latest['materialized_version'])
+
+def load_materialized_version(version):
+    """Serve a materialized version from memory, loading it from the database once."""
+    document = materialized_cache.get(version)
+    if document is not None:
+        return document
+
+    row = db_manager.get_materialized_results(version)
+    if row is None:
+        return None
+
+    format_version, document_json = row
+    document = json_loads(document_json)
+    if format_version != MATERIALIZED_FORMAT_VERSION:
+        # Stored with an older layout - rebuild from the embedded run data
+        document = build_materialized_results(document)
+
+    document = {**document, 'materialized_version': version}
+    materialized_cache.put(version, document)
+    return document
+
+def enhance_results_with_grouping_and_stats(data):
+    """Enhance results with grouping and summary statistics."""
+    return build_materialized_results(data)
 
 @app.get("/api/analytics-data")
-async def get_analytics_data():
+async def get_analytics_data(request: Request):
     """Get analytics data for charts from latest results."""
     try:
-        # Load latest results
-        if os.path.exists("latest_automation_results.json"):
-            with open("latest_automation_results.json", 'r') as f:
-                data = json.load(f)
-        else:
+        # Resolve the latest run; unchanged runs are answered with 304
+        latest = await run_blocking(db_manager.get_latest_run)
+        if latest is None:
             return {"error": "No automation results available for analytics"}
         
+        etag, last_modified = latest_run_validators("analytics-data", ANY_RUN_TYPE, latest)
+        not_modified = check_not_modified(request, etag, last_modified)
+        if not_modified:
+            return not_modified
+        
+        data = await run_blocking(load_materialized_version, latest['materialized_version'])
+        
         if not data.get('results'):
             return {"error": "No results data available"}
         
@@ -1020,19 +825,55 @@ async def get_analytics_data():
             'total_scenarios_analyzed': len(data['results'])
         }
         
-        return analytics_data
+        return FastJSONResponse(content=analytics_data, headers=cache_headers(etag, last_modified))
         
     except Exception as e:
         return {"error": f"Error generating analytics data: {e}"}
 
+def invalid_points(points):
+    """400 response for a downsampling budget LTTB can't honour, else None."""
+    if points is not None and points < MIN_POINTS:
+        return FastJSONResponse(status_code=400, content={"error": f"points must be at least {MIN_POINTS}"})
+    return None
+
+async def history_cache_version():
+    """History cache version for ETags, or the database revision until the cache has loaded."""
+    if history_cache.is_loaded:
+        return history_cache.version
+    return f"db-{await run_blocking(db_manager.get_history_revision)}"
+
 @app.get("/api/historical-data/{scenario_id}")
-async def get_historical_data(scenario_id: str):
-    """Get historical data for a specific scenario."""
+async def get_historical_data(request: Request, scenario_id: str, points: int = None):
+    """
+    Get historical data for a specific scenario: the last 30 runs, or with
+    `points` every run downsampled (LTTB) to at most that many points.
+    """
     try:
-        historical_data = db_manager.get_historical_data(scenario_id=scenario_id, days=30)
+        invalid = invalid_points(points)
+        if invalid:
+            return invalid
+        etag = make_etag("historical-data", scenario_id, points, await history_cache_version(),
+                         replica_sync_count())
+        not_modified = check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
         
-        return {
+        if not history_cache.is_loaded:
+            # LIMIT -1 reads every run when downsampling
+            historical_data = await run_blocking(db_manager.get_historical_data, scenario_id, None,
+                                                 -1 if points else 30)
+            if points:
+                source_points = len(historical_data)
+                historical_data = downsample_rows(historical_data, points, value_index=1)
+        elif points:
+            historical_data, source_points = await run_blocking(history_cache.scenario_history_downsampled,
+                                                                scenario_id, points)
+        else:
+            historical_data = await run_blocking(history_cache.scenario_history, scenario_id, 30)
+        
+        return FastJSONResponse(content=with_replica_marker({
             "scenario_id": scenario_id,
+            **({"source_points": source_points} if points else {}),
             "historical_data": [
                 {
                     "date": row[0],
@@ -1043,34 +884,42 @@ async def get_historical_data(scenario_id: str):
                 }
                 for row in historical_data
             ]
-        }
+        }), headers=replica_headers(cache_headers(etag)))
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": f"Error getting historical data: {e}"}
         )
 
 @app.get("/api/lender-trends/{lender_name}")
-async def get_lender_trends(lender_name: str):
-    """Get trends for a specific lender across all scenarios."""
+async def get_lender_trends(request: Request, lender_name: str, points: int = None):
+    """
+    Get trends for a specific lender across all scenarios: the newest 100 rows,
+    or with `points` the whole history with each scenario's line downsampled
+    (LTTB) so the response holds about that many points.
+    """
     try:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
+        invalid = invalid_points(points)
+        if invalid:
+            return invalid
+        etag = make_etag("lender-trends", lender_name, points, await history_cache_version(), replica_sync_count())
+        not_modified = check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
         
-        cursor.execute('''
-            SELECT lr.run_date, lr.scenario_id, lr.amount, lr.rank_position, s.description
-            FROM lender_results lr
-            JOIN scenarios s ON lr.scenario_id = s.scenario_id
-            WHERE lr.lender_name = ?
-            ORDER BY lr.run_date DESC, s.income
-            LIMIT 100
-        ''', (lender_name,))
-        
-        results = cursor.fetchall()
-        conn.close()
+        if not history_cache.is_loaded:
+            results = await run_blocking(db_manager.get_lender_trends, lender_name, -1 if points else 100)
+            if points:
+                source_points = len(results)
+                results = downsample_rows(results, points, value_index=2, group_index=1)
+        elif points:
+            results, source_points = await run_blocking(history_cache.lender_trends_downsampled, lender_name, points)
+        else:
+            results = await run_blocking(history_cache.lender_trends, lender_name, 100)
         
-        return {
+        return FastJSONResponse(content=with_replica_marker({
             "lender_name": lender_name,
+            **({"source_points": source_points} if points else {}),
             "trends": [
                 {
                     "date": row[0],
@@ -1081,9 +930,9 @@ async def get_lender_trends(lender_name: str):
                 }
                 for row in results
             ]
-        }
+        }), headers=replica_headers(cache_headers(etag)))
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": f"Error getting lender trends: {e}"}
         )
@@ -1182,244 +1031,396 @@ def get_applicant_type_simple(scenario_id):
 
 @app.get("/api/export-data/{format_type}")
 async def export_data(format_type: str):
-    """Export data in specified format - FIXED VERSION."""
+    """Stream the latest results to the client as a CSV or JSON download."""
     print(f"🔍 Export request received for format: {format_type}")
+    format_type = format_type.lower()
+    if format_type not in ('csv', 'json', 'excel'):
+        return FastJSONResponse(
+            status_code=400,
+            content={"error": "Invalid format. Use csv, excel, or json"}
+        )
+    
     try:
-        # Determine which results file to export (credit vs normal scenarios)
-        credit_file = "latest_credit_results.json"
-        normal_file = "latest_automation_results.json"
-        
-        # Check which file exists and is more recent
-        results_file = None
-        if os.path.exists(credit_file) and os.path.exists(normal_file):
-            # Both exist, use the more recent one
-            credit_time = os.path.getmtime(credit_file)
-            normal_time = os.path.getmtime(normal_file)
-            if credit_time > normal_time:
-                results_file = credit_file
-                print("📁 Using credit results (more recent)")
-            else:
-                results_file = normal_file
-                print("📁 Using normal results (more recent)")
-        elif os.path.exists(credit_file):
-            results_file = credit_file
-            print("📁 Using credit results (only available)")
-        elif os.path.exists(normal_file):
-            results_file = normal_file
-            print("📁 Using normal results (only available)")
-        else:
-            print("❌ No results file found")
-            return JSONResponse(
+        # Resolve the latest run through the run catalog, same as /api/latest-results
+        document = await run_blocking(load_latest_run_data)
+        if document is None:
+            print("❌ No catalogued runs found")
+            return FastJSONResponse(
                 status_code=404,
                 content={"error": "No results found. Run automation first."}
             )
-        
-        print(f"✅ Loading results file: {results_file}")
-        with open(results_file, 'r') as f:
-            data = json.load(f)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        data = strip_materialized_fields(document)
         results = data.get('results', {})
         
-        print(f"✅ Found {len(results)} scenarios to export")
-        
         if not results:
             print("❌ No scenario data found")
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=404,
                 content={"error": "No scenario results found in data."}
             )
         
-        # Simplified export logic that definitely works
-        if format_type.lower() == 'csv':
-            print("📄 Creating CSV export...")
-            filename = f"mbt_export_{timestamp}.csv"
-            
-            # Get all lenders
-            all_lenders = set()
-            for scenario_data in results.values():
-                lenders = scenario_data.get('lender_results', {})
-                all_lenders.update(lenders.keys())
-            all_lenders = sorted(list(all_lenders))
-            
-            print(f"✅ Found {len(all_lenders)} unique lenders")
-            
-            # Write CSV
-            print("📝 Writing CSV file...")
-            try:
-                with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.writer(csvfile)
-                    
-                    # Header
-                    header = ['Scenario_ID', 'Description', 'Gen_H_Amount', 'Market_Average', 'Gen_H_Rank', 'Total_Lenders']
-                    header.extend(all_lenders)
-                    writer.writerow(header)
-                    print(f"✅ Header written with {len(header)} columns")
-                    
-                    # Data
-                    rows_written = 0
-                    for scenario_id, scenario_data in results.items():
-                        stats = scenario_data.get('statistics', {})
-                        lenders = scenario_data.get('lender_results', {})
-                        
-                        row = [
-                            scenario_id,
-                            scenario_data.get('description', ''),
-                            stats.get('gen_h_amount', 0),
-                            int(stats.get('average', 0)),
-                            stats.get('gen_h_rank', 0),
-                            len(lenders)
-                        ]
-                        
-                        # Add lender amounts
-                        for lender in all_lenders:
-                            row.append(lenders.get(lender, 0))
-                        
-                        writer.writerow(row)
-                        rows_written += 1
-                    
-                    print(f"✅ CSV written: {rows_written} rows")
-            except Exception as e:
-                print(f"❌ CSV write error: {e}")
-                raise
-            
-        elif format_type.lower() == 'json':
-            filename = f"mbt_export_{timestamp}.json"
-            
-            export_data = {
-                'export_info': {
-                    'export_date': datetime.now().isoformat(),
-                    'total_scenarios': len(results),
-                    'format': 'json'
-                },
-                'data': data
-            }
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2)
-                
-        elif format_type.lower() == 'excel':
-            # For now, fallback to CSV for Excel requests
-            filename = f"mbt_export_{timestamp}.csv"
-            
-            all_lenders = set()
-            for scenario_data in results.values():
-                lenders = scenario_data.get('lender_results', {})
-                all_lenders.update(lenders.keys())
-            all_lenders = sorted(list(all_lenders))
-            
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                header = ['Scenario_ID', 'Description', 'Gen_H_Amount', 'Market_Average', 'Gen_H_Rank', 'Total_Lenders']
-                header.extend(all_lenders)
-                writer.writerow(header)
-                
-                for scenario_id, scenario_data in results.items():
-                    stats = scenario_data.get('statistics', {})
-                    lenders = scenario_data.get('lender_results', {})
-                    
-                    row = [
-                        scenario_id,
-                        scenario_data.get('description', ''),
-                        stats.get('gen_h_amount', 0),
-                        int(stats.get('average', 0)),
-                        stats.get('gen_h_rank', 0),
-                        len(lenders)
-                    ]
-                    
-                    for lender in all_lenders:
-                        row.append(lenders.get(lender, 0))
-                    
-                    writer.writerow(row)
-            
-        else:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Invalid format. Use csv, excel, or json"}
-            )
+        print(f"✅ Streaming {len(results)} scenarios as {format_type}")
         
-        # Check if file was created successfully
-        if os.path.exists(filename):
-            file_size = os.path.getsize(filename)
-            return {
-                "success": True, 
-                "filename": filename, 
-                "message": f"Data exported to {filename} ({file_size} bytes)",
-                "scenarios_exported": len(results)
-            }
+        if format_type == 'json':
+            filename, media_type = export_filename('json'), MEDIA_TYPES['json']
+            body = stream_results_json(data)
+        elif format_type == 'excel':
+            filename, media_type = export_filename('xlsx'), XLSX_MEDIA_TYPE
+            body = stream_results_xlsx(data)
         else:
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Export file was not created"}
-            )
+            filename, media_type = export_filename('csv'), MEDIA_TYPES['csv']
+            body = stream_csv(iter_result_rows(results))
+        
+        return StreamingResponse(body, media_type=media_type, headers=attachment_headers(filename))
             
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
         print(f"Export error: {error_details}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": f"Export error: {str(e)}"}
         )
 
+HISTORY_MONEY_COLUMNS = ('gen_h_amount', 'average_amount', 'gen_h_difference', 'amount')
+
+@app.get("/api/export-history/{format_type}")
+async def export_history(format_type: str, start: str = None, end: str = None, source: str = "local"):
+    """
+    Stream every scenario and lender result across runs (optionally a start/end date range).
+    source=supabase streams Supabase scenario_results instead (csv or jsonl).
+    """
+    format_type = format_type.lower()
+    if format_type not in ('csv', 'xlsx', 'jsonl'):
+        return FastJSONResponse(
+            status_code=400,
+            content={"error": "Invalid format. Use csv, xlsx, or jsonl"}
+        )
+    if source not in ('local', 'supabase') or (source == 'supabase' and format_type == 'xlsx'):
+        return FastJSONResponse(
+            status_code=400,
+            content={"error": "source must be local, or supabase with csv or jsonl"}
+        )
+    try:
+        for value in (start, end):
+            if value:
+                date.fromisoformat(value)
+    except ValueError:
+        return FastJSONResponse(
+            status_code=400,
+            content={"error": "start and end must be YYYY-MM-DD dates"}
+        )
+    
+    print(f"🔍 History export requested: {format_type} from {source} ({start or 'beginning'} to {end or 'now'})")
+    if source == 'supabase':
+        if not SUPABASE_AVAILABLE or not supabase_manager.is_connected():
+            return FastJSONResponse(status_code=503, content={"error": "Supabase is not configured"})
+        until = (date.fromisoformat(end) + timedelta(days=1)).isoformat() if end else None
+        pages = supabase_manager.iter_scenario_results(since=start, until=until)
+        return StreamingResponse(
+            stream_record_pages(SCENARIO_RESULT_COLUMNS, pages, format_type),
+            media_type=MEDIA_TYPES[format_type],
+            headers=attachment_headers(export_filename(format_type, prefix="mbt_supabase_history"))
+        )
+    
+    # Chunks are read on short-lived connections, so an aborted download holds none
+    rows = (row for chunk in db_manager.iter_history_chunks(start, end) for row in chunk)
+    filename = export_filename(format_type, prefix="mbt_history")
+    
+    if format_type == 'xlsx':
+        body = stream_rows_xlsx(HISTORY_EXPORT_COLUMNS, rows, money_columns=HISTORY_MONEY_COLUMNS)
+        media_type = XLSX_MEDIA_TYPE
+    elif format_type == 'jsonl':
+        body = stream_jsonl(HISTORY_EXPORT_COLUMNS, rows)
+        media_type = MEDIA_TYPES['jsonl']
+    else:
+        body = stream_csv(itertools.chain([HISTORY_EXPORT_COLUMNS], rows))
+        media_type = MEDIA_TYPES['csv']
+    
+    return StreamingResponse(body, media_type=media_type, headers=attachment_headers(filename))
+
+def replica_sync_count():
+    """Completed replica syncs (part of historical ETags, as bodies carry the replica position)."""
+    return supabase_replica.sync_count if supabase_replica else None
+
+def with_replica_marker(content):
+    """Historical response body with the replica position added when the Supabase mirror is on."""
+    if supabase_replica is None:
+        return content
+    return {**content, "replica": supabase_replica.marker()}
+
+def replica_headers(headers=None):
+    """Historical response headers with replica staleness added when the Supabase mirror is on."""
+    if supabase_replica is None:
+        return headers
+    return {**(headers or {}), **supabase_replica.headers()}
+
+def with_replica_headers(response):
+    if supabase_replica is not None:
+        response.headers.update(supabase_replica.headers())
+    return response
+
+async def history_backend_etag(variant, *parameters):
+    """ETag for a historical analytics response, or None when the backend has no change token."""
+    revision = await history_backend.revision()
+    if revision is None:
+        return None
+    return make_etag(variant, *parameters, history_backend.name, revision, replica_sync_count())
+
 @app.get("/api/historical-summary")
-async def get_historical_summary():
-    """Get historical summary statistics from Supabase."""
+async def get_historical_summary(request: Request):
+    """Get historical summary statistics."""
     try:
-        summary = supabase_manager.get_historical_summary()
-        return JSONResponse(content=summary)
+        etag = await history_backend_etag("historical-summary")
+        not_modified = etag and check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
+        
+        summary = await history_backend.get_historical_summary()
+        return FastJSONResponse(content=with_replica_marker(summary),
+                                headers=replica_headers(cache_headers(etag) if etag else None))
     except Exception as e:
         print(f"❌ Error getting historical summary: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": f"Failed to get historical summary: {str(e)}"}
         )
 
+# The over-time charts also take granularity=run (the last 20 runs)
+RUN_OR_ROLLUP_GRANULARITIES = ("auto", "run", *GRANULARITIES)
+
+async def rollup_response(request: Request, variant, load_rows, to_points, start, end, granularity, group,
+                          accepted=("auto", *GRANULARITIES)):
+    """
+    Chart series from the period rollups. granularity=auto picks day, week or
+    month from the [start, end] range; start is aligned to its period.
+    `accepted` lists the granularities the calling endpoint takes, for errors.
+    """
+    try:
+        start, end = parse_range(start, end)
+    except ValueError:
+        return FastJSONResponse(status_code=400, content={"error": "start and end must be YYYY-MM-DD dates"})
+    if granularity == "auto":
+        granularity = choose_granularity(start, end)
+    if granularity not in GRANULARITIES:
+        return FastJSONResponse(status_code=400, content={
+            "error": f"granularity must be {', '.join(accepted[:-1])} or {accepted[-1]}"})
+    if start:
+        start = period_bounds(granularity, start)[0]
+
+    revision = await run_blocking(db_manager.get_history_revision)
+    etag = make_etag(variant, granularity, start, end, group, revision, replica_sync_count())
+    not_modified = check_not_modified(request, etag)
+    if not_modified:
+        return with_replica_headers(not_modified)
+
+    rows = await run_blocking(load_rows, granularity, start, end, group)
+    return FastJSONResponse(content=with_replica_marker({
+        "granularity": granularity,
+        "scenario_group": group,
+        "data": to_points(rows, granularity)
+    }), headers=replica_headers(cache_headers(etag)))
+
 @app.get("/api/historical-gen-h-rank")
-async def get_gen_h_rank_over_time():
-    """Get Gen H rank over time for charting."""
+async def get_gen_h_rank_over_time(request: Request, start: str = None, end: str = None,
+                                   granularity: str = "auto", group: str = ALL_GROUPS):
+    """
+    Get Gen H rank over time for charting. With granularity=run, or no range
+    and no granularity, this is the last 20 runs, otherwise daily, weekly or
+    monthly rollups for the scenario group.
+    """
     try:
-        data = supabase_manager.get_gen_h_rank_over_time(limit=20)
-        return JSONResponse(content={"data": data})
+        if granularity != "run" and (start or end or granularity != "auto"):
+            return await rollup_response(request, "historical-gen-h-rank-rollup", db_manager.get_group_rollups,
+                                         group_rollup_points, start, end, granularity, group,
+                                         accepted=RUN_OR_ROLLUP_GRANULARITIES)
+
+        etag = await history_backend_etag("historical-gen-h-rank")
+        not_modified = etag and check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
+        
+        data = await history_backend.get_gen_h_rank_over_time(limit=20)
+        return FastJSONResponse(content=with_replica_marker({"data": data}),
+                                headers=replica_headers(cache_headers(etag) if etag else None))
     except Exception as e:
         print(f"❌ Error getting Gen H rank over time: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": f"Failed to get Gen H rank data: {str(e)}"}
         )
 
 @app.get("/api/historical-gen-h-gap")
-async def get_gen_h_gap_over_time():
-    """Get Gen H vs average lender gap over time."""
+async def get_gen_h_gap_over_time(request: Request, start: str = None, end: str = None,
+                                  granularity: str = "auto", group: str = ALL_GROUPS):
+    """Get Gen H vs average lender gap over time (last 20 runs, or rollups for a range)."""
     try:
-        data = supabase_manager.get_gen_h_vs_average_gap_over_time(limit=20)
-        return JSONResponse(content={"data": data})
+        if granularity != "run" and (start or end or granularity != "auto"):
+            return await rollup_response(request, "historical-gen-h-gap-rollup", db_manager.get_group_rollups,
+                                         group_rollup_points, start, end, granularity, group,
+                                         accepted=RUN_OR_ROLLUP_GRANULARITIES)
+
+        etag = await history_backend_etag("historical-gen-h-gap")
+        not_modified = etag and check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
+        
+        data = await history_backend.get_gen_h_vs_average_gap_over_time(limit=20)
+        return FastJSONResponse(content=with_replica_marker({"data": data}),
+                                headers=replica_headers(cache_headers(etag) if etag else None))
     except Exception as e:
         print(f"❌ Error getting Gen H gap over time: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": f"Failed to get Gen H gap data: {str(e)}"}
         )
 
+@app.get("/api/lender-rollups/{lender_name}")
+async def get_lender_rollups(request: Request, lender_name: str, start: str = None, end: str = None,
+                             granularity: str = "auto", group: str = ALL_GROUPS):
+    """
+    Mean amount and rank of one lender per day, week or month, for a scenario
+    group. Zero amounts count, as they do in the scenario statistics.
+    """
+    try:
+        def load_rows(granularity, start, end, group):
+            return db_manager.get_lender_rollups(lender_name, granularity, start, end, group)
+
+        return await rollup_response(request, f"lender-rollups:{lender_name}", load_rows,
+                                     lender_rollup_points, start, end, granularity, group)
+    except Exception as e:
+        print(f"❌ Error getting lender rollups: {e}")
+        return FastJSONResponse(
+            status_code=500,
+            content={"error": f"Failed to get lender rollups: {str(e)}"}
+        )
+
+@app.get("/api/lender-results")
+async def query_lender_results(request: Request, lenders: str = None, groups: str = None, income_min: int = None,
+                               income_max: int = None, credit: bool = None, start: str = None, end: str = None,
+                               sort: str = "date", order: str = "asc", fields: str = None,
+                               limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """
+    Lender results filtered by lenders and scenario groups (comma-separated),
+    income band, credit flag and run date range, sorted by date, amount or
+    rank. Pass `next_cursor` back as `cursor` for the following page.
+    """
+    try:
+        if sort not in SORT_KEYS:
+            return FastJSONResponse(status_code=400, content={"error": f"sort must be one of {', '.join(SORT_KEYS)}"})
+        if order not in ("asc", "desc"):
+            return FastJSONResponse(status_code=400, content={"error": "order must be asc or desc"})
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return FastJSONResponse(status_code=400, content={"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"})
+        try:
+            start, end = parse_range(start, end)
+        except ValueError:
+            return FastJSONResponse(status_code=400, content={"error": "start and end must be YYYY-MM-DD dates"})
+        try:
+            projection = parse_fields(fields)
+            after = decode_cursor(cursor, sort) if cursor else None
+        except ValueError as e:
+            return FastJSONResponse(status_code=400, content={"error": str(e)})
+
+        revision = await run_blocking(db_manager.get_history_revision)
+        etag = make_etag("lender-results", lenders, groups, income_min, income_max, credit, start, end,
+                         sort, order, projection, limit, cursor, revision, replica_sync_count())
+        not_modified = check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
+
+        filters = {"lenders": parse_list(lenders), "groups": parse_list(groups), "income_min": income_min,
+                   "income_max": income_max, "credit": credit, "start": start, "end": end}
+        rows, next_key = await run_blocking(db_manager.query_lender_results, filters, projection, sort,
+                                            order == "desc", after, limit)
+        return FastJSONResponse(content=with_replica_marker({
+            "rows": lender_result_records(projection, rows),
+            "count": len(rows),
+            "next_cursor": encode_cursor(next_key) if next_key else None
+        }), headers=replica_headers(cache_headers(etag)))
+    except Exception as e:
+        print(f"❌ Error querying lender results: {e}")
+        return FastJSONResponse(
+            status_code=500,
+            content={"error": f"Failed to query lender results: {str(e)}"}
+        )
+
+@app.get("/api/scenario-rank-movements")
+async def get_scenario_rank_movements(request: Request, runs: int = DEFAULT_RUNS, group: str = None):
+    """
+    Gen H rank deltas, streaks and volatility per scenario and scenario group
+    over the last `runs` runs, optionally for one group only.
+    """
+    if not 2 <= runs <= MAX_RUNS:
+        return FastJSONResponse(status_code=400, content={"error": f"runs must be between 2 and {MAX_RUNS}"})
+    try:
+        etag = await history_backend_etag("scenario-rank-movements", runs, group)
+        not_modified = etag and check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
+        
+        movements = await history_backend.get_rank_movements(runs)
+        if group and 'error' not in movements:
+            movements = {
+                "runs": movements["runs"],
+                "scenarios": {scenario_id: movement for scenario_id, movement in movements["scenarios"].items()
+                              if movement["group"] == group},
+                "groups": {name: totals for name, totals in movements["groups"].items() if name == group}
+            }
+        return FastJSONResponse(content=with_replica_marker(movements),
+                                headers=replica_headers(cache_headers(etag) if etag else None))
+    except Exception as e:
+        print(f"❌ Error getting scenario rank movements: {e}")
+        return FastJSONResponse(
+            status_code=500,
+            content={"error": f"Failed to get rank movements: {str(e)}"}
+        )
+
 @app.get("/api/scenario-rank-changes")
-async def get_scenario_rank_changes():
+async def get_scenario_rank_changes(request: Request):
     """Get rank changes for each scenario type between last two runs."""
     try:
-        changes = supabase_manager.get_scenario_rank_changes()
-        return JSONResponse(content=changes)
+        etag = await history_backend_etag("scenario-rank-changes")
+        not_modified = etag and check_not_modified(request, etag)
+        if not_modified:
+            return with_replica_headers(not_modified)
+        
+        changes = await history_backend.get_scenario_rank_changes()
+        # The body is keyed by scenario group, so replica freshness is reported in headers only
+        return FastJSONResponse(content=changes, headers=replica_headers(cache_headers(etag) if etag else None))
     except Exception as e:
         print(f"❌ Error getting scenario rank changes: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"error": f"Failed to get rank changes: {str(e)}"}
         )
 
+@app.get("/api/run-progress")
+async def get_run_progress():
+    """Live aggregates of automation runs in progress."""
+    return {
+        "runs": {session_id: aggregates.snapshot() for session_id, aggregates in list(active_runs.items())},
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Event-loop lag, blocking I/O pool, history cache, Supabase outbox and replica metrics."""
+    return {
+        "event_loop_lag": loop_lag_monitor.snapshot(),
+        "blocking_io_pool": executor_stats(),
+        "history_cache": history_cache.memory_usage(),
+        "history_backend": history_backend.name,
+        "supabase_outbox": await run_blocking(supabase_outbox.stats),
+        "supabase_replica": await run_blocking(supabase_replica.stats) if supabase_replica else None,
+        "timestamp": datetime.now().isoformat()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     import os
@@ -8,6 +8,7 @@ import csv
 import pandas as pd
 from datetime import datetime
 import os
+from xlsx_export import write_results_workbook
 
 def load_latest_results():
     """Load the latest automation results."""
@@ -76,82 +77,7 @@ def export_to_excel(data, filename=None):
         filename = f"mbt_results_{timestamp}.xlsx"
     
     try:
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            
-            # Sheet 1: Summary Overview
-            summary_data = []
-            for scenario_id, scenario_data in data.get('results', {}).items():
-                stats = scenario_data.get('statistics', {})
-                summary_data.append({
-                    'Scenario': scenario_data.get('description', scenario_id),
-                    'Employment Type': get_employment_type(scenario_id),
-                    'Applicant Type': get_applicant_type(scenario_id),
-                    'Income': extract_income_from_description(scenario_data.get('description', '')),
-                    'Gen H Amount': f"£{stats.get('gen_h_amount', 0):,}",
-                    'Market Average': f"£{stats.get('average', 0):,.0f}",
-                    'Gen H Rank': stats.get('gen_h_rank', 'N/A'),
-                    'Total Lenders': len(scenario_data.get('lender_results', {})),
-                    'Performance vs Average': f"{'+'if stats.get('gen_h_difference', 0) >= 0 else ''}£{stats.get('gen_h_difference', 0):,.0f}"
-                })
-            
-            df_summary = pd.DataFrame(summary_data)
-            df_summary.to_excel(writer, sheet_name='Summary', index=False)
-            
-            # Sheet 2: Detailed Lender Results
-            detailed_data = []
-            for scenario_id, scenario_data in data.get('results', {}).items():
-                lenders = scenario_data.get('lender_results', {})
-                sorted_lenders = sorted(lenders.items(), key=lambda x: x[1], reverse=True)
-                
-                for rank, (lender, amount) in enumerate(sorted_lenders, 1):
-                    detailed_data.append({
-                        'Scenario': scenario_data.get('description', scenario_id),
-                        'Lender': lender,
-                        'Amount': amount,
-                        'Formatted Amount': f"£{amount:,}",
-                        'Rank in Scenario': rank,
-                        'Employment Type': get_employment_type(scenario_id),
-                        'Applicant Type': get_applicant_type(scenario_id)
-                    })
-            
-            df_detailed = pd.DataFrame(detailed_data)
-            df_detailed.to_excel(writer, sheet_name='Detailed Results', index=False)
-            
-            # Sheet 3: Gen H Performance Analysis
-            gen_h_data = []
-            for scenario_id, scenario_data in data.get('results', {}).items():
-                stats = scenario_data.get('statistics', {})
-                gen_h_amount = stats.get('gen_h_amount', 0)
-                
-                if gen_h_amount > 0:
-                    gen_h_data.append({
-                        'Scenario': scenario_data.get('description', scenario_id),
-                        'Gen H Amount': f"£{gen_h_amount:,}",
-                        'Rank': stats.get('gen_h_rank', 'N/A'),
-                        'Difference vs Average': f"{'+'if stats.get('gen_h_difference', 0) >= 0 else ''}£{stats.get('gen_h_difference', 0):,.0f}",
-                        'Performance': 'Above Average' if stats.get('gen_h_difference', 0) > 0 else 'Below Average' if stats.get('gen_h_difference', 0) < 0 else 'At Average',
-                        'Employment Type': get_employment_type(scenario_id),
-                        'Income Level': extract_income_from_description(scenario_data.get('description', ''))
-                    })
-            
-            df_gen_h = pd.DataFrame(gen_h_data)
-            df_gen_h.to_excel(writer, sheet_name='Gen H Analysis', index=False)
-            
-            # Sheet 4: Statistics Summary
-            if 'summary_statistics' in data:
-                stats_summary = data['summary_statistics']
-                stats_data = [
-                    ['Total Scenarios', stats_summary.get('total_scenarios', 0)],
-                    ['Average Gen H Rank', stats_summary.get('average_gen_h_rank', 'N/A')],
-                    ['Ranked 1st (%)', f"{stats_summary.get('rank_percentages', {}).get('rank_1_percent', 0)}%"],
-                    ['Ranked 2nd (%)', f"{stats_summary.get('rank_percentages', {}).get('rank_2_percent', 0)}%"],
-                    ['Ranked 3rd (%)', f"{stats_summary.get('rank_percentages', {}).get('rank_3_percent', 0)}%"],
-                    ['Top 3 Overall (%)', f"{stats_summary.get('top_3_percent', 0)}%"],
-                    ['Export Date', datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                ]
-                
-                df_stats = pd.DataFrame(stats_data, columns=['Metric', 'Value'])
-                df_stats.to_excel(writer, sheet_name='Statistics', index=False)
+        write_results_workbook(data, filename)
         
         print(f"✅ Excel exported: {filename}")
         return filename
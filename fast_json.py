@@ -0,0 +1,52 @@
+"""
+Fast JSON serialization for API responses and persisted result files
+Uses orjson when it is installed and falls back to the stdlib encoder with
+compact separators, so output is equivalent either way.
+"""
+
+import json
+from datetime import date
+from typing import Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    print("⚠️ orjson not available - using stdlib json encoder")
+
+if ORJSON_AVAILABLE:
+    # numpy scalars/arrays come out of the statistics code, int keys out of rank counts
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Values the stdlib encoder can't handle, converted the way orjson writes them."""
+    if type(value).__module__ == 'numpy':
+        # Scalars via .item(), arrays via .tolist(), so numbers stay numbers
+        return value.tolist() if hasattr(value, 'shape') and value.shape else value.item()
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(data: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, compact unless `indent` is set (2 spaces)."""
+    if ORJSON_AVAILABLE:
+        options = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else _ORJSON_OPTIONS
+        return orjson.dumps(data, option=options)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2, default=_default).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps(data: Any, indent: bool = False) -> str:
+    """Serialize to a JSON string (for TEXT columns)."""
+    return dumps_bytes(data, indent).decode("utf-8")
+
+
+def loads(raw) -> Any:
+    """Parse JSON from str or bytes."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
@@ -0,0 +1,184 @@
+"""
+Pluggable backends for the historical analytics endpoints
+Every backend serves the SupabaseManager read interface (summary, Gen H
+rank and gap over time, scenario rank changes) as coroutines. Choose one
+with HISTORY_BACKEND:
+
+    memory    in-process HistoryCache over the local database (default)
+    sqlite    SQL against the local mbt_affordability_history.db
+    supabase  the remote Supabase project
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from blocking_io import run_blocking
+from rank_movements import DEFAULT_RUNS, rank_matrix_from_rows, rank_movements
+from scenario_groups import rank_changes_by_group
+
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "memory").lower()
+
+EMPTY_SUMMARY = {
+    'total_runs': 0,
+    'average_gen_h_rank': 0,
+    'best_performing_scenario': 'No data',
+    'last_run': 'No runs yet'
+}
+
+
+def iso_timestamp(timestamp: Optional[str]) -> Optional[str]:
+    """'YYYY-MM-DD HH:MM:SS' as ISO 8601, which every browser's Date() parses."""
+    return timestamp.replace(' ', 'T') if timestamp else timestamp
+
+
+class HistoryBackend(ABC):
+    """Interface shared by the local backends and AsyncSupabaseManager."""
+
+    name = 'base'
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def revision(self):
+        """Token that changes whenever the data changes (ETag input), or None if unknown."""
+        return None
+
+    @abstractmethod
+    async def get_historical_summary(self) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_gen_h_rank_over_time(self, limit: int = 20) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_gen_h_vs_average_gap_over_time(self, limit: int = 20) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_scenario_rank_changes(self) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_rank_movements(self, runs: int = DEFAULT_RUNS) -> Dict:
+        raise NotImplementedError
+
+
+class SQLiteHistoryBackend(HistoryBackend):
+    """Aggregates computed by SQL on the local history database."""
+
+    name = 'sqlite'
+
+    def __init__(self, db):
+        self.db = db
+
+    async def revision(self):
+        return await run_blocking(self.db.get_history_revision)
+
+    async def get_historical_summary(self) -> Dict:
+        total_runs, average_rank, best_scenario, last_run = await run_blocking(self.db.get_history_summary_row)
+        if last_run is None:
+            return {**EMPTY_SUMMARY, 'total_runs': total_runs}
+        return {
+            'total_runs': total_runs,
+            'average_gen_h_rank': round(average_rank, 2) if average_rank else 0,
+            'best_performing_scenario': best_scenario or 'No data',
+            'last_run': iso_timestamp(last_run)
+        }
+
+    async def get_gen_h_rank_over_time(self, limit: int = 20) -> List[Dict]:
+        rows = await run_blocking(self.db.get_run_series, limit)
+        return [{'run_timestamp': iso_timestamp(started_at), 'run_type': run_type,
+                 'average_gen_h_rank': round(average_rank or 0, 2)}
+                for started_at, run_type, average_rank, _ in rows]
+
+    async def get_gen_h_vs_average_gap_over_time(self, limit: int = 20) -> List[Dict]:
+        rows = await run_blocking(self.db.get_run_series, limit)
+        return [{'run_timestamp': iso_timestamp(started_at), 'run_type': run_type,
+                 'average_gap': round(average_gap or 0, 2)}
+                for started_at, run_type, _, average_gap in rows]
+
+    async def get_scenario_rank_changes(self) -> Dict:
+        runs = await run_blocking(self.db.get_latest_scenario_ranks, 2)
+        if len(runs) < 2:
+            return {'error': 'Need at least 2 runs to calculate rank changes'}
+        return rank_changes_by_group(runs[0], runs[1])
+
+    async def get_rank_movements(self, runs: int = DEFAULT_RUNS) -> Dict:
+        rows = await run_blocking(self.db.get_recent_scenario_ranks, runs)
+        labels, scenario_ids, ranks = rank_matrix_from_rows(rows)
+        return rank_movements([iso_timestamp(label) for label in labels], scenario_ids, ranks)
+
+
+class MemoryHistoryBackend(HistoryBackend):
+    """
+    Served from the in-process HistoryCache, off the event loop. Until the cache
+    has loaded, reads go to `local` (the SQLite store it is loaded from); while
+    it holds no runs, to `fallback` (e.g. Supabase on a fresh deploy).
+    """
+
+    name = 'memory'
+
+    def __init__(self, cache, fallback: Optional[HistoryBackend] = None, local: Optional[HistoryBackend] = None):
+        self.cache = cache
+        self.fallback = fallback
+        self.local = local
+
+    def _source(self):
+        if not self.cache.is_loaded and self.local is not None:
+            return self.local
+        if not self.cache.has_runs and self.fallback is not None and self.fallback.is_connected():
+            return self.fallback
+        return None
+
+    async def revision(self):
+        fallback = self._source()
+        return await fallback.revision() if fallback else self.cache.version
+
+    async def get_historical_summary(self) -> Dict:
+        fallback = self._source()
+        if fallback:
+            return await fallback.get_historical_summary()
+        return await run_blocking(self.cache.historical_summary)
+
+    async def get_gen_h_rank_over_time(self, limit: int = 20) -> List[Dict]:
+        fallback = self._source()
+        if fallback:
+            return await fallback.get_gen_h_rank_over_time(limit)
+        return await run_blocking(self.cache.rank_over_time, limit)
+
+    async def get_gen_h_vs_average_gap_over_time(self, limit: int = 20) -> List[Dict]:
+        fallback = self._source()
+        if fallback:
+            return await fallback.get_gen_h_vs_average_gap_over_time(limit)
+        return await run_blocking(self.cache.gap_over_time, limit)
+
+    async def get_scenario_rank_changes(self) -> Dict:
+        fallback = self._source()
+        if fallback:
+            return await fallback.get_scenario_rank_changes()
+        return await run_blocking(self.cache.scenario_rank_changes)
+
+    async def get_rank_movements(self, runs: int = DEFAULT_RUNS) -> Dict:
+        fallback = self._source()
+        if fallback:
+            return await fallback.get_rank_movements(runs)
+        return rank_movements(*await run_blocking(self.cache.recent_rank_matrix, runs))
+
+
+def create_history_backend(name: str, db, cache, supabase=None) -> HistoryBackend:
+    """
+    The configured backend. 'supabase' without a client (not configured, or the
+    local replica is serving reads) falls back to memory.
+    """
+    if name == 'sqlite':
+        return SQLiteHistoryBackend(db)
+    if name == 'supabase':
+        if supabase is not None and supabase.is_connected():
+            return supabase
+        print("⚠️ HISTORY_BACKEND=supabase is unavailable (not configured or replica enabled) - "
+              "using the local history cache")
+    elif name != 'memory':
+        print(f"⚠️ Unknown HISTORY_BACKEND '{name}' - using the local history cache")
+    return MemoryHistoryBackend(cache, fallback=supabase, local=SQLiteHistoryBackend(db) if db is not None else None)
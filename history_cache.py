@@ -0,0 +1,451 @@
+"""
+Compact in-memory history cache for the trend and rank endpoints
+History is loaded once at startup into integer-coded, array-backed columns
+(int32 amounts, int8 ranks, int16 lender/scenario codes) with per-lender and
+per-scenario row indexes, and extended in place when a run completes, so
+trend queries are answered from memory without touching storage. A full
+reload builds a fresh copy off to the side and swaps it in, so queries keep
+answering from the previous history meanwhile.
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from downsampling import grouped_lttb_indices, lttb_indices, timestamps_to_seconds
+from scenario_groups import rank_changes_by_group, scenario_attributes
+
+
+class _Column:
+    """Append-only typed array with amortised capacity doubling."""
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values) -> None:
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, len(self._data) * 2), dtype=self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:needed] = values
+        self.size = needed
+
+    def trim(self) -> None:
+        self._data = self._data[:self.size].copy()
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _iso(timestamp: str) -> str:
+    return timestamp.replace(' ', 'T') if timestamp else timestamp
+
+
+class HistoryCache:
+    """Process-local columnar copy of run, scenario and lender history."""
+
+    def __init__(self):
+        # Queries and swaps/appends take _lock briefly; loads and added runs are serialised by _write_lock
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        # Bumped on every change and never reset, so ETags built from it stay unique
+        self.version = 0
+        self.loaded_at = None
+        self._reset()
+
+    def _reset(self):
+        # Dimensions: Python lists of labels, codes are list positions
+        self.lender_names: List[str] = []
+        self.scenario_ids: List[str] = []
+        self.scenario_descriptions: List[str] = []
+        self._lender_codes: Dict[str, int] = {}
+        self._scenario_codes: Dict[str, int] = {}
+
+        # Runs with results, oldest first
+        self.run_sessions: List[str] = []
+        self.run_types: List[str] = []
+        self.run_started: List[str] = []
+        self._run_index: Dict[str, int] = {}
+        self.total_runs = 0
+
+        # One row per (run, scenario)
+        self.sf_run = _Column(np.int32)
+        self.sf_scenario = _Column(np.int16)
+        self.sf_gen_h_amount = _Column(np.int32)
+        self.sf_average = _Column(np.int32)
+        self.sf_difference = _Column(np.int32)
+        self.sf_rank = _Column(np.int8)
+
+        # One row per (run, scenario, lender)
+        self.lf_run = _Column(np.int32)
+        self.lf_scenario = _Column(np.int16)
+        self.lf_lender = _Column(np.int16)
+        self.lf_amount = _Column(np.int32)
+        self.lf_rank = _Column(np.int8)
+
+        # Row positions per lender / scenario, in run order
+        self._lender_rows: Dict[int, _Column] = {}
+        self._scenario_rows: Dict[int, _Column] = {}
+
+        # Per-run aggregates for the over-time charts
+        self.run_average_rank = _Column(np.float32, 64)
+        self.run_average_gap = _Column(np.float32, 64)
+
+    # ---- dimension codes -------------------------------------------------
+
+    def _lender_code(self, name: str) -> int:
+        code = self._lender_codes.get(name)
+        if code is None:
+            code = self._lender_codes[name] = len(self.lender_names)
+            self.lender_names.append(name)
+            self._lender_rows[code] = _Column(np.int32, 256)
+        return code
+
+    def _scenario_code(self, scenario_id: str, description: str) -> int:
+        code = self._scenario_codes.get(scenario_id)
+        if code is None:
+            code = self._scenario_codes[scenario_id] = len(self.scenario_ids)
+            self.scenario_ids.append(scenario_id)
+            self.scenario_descriptions.append(description or '')
+            self._scenario_rows[code] = _Column(np.int32, 64)
+        return code
+
+    # ---- loading ---------------------------------------------------------
+
+    def _append_run(self, session_id: str, run_type: str, started_at: str, rows) -> None:
+        """
+        Append one run from rows of (scenario_id, description, gen_h_amount,
+        average_amount, gen_h_difference, gen_h_rank, lender_name, amount, rank).
+        """
+        run = len(self.run_sessions)
+        self.run_sessions.append(session_id)
+        self.run_types.append(run_type or 'unknown')
+        self.run_started.append(started_at)
+        self._run_index[session_id] = run
+
+        # Within a run, trends list scenarios by income like the SQL query did
+        incomes = {scenario_id: scenario_attributes(scenario_id)['income'] for scenario_id in {row[0] for row in rows}}
+        rows = sorted(rows, key=lambda row: (incomes[row[0]], row[0]))
+
+        scenario_rows, lender_rows = [], []
+        seen = set()
+        for scenario_id, description, gen_h, average, difference, rank, lender, amount, lender_rank in rows:
+            scenario = self._scenario_code(scenario_id, description)
+            if scenario not in seen:
+                seen.add(scenario)
+                scenario_rows.append((scenario, _int(gen_h), _int(average), _int(difference), _int(rank)))
+            if lender is not None:
+                lender_rows.append((scenario, self._lender_code(lender), _int(amount), _int(lender_rank)))
+
+        base = self.sf_run.size
+        if scenario_rows:
+            scenarios, gen_h, average, difference, rank = zip(*scenario_rows)
+            self.sf_run.extend([run] * len(scenario_rows))
+            self.sf_scenario.extend(scenarios)
+            self.sf_gen_h_amount.extend(gen_h)
+            self.sf_average.extend(average)
+            self.sf_difference.extend(difference)
+            self.sf_rank.extend(np.clip(rank, 0, 127))
+            for offset, scenario in enumerate(scenarios):
+                self._scenario_rows[scenario].extend([base + offset])
+
+            ranks = np.asarray(rank)
+            ranked = ranks > 0
+            self.run_average_rank.extend([ranks[ranked].mean() if ranked.any() else 0])
+            self.run_average_gap.extend([np.mean(difference)])
+        else:
+            self.run_average_rank.extend([0])
+            self.run_average_gap.extend([0])
+
+        base = self.lf_run.size
+        if lender_rows:
+            scenarios, lenders, amounts, ranks = zip(*lender_rows)
+            self.lf_run.extend([run] * len(lender_rows))
+            self.lf_scenario.extend(scenarios)
+            self.lf_lender.extend(lenders)
+            self.lf_amount.extend(amounts)
+            self.lf_rank.extend(np.clip(ranks, 0, 127))
+            lenders = np.asarray(lenders)
+            positions = np.arange(base, base + len(lender_rows), dtype=np.int32)
+            for code in np.unique(lenders):
+                self._lender_rows[int(code)].extend(positions[lenders == code])
+
+    def _build(self, db) -> 'HistoryCache':
+        """A fresh cache holding the whole history of the database (blocking, takes no locks)."""
+        fresh = HistoryCache()
+        fresh.total_runs = len(db.list_runs())
+        current, rows = None, []
+        for chunk in db.iter_history_chunks():
+            for (started_at, session_id, run_type, scenario_id, description,
+                 gen_h, average, difference, rank, lender, amount, lender_rank) in chunk:
+                if current is not None and session_id != current[0]:
+                    fresh._append_run(*current, rows)
+                    rows = []
+                current = (session_id, run_type, started_at)
+                rows.append((scenario_id, description, gen_h, average, difference, rank,
+                             lender, amount, lender_rank))
+        if current is not None:
+            fresh._append_run(*current, rows)
+        for column in fresh._columns():
+            column.trim()
+        return fresh
+
+    def _rebuild(self, db) -> None:
+        fresh = self._build(db)
+        state = {name: value for name, value in vars(fresh).items()
+                 if name not in ('_lock', '_write_lock', 'version', 'loaded_at')}
+        with self._lock:
+            self.__dict__.update(state)
+            self.version += 1
+            self.loaded_at = datetime.now().isoformat()
+
+    def load(self, db) -> None:
+        """(Re)load the whole history from the database (blocking)."""
+        with self._write_lock:
+            self._rebuild(db)
+
+    def add_runs(self, db, session_ids: Iterable[str]) -> bool:
+        """Add (or refresh) completed runs. Returns True if the cache changed (blocking)."""
+        with self._write_lock:
+            if not self.is_loaded:
+                # The full load failed or hasn't run yet: retry it rather than cache a partial history
+                self._rebuild(db)
+                return True
+            changed = False
+            for session_id in dict.fromkeys(session_ids):
+                stored = db.get_run_lender_rows(session_id)
+                if stored is None or not stored[1]:
+                    continue
+                run, rows = stored
+                if session_id in self._run_index or (self.run_started and run['started_at'] < self.run_started[-1]):
+                    # A re-saved or out-of-order run: rebuild (which picks up the rest) rather than patch
+                    self._rebuild(db)
+                    return True
+                total_runs = len(db.list_runs())
+                with self._lock:
+                    self.total_runs = total_runs
+                    self._append_run(session_id, run['run_type'], run['started_at'], [
+                        (row[0], row[1], row[7], row[8], row[9], row[10], row[11], row[12], row[13]) for row in rows
+                    ])
+                    self.version += 1
+                changed = True
+            return changed
+
+    def add_run(self, db, session_id: str) -> bool:
+        """Add (or refresh) one completed run. Returns True if the cache changed (blocking)."""
+        return self.add_runs(db, [session_id])
+
+    # ---- queries ---------------------------------------------------------
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @property
+    def has_runs(self) -> bool:
+        return bool(self.run_sessions)
+
+    def scenario_history(self, scenario_id: str, limit: int = 30) -> List[tuple]:
+        """(run timestamp, gen_h_amount, average, difference, gen_h_rank), newest run first."""
+        with self._lock:
+            code = self._scenario_codes.get(scenario_id)
+            if code is None:
+                return []
+            positions = self._scenario_rows[code].values[-limit:][::-1]
+            return [
+                (self.run_started[run], int(gen_h), int(average), int(difference), int(rank))
+                for run, gen_h, average, difference, rank in zip(
+                    self.sf_run.values[positions], self.sf_gen_h_amount.values[positions],
+                    self.sf_average.values[positions], self.sf_difference.values[positions],
+                    self.sf_rank.values[positions])
+            ]
+
+    def lender_trends(self, lender_name: str, limit: int = 100) -> List[tuple]:
+        """(run timestamp, scenario_id, amount, rank, description), newest run first."""
+        with self._lock:
+            code = self._lender_codes.get(lender_name)
+            if code is None:
+                return []
+            # Rows are stored run by run, so the newest `limit` are near the end
+            positions = self._lender_rows[code].values[-(limit + len(self.scenario_ids)):]
+            runs = self.lf_run.values[positions]
+            positions = positions[np.argsort(-runs, kind='stable')][:limit]
+            return [
+                (self.run_started[run], self.scenario_ids[scenario], int(amount), int(rank),
+                 self.scenario_descriptions[scenario])
+                for run, scenario, amount, rank in zip(
+                    self.lf_run.values[positions], self.lf_scenario.values[positions],
+                    self.lf_amount.values[positions], self.lf_rank.values[positions])
+            ]
+
+    def _run_seconds(self) -> np.ndarray:
+        return timestamps_to_seconds(self.run_started)
+
+    def scenario_history_downsampled(self, scenario_id: str, points: int):
+        """
+        Every run of a scenario reduced to at most `points` by LTTB on the Gen H
+        amount, as scenario_history rows (newest first), plus the full row count.
+        """
+        with self._lock:
+            code = self._scenario_codes.get(scenario_id)
+            if code is None:
+                return [], 0
+            positions = self._scenario_rows[code].values
+            runs = self.sf_run.values[positions]
+            kept = positions[lttb_indices(self._run_seconds()[runs], self.sf_gen_h_amount.values[positions],
+                                          points)][::-1]
+            return [
+                (self.run_started[run], int(gen_h), int(average), int(difference), int(rank))
+                for run, gen_h, average, difference, rank in zip(
+                    self.sf_run.values[kept], self.sf_gen_h_amount.values[kept], self.sf_average.values[kept],
+                    self.sf_difference.values[kept], self.sf_rank.values[kept])
+            ], len(positions)
+
+    def lender_trends_downsampled(self, lender_name: str, points: int):
+        """
+        A lender's whole history with each scenario's line reduced by LTTB on the
+        amount, at most `points` rows in total, as lender_trends rows (newest run
+        first), plus the full row count.
+        """
+        with self._lock:
+            code = self._lender_codes.get(lender_name)
+            if code is None:
+                return [], 0
+            positions = self._lender_rows[code].values
+            runs = self.lf_run.values[positions]
+            # Grouped by scenario ID, so the budget is split as it is for database rows
+            scenario_ids = np.asarray(self.scenario_ids)[self.lf_scenario.values[positions]]
+            kept = positions[grouped_lttb_indices(scenario_ids, self._run_seconds()[runs],
+                                                  self.lf_amount.values[positions], points)]
+            kept = kept[np.argsort(-self.lf_run.values[kept], kind='stable')]
+            return [
+                (self.run_started[run], self.scenario_ids[scenario], int(amount), int(rank),
+                 self.scenario_descriptions[scenario])
+                for run, scenario, amount, rank in zip(
+                    self.lf_run.values[kept], self.lf_scenario.values[kept],
+                    self.lf_amount.values[kept], self.lf_rank.values[kept])
+            ], len(positions)
+
+    def rank_over_time(self, limit: int = 20) -> List[Dict]:
+        """Average Gen H rank of the most recent `limit` runs, oldest first."""
+        with self._lock:
+            start = max(0, len(self.run_sessions) - limit)
+            return [
+                {'run_timestamp': _iso(self.run_started[run]), 'run_type': self.run_types[run],
+                 'average_gen_h_rank': round(float(self.run_average_rank.values[run]), 2)}
+                for run in range(start, len(self.run_sessions))
+            ]
+
+    def gap_over_time(self, limit: int = 20) -> List[Dict]:
+        """Average Gen H vs market-average gap of the most recent `limit` runs, oldest first."""
+        with self._lock:
+            start = max(0, len(self.run_sessions) - limit)
+            return [
+                {'run_timestamp': _iso(self.run_started[run]), 'run_type': self.run_types[run],
+                 'average_gap': round(float(self.run_average_gap.values[run]), 2)}
+                for run in range(start, len(self.run_sessions))
+            ]
+
+    def historical_summary(self) -> Dict:
+        """Run count, average Gen H rank, best scenario and last run time."""
+        with self._lock:
+            if not self.run_sessions:
+                return {'total_runs': self.total_runs, 'average_gen_h_rank': 0,
+                        'best_performing_scenario': 'No data', 'last_run': 'No runs yet'}
+
+            run_ranks = self.run_average_rank.values
+            ranked_runs = run_ranks[run_ranks > 0]
+
+            ranks = self.sf_rank.values
+            ranked = ranks > 0
+            best = 'No data'
+            if ranked.any():
+                scenarios = self.sf_scenario.values[ranked]
+                totals = np.bincount(scenarios, weights=ranks[ranked], minlength=len(self.scenario_ids))
+                counts = np.bincount(scenarios, minlength=len(self.scenario_ids))
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    means = np.where(counts > 0, totals / counts, np.inf)
+                # Ties go to the lowest scenario_id, as in the SQL backend
+                best = min(self.scenario_ids[code] for code in np.flatnonzero(means == means.min()))
+
+            return {
+                'total_runs': self.total_runs,
+                'average_gen_h_rank': round(float(ranked_runs.mean()), 2) if ranked_runs.size else 0,
+                'best_performing_scenario': best,
+                'last_run': _iso(self.run_started[-1])
+            }
+
+    def scenario_rank_changes(self) -> Dict:
+        """Average Gen H rank change per scenario group between the last two runs (positive = improved)."""
+        with self._lock:
+            if len(self.run_sessions) < 2:
+                return {'error': 'Need at least 2 runs to calculate rank changes'}
+
+            latest, previous = len(self.run_sessions) - 1, len(self.run_sessions) - 2
+            runs = self.sf_run.values
+
+            def ranks(run):
+                return {self.scenario_ids[scenario]: rank for scenario, rank in
+                        zip(self.sf_scenario.values[runs == run].tolist(), self.sf_rank.values[runs == run].tolist())}
+
+            return rank_changes_by_group(ranks(latest), ranks(previous))
+
+    def recent_rank_matrix(self, runs: int):
+        """(run timestamps oldest first, scenario_ids, runs x scenarios Gen H rank matrix) for the last `runs` runs."""
+        with self._lock:
+            first_run = max(0, len(self.run_sessions) - runs)
+            # Scenario facts are stored run by run, so the window is a suffix
+            start = int(np.searchsorted(self.sf_run.values, first_run))
+            run_codes = self.sf_run.values[start:] - first_run
+            scenario_codes = self.sf_scenario.values[start:]
+            rank_values = self.sf_rank.values[start:].astype(np.float64)
+
+            present, columns = np.unique(scenario_codes, return_inverse=True)
+            ranks = np.full((len(self.run_sessions) - first_run, len(present)), np.nan)
+            ranks[run_codes, columns] = np.where(rank_values > 0, rank_values, np.nan)
+            labels = [_iso(started) for started in self.run_started[first_run:]]
+            return labels, [self.scenario_ids[code] for code in present], ranks
+
+    def _columns(self) -> List[_Column]:
+        return [self.sf_run, self.sf_scenario, self.sf_gen_h_amount, self.sf_average, self.sf_difference,
+                self.sf_rank, self.lf_run, self.lf_scenario, self.lf_lender, self.lf_amount, self.lf_rank,
+                self.run_average_rank, self.run_average_gap,
+                *self._lender_rows.values(), *self._scenario_rows.values()]
+
+    def memory_usage(self) -> Dict:
+        """Bytes held by the array columns and indexes."""
+        with self._lock:
+            scenario_facts = sum(column.nbytes for column in (
+                self.sf_run, self.sf_scenario, self.sf_gen_h_amount, self.sf_average, self.sf_difference, self.sf_rank))
+            lender_facts = sum(column.nbytes for column in (
+                self.lf_run, self.lf_scenario, self.lf_lender, self.lf_amount, self.lf_rank))
+            indexes = sum(column.nbytes for column in self._lender_rows.values()) + \
+                sum(column.nbytes for column in self._scenario_rows.values())
+            return {
+                'runs': len(self.run_sessions),
+                'scenario_rows': self.sf_run.size,
+                'lender_rows': self.lf_run.size,
+                'scenario_fact_bytes': scenario_facts,
+                'lender_fact_bytes': lender_facts,
+                'index_bytes': indexes,
+                'total_bytes': scenario_facts + lender_facts + indexes,
+                'version': self.version,
+                'loaded_at': self.loaded_at,
+            }
@@ -0,0 +1,902 @@
+"""
+Pooled SQLite access layer for the MBT historical data store
+Connections are reused across requests and opened in WAL mode so that
+dashboard reads never block on automation run writes. Results are stored
+in the normalized, integer-keyed schema defined in history_schema.py.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from history_query import DEFAULT_FIELDS, DEFAULT_PAGE_SIZE, build_lender_query, walk_sort_index
+from history_rollups import ALL_GROUPS, refresh_rollups
+from history_schema import (ANY_RUN_TYPE, ensure_schema, now_timestamp, point_latest_run, run_type_from_session,
+                            upsert_scenario_dimension)
+
+# SQL statements are kept as constants so every pooled connection reuses
+# the same prepared statement from its statement cache.
+UPSERT_RUN_SQL = '''
+    INSERT INTO dim_runs
+    (session_id, run_type, started_at, finished_at, total_scenarios, successful_scenarios, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        run_type = excluded.run_type,
+        finished_at = excluded.finished_at,
+        total_scenarios = excluded.total_scenarios,
+        successful_scenarios = excluded.successful_scenarios,
+        status = excluded.status
+'''
+
+# A mirrored run keeps the finished_at recorded when it ran here
+UPSERT_REPLICA_RUN_SQL = '''
+    INSERT INTO dim_runs
+    (session_id, run_type, started_at, finished_at, total_scenarios, successful_scenarios, status)
+    VALUES (?, ?, ?, ?, ?, ?, 'completed')
+    ON CONFLICT(session_id) DO UPDATE SET
+        run_type = excluded.run_type,
+        finished_at = COALESCE(dim_runs.finished_at, excluded.finished_at),
+        total_scenarios = excluded.total_scenarios,
+        successful_scenarios = excluded.successful_scenarios,
+        status = excluded.status
+'''
+
+STORED_SCENARIO_SQL = '''
+    SELECT f.run_id, f.scenario_key, f.gen_h_amount, f.average_amount, f.gen_h_difference, f.gen_h_rank
+    FROM dim_runs r
+    JOIN fact_scenario_results f ON f.run_id = r.id
+    JOIN dim_scenarios s ON s.id = f.scenario_key
+    WHERE r.session_id = ? AND s.scenario_id = ?
+'''
+
+INSERT_RUN_SQL = '''
+    INSERT INTO dim_runs (session_id, run_type, started_at, status)
+    VALUES (?, ?, ?, 'running')
+'''
+
+INSERT_SCENARIO_RESULT_SQL = '''
+    INSERT OR REPLACE INTO fact_scenario_results
+    (run_id, scenario_key, recorded_at, gen_h_amount, average_amount,
+     gen_h_difference, gen_h_rank, total_lenders)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_LENDER_RESULT_SQL = '''
+    INSERT OR REPLACE INTO fact_lender_results
+    (run_id, scenario_key, lender_id, amount, rank_position)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+BUMP_HISTORY_REVISION_SQL = 'UPDATE history_revision SET revision = revision + 1 WHERE id = 1'
+
+SELECT_SCENARIOS_SQL = '''
+    SELECT scenario_id, description, case_type, income
+    FROM scenarios
+'''
+
+# Walks idx_dim_runs_started and the fact primary keys in order, so rows
+# stream straight off the cursor without a sort
+HISTORY_EXPORT_SQL = '''
+    SELECT r.started_at, r.session_id, r.run_type, s.scenario_id, s.description,
+           f.gen_h_amount, f.average_amount, f.gen_h_difference, f.gen_h_rank,
+           l.name, lr.amount, lr.rank_position
+    FROM dim_runs r
+    JOIN fact_scenario_results f ON f.run_id = r.id
+    JOIN dim_scenarios s ON s.id = f.scenario_key
+    LEFT JOIN fact_lender_results lr ON lr.run_id = f.run_id AND lr.scenario_key = f.scenario_key
+    LEFT JOIN dim_lenders l ON l.id = lr.lender_id
+    WHERE r.id IN ({run_ids})
+    ORDER BY r.started_at, r.id, f.scenario_key, lr.lender_id
+'''
+
+# Next runs of an export, keyset-paginated on (started_at, id)
+HISTORY_EXPORT_RUNS_SQL = '''
+    SELECT id, started_at FROM dim_runs
+    WHERE started_at >= ? AND started_at < ? AND (started_at, id) > (?, ?)
+    ORDER BY started_at, id
+    LIMIT ?
+'''
+
+# Rough scenario/lender rows per run, to size an export's run pages to its chunks
+EXPORT_ROWS_PER_RUN = 1000
+
+RUN_LENDER_ROWS_SQL = '''
+    SELECT s.scenario_id, s.description, s.applicants, s.employment_type, s.income,
+           s.has_credit_commitments, s.scenario_group,
+           f.gen_h_amount, f.average_amount, f.gen_h_difference, f.gen_h_rank,
+           l.name, lr.amount, lr.rank_position
+    FROM fact_scenario_results f
+    JOIN dim_scenarios s ON s.id = f.scenario_key
+    LEFT JOIN fact_lender_results lr ON lr.run_id = f.run_id AND lr.scenario_key = f.scenario_key
+    LEFT JOIN dim_lenders l ON l.id = lr.lender_id
+    WHERE f.run_id = ?
+    ORDER BY f.scenario_key, lr.lender_id
+'''
+
+RUN_LENDER_ROWS_COLUMNS = ('scenario_id', 'description', 'applicants', 'employment_type', 'income',
+                           'has_credit_commitments', 'scenario_group',
+                           'gen_h_amount', 'average_amount', 'gen_h_difference', 'gen_h_rank',
+                           'lender_name', 'amount', 'rank_position')
+
+HISTORY_EXPORT_COLUMNS = ('run_timestamp', 'session_id', 'run_type', 'scenario_id', 'description',
+                          'gen_h_amount', 'average_amount', 'gen_h_difference', 'gen_h_rank',
+                          'lender_name', 'amount', 'rank_position')
+
+
+def rank_lenders(lender_results):
+    """Lender (name, amount, rank) tuples, highest amount = rank 1."""
+    sorted_lenders = sorted(lender_results.items(), key=lambda x: x[1], reverse=True)
+    return [
+        (lender_name, amount, rank)
+        for rank, (lender_name, amount) in enumerate(sorted_lenders, 1)
+    ]
+
+
+class DatabaseManager:
+    """Manages pooled database operations for historical data."""
+
+    def __init__(self, db_path="mbt_affordability_history.db", pool_size=8, cache_size_kb=16384):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.cache_size_kb = cache_size_kb
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        # SQLite allows a single writer; serialising writers in-process avoids
+        # busy-timeout spins while WAL keeps readers independent of them.
+        self._write_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        # Dimension key caches, only touched while holding the write lock
+        self._lender_ids = {}
+        self._scenario_keys = {}
+        self._run_ids = {}
+
+    def _open_connection(self):
+        """Open a new connection with WAL journaling and tuned pragmas."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None,  # explicit transactions only, reads never hold locks
+            cached_statements=256
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA busy_timeout=30000')
+        conn.execute('PRAGMA foreign_keys=OFF')
+
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    migrated = ensure_schema(conn)
+                    if migrated:
+                        print(f"✅ History database migrated to normalized schema: {migrated}")
+                    self._schema_ready = True
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_connection()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self, bump_revision=True):
+        """
+        Run the block as a single write transaction on a pooled connection.
+        Writes that don't change the history (e.g. the Supabase outbox) pass
+        bump_revision=False so history ETags stay valid.
+        """
+        with self._write_lock, self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                # Keys inserted by the rolled-back transaction no longer exist
+                self._lender_ids.clear()
+                self._scenario_keys.clear()
+                self._run_ids.clear()
+                raise
+            if bump_revision:
+                conn.execute(BUMP_HISTORY_REVISION_SQL)
+            conn.commit()
+
+    def close_all(self):
+        """Close every idle pooled connection (used on server shutdown)."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+    def _run_key(self, conn, session_id, started_at=None):
+        """Integer key for a run, creating a 'running' dim_runs row if needed."""
+        run_id = self._run_ids.get(session_id)
+        if run_id is None:
+            row = conn.execute('SELECT id FROM dim_runs WHERE session_id = ?', (session_id,)).fetchone()
+            if row:
+                run_id = row[0]
+            else:
+                run_id = conn.execute(INSERT_RUN_SQL, (session_id, run_type_from_session(session_id),
+                                                       started_at or now_timestamp())).lastrowid
+            self._run_ids[session_id] = run_id
+        return run_id
+
+    def _scenario_key(self, conn, scenario_id, description=''):
+        """Integer key for a scenario, adding it to dim_scenarios if needed."""
+        key = self._scenario_keys.get(scenario_id)
+        if key is None:
+            key = upsert_scenario_dimension(conn, scenario_id, description)
+            self._scenario_keys[scenario_id] = key
+        return key
+
+    def _lender_keys(self, conn, lender_names):
+        """Integer keys for a set of lender names, adding new lenders as needed."""
+        missing = [name for name in lender_names if name not in self._lender_ids]
+        if missing:
+            conn.executemany('INSERT OR IGNORE INTO dim_lenders (name) VALUES (?)', [(name,) for name in missing])
+            placeholders = ','.join('?' * len(missing))
+            for lender_id, name in conn.execute(
+                    f'SELECT id, name FROM dim_lenders WHERE name IN ({placeholders})', missing):
+                self._lender_ids[name] = lender_id
+        return self._lender_ids
+
+    def _lender_rows(self, conn, run_id, scenario_key, lender_results):
+        """Ranked fact_lender_results rows for one scenario, ready for executemany."""
+        lender_ids = self._lender_keys(conn, lender_results.keys())
+        return [
+            (run_id, scenario_key, lender_ids[lender_name], amount, rank)
+            for lender_name, amount, rank in rank_lenders(lender_results)
+        ]
+
+    def save_automation_run(self, session_id, total_scenarios, successful_scenarios, status="completed",
+                            run_type=None):
+        """Save automation run details."""
+        now = now_timestamp()
+        finished_at = None if status == "running" else now
+
+        with self.transaction() as conn:
+            conn.execute(UPSERT_RUN_SQL, (session_id, run_type or run_type_from_session(session_id), now,
+                                          finished_at, total_scenarios, successful_scenarios, status))
+            self._run_ids.pop(session_id, None)
+            if status == "completed":
+                refresh_rollups(conn, [self._run_key(conn, session_id)])
+
+    def save_scenario_result(self, session_id, scenario_id, gen_h_amount, average_amount,
+                             gen_h_difference, gen_h_rank, total_lenders):
+        """Save scenario result summary."""
+        with self.transaction() as conn:
+            conn.execute(INSERT_SCENARIO_RESULT_SQL,
+                         (self._run_key(conn, session_id), self._scenario_key(conn, scenario_id), now_timestamp(),
+                          gen_h_amount, average_amount, gen_h_difference, gen_h_rank, total_lenders))
+
+    def save_lender_results(self, session_id, scenario_id, lender_results):
+        """Save individual lender results."""
+        with self.transaction() as conn:
+            run_id = self._run_key(conn, session_id)
+            scenario_key = self._scenario_key(conn, scenario_id)
+            conn.executemany(INSERT_LENDER_RESULT_SQL,
+                             self._lender_rows(conn, run_id, scenario_key, lender_results))
+
+    def save_scenario_bundle(self, session_id, scenario_id, gen_h_amount, average_amount,
+                             gen_h_difference, gen_h_rank, lender_results):
+        """Save a scenario summary and all of its lender rows in one transaction."""
+        with self.transaction() as conn:
+            run_id = self._run_key(conn, session_id)
+            scenario_key = self._scenario_key(conn, scenario_id)
+            conn.execute(INSERT_SCENARIO_RESULT_SQL,
+                         (run_id, scenario_key, now_timestamp(), gen_h_amount, average_amount,
+                          gen_h_difference, gen_h_rank, len(lender_results)))
+            conn.executemany(INSERT_LENDER_RESULT_SQL,
+                             self._lender_rows(conn, run_id, scenario_key, lender_results))
+
+    def save_run_batch(self, session_id, results, total_scenarios=None, status="completed", started_at=None):
+        """
+        Import a whole run atomically: the run record, every scenario summary
+        and every lender row, each table written with a single executemany.
+
+        `results` uses the same shape as the automation results files:
+        {scenario_id: {'lender_results': {...}, 'statistics': {...}}}.
+        """
+        started_at = started_at or now_timestamp()
+        if total_scenarios is None:
+            total_scenarios = len(results)
+
+        with self.transaction() as conn:
+            conn.execute(UPSERT_RUN_SQL, (session_id, run_type_from_session(session_id), started_at,
+                                          started_at, total_scenarios, len(results), status))
+            self._run_ids.pop(session_id, None)
+            run_id = self._run_key(conn, session_id)
+
+            scenario_rows = []
+            all_lender_rows = []
+            for scenario_id, scenario_data in results.items():
+                stats = scenario_data.get('statistics', {})
+                lenders = scenario_data.get('lender_results', {})
+                scenario_key = self._scenario_key(conn, scenario_id, scenario_data.get('description', ''))
+                scenario_rows.append((
+                    run_id, scenario_key, started_at,
+                    stats.get('gen_h_amount', 0),
+                    int(stats.get('average', 0)),
+                    int(stats.get('gen_h_difference', 0)),
+                    stats.get('gen_h_rank', 0),
+                    len(lenders)
+                ))
+                all_lender_rows.extend(self._lender_rows(conn, run_id, scenario_key, lenders))
+
+            conn.executemany(INSERT_SCENARIO_RESULT_SQL, scenario_rows)
+            conn.executemany(INSERT_LENDER_RESULT_SQL, all_lender_rows)
+            refresh_rollups(conn, [run_id])
+
+        return len(scenario_rows), len(all_lender_rows)
+
+    def import_results_file(self, path):
+        """Import a saved automation results JSON file as one batch."""
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+        session_id = data.get('session_id') or os.path.splitext(os.path.basename(path))[0]
+        timestamp = data.get('timestamp')
+        started_at = timestamp[:19].replace('T', ' ') if timestamp else None
+        return self.save_run_batch(session_id, data.get('results', {}),
+                                   total_scenarios=data.get('total_scenarios'),
+                                   started_at=started_at)
+
+    def record_finished_run(self, session_id, run_type, format_version, document_json,
+                            results_file=None, scenario_count=0, finished_at=None):
+        """
+        Store a run's materialized document, register it in the run catalog and
+        move the latest-run pointers, all in one transaction. Returns the new
+        materialized version number.
+        """
+        finished_at = finished_at or now_timestamp()
+
+        with self.transaction() as conn:
+            version = conn.execute('''
+                INSERT INTO materialized_results (session_id, run_type, format_version, created_at, document)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (session_id, run_type, format_version, now_timestamp(), document_json)).lastrowid
+
+            catalog_id = conn.execute('''
+                INSERT INTO run_catalog
+                (session_id, run_type, finished_at, materialized_version, results_file, scenario_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    run_type = excluded.run_type,
+                    finished_at = excluded.finished_at,
+                    materialized_version = excluded.materialized_version,
+                    results_file = COALESCE(excluded.results_file, run_catalog.results_file),
+                    scenario_count = excluded.scenario_count
+                RETURNING id
+            ''', (session_id, run_type, finished_at, version, results_file, scenario_count)).fetchone()[0]
+
+            point_latest_run(conn, catalog_id, run_type)
+        return version
+
+    def get_latest_run(self, run_type=ANY_RUN_TYPE):
+        """Catalog entry for the newest finished run of a type ('*' = any), or None."""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT c.session_id, c.run_type, c.finished_at, c.materialized_version,
+                       c.results_file, c.scenario_count
+                FROM latest_run_pointers p
+                JOIN run_catalog c ON c.id = p.catalog_id
+                WHERE p.run_type = ?
+            ''', (run_type,)).fetchone()
+
+        if row is None:
+            return None
+        return {
+            'session_id': row[0],
+            'run_type': row[1],
+            'finished_at': row[2],
+            'materialized_version': row[3],
+            'results_file': row[4],
+            'scenario_count': row[5]
+        }
+
+    def get_history_revision(self):
+        """Counter that changes whenever any history data is written."""
+        with self.connection() as conn:
+            return conn.execute('SELECT revision FROM history_revision WHERE id = 1').fetchone()[0]
+
+    def has_catalogued_runs(self):
+        with self.connection() as conn:
+            return conn.execute('SELECT 1 FROM run_catalog LIMIT 1').fetchone() is not None
+
+    def get_materialized_results(self, version):
+        """(format_version, document_json) for a materialized version, or None."""
+        with self.connection() as conn:
+            return conn.execute(
+                'SELECT format_version, document FROM materialized_results WHERE version = ?', (version,)
+            ).fetchone()
+
+    def get_scenarios(self, credit_only=False, order_by="income"):
+        """Get predefined scenarios as dicts, optionally only credit commitment ones."""
+        sql = SELECT_SCENARIOS_SQL
+        if credit_only:
+            sql += ' WHERE has_credit_commitments = 1'
+        if order_by == "credit_then_income":
+            sql += ' ORDER BY has_credit_commitments, income'
+        else:
+            sql += ' ORDER BY income'
+
+        with self.connection() as conn:
+            rows = conn.execute(sql).fetchall()
+
+        return [
+            {
+                "scenario_id": row[0],
+                "description": row[1],
+                "case_type": row[2],
+                "income": row[3]
+            }
+            for row in rows
+        ]
+
+    def get_historical_data(self, scenario_id=None, lender_name=None, days=30):
+        """Get historical data for trends, newest run first (first column is the run timestamp)."""
+        with self.connection() as conn:
+            if scenario_id and lender_name:
+                # Get specific lender history for a scenario
+                cursor = conn.execute('''
+                    SELECT r.started_at, f.amount, f.rank_position
+                    FROM fact_lender_results f
+                    JOIN dim_runs r ON r.id = f.run_id
+                    WHERE f.scenario_key = (SELECT id FROM dim_scenarios WHERE scenario_id = ?)
+                      AND f.lender_id = (SELECT id FROM dim_lenders WHERE name = ?)
+                    ORDER BY r.started_at DESC, r.id DESC
+                    LIMIT ?
+                ''', (scenario_id, lender_name, days))
+
+            elif scenario_id:
+                # Get scenario summary history
+                cursor = conn.execute('''
+                    SELECT r.started_at, f.gen_h_amount, f.average_amount, f.gen_h_difference, f.gen_h_rank
+                    FROM fact_scenario_results f
+                    JOIN dim_runs r ON r.id = f.run_id
+                    WHERE f.scenario_key = (SELECT id FROM dim_scenarios WHERE scenario_id = ?)
+                    ORDER BY r.started_at DESC, r.id DESC
+                    LIMIT ?
+                ''', (scenario_id, days))
+
+            else:
+                # Get all recent data
+                cursor = conn.execute('''
+                    SELECT r.started_at, s.scenario_id, f.gen_h_amount, f.average_amount, f.gen_h_rank
+                    FROM dim_runs r
+                    JOIN fact_scenario_results f ON f.run_id = r.id
+                    JOIN dim_scenarios s ON s.id = f.scenario_key
+                    ORDER BY r.started_at DESC, r.id DESC, s.scenario_id
+                    LIMIT ?
+                ''', (days * 10,))
+
+            return cursor.fetchall()
+
+    def iter_history_chunks(self, start=None, end=None, chunk_size=5000):
+        """
+        Yield every scenario/lender row of runs started in [start, end] as
+        lists of at most `chunk_size` rows (HISTORY_EXPORT_COLUMNS order).
+        `start`/`end` are 'YYYY-MM-DD' dates; None means unbounded. Runs are
+        read a few at a time, keyset-paginated, each page on a briefly borrowed
+        connection, so memory stays flat for any range and no connection or
+        read snapshot is held while the caller consumes a chunk.
+        """
+        lower = start or ''
+        upper = (date.fromisoformat(end) + timedelta(days=1)).isoformat() if end else '9999'
+        runs_per_page = max(1, chunk_size // EXPORT_ROWS_PER_RUN)
+        after = ('', 0)
+        while True:
+            with self.connection() as conn:
+                runs = conn.execute(HISTORY_EXPORT_RUNS_SQL, (lower, upper, *after, runs_per_page)).fetchall()
+                if not runs:
+                    return
+                rows = conn.execute(HISTORY_EXPORT_SQL.format(run_ids=','.join('?' * len(runs))),
+                                    [run_id for run_id, _ in runs]).fetchall()
+            after = (runs[-1][1], runs[-1][0])
+            for offset in range(0, len(rows), chunk_size):
+                yield rows[offset:offset + chunk_size]
+
+    def list_runs(self):
+        """Every run as {session_id, run_type, started_at}, oldest first."""
+        with self.connection() as conn:
+            rows = conn.execute(
+                'SELECT session_id, run_type, started_at FROM dim_runs ORDER BY started_at, id'
+            ).fetchall()
+        return [{'session_id': row[0], 'run_type': row[1], 'started_at': row[2]} for row in rows]
+
+    def get_run_lender_rows(self, session_id):
+        """
+        A run's {session_id, run_type, started_at} and its scenario/lender rows
+        in RUN_LENDER_ROWS_COLUMNS order, or None if the run isn't stored.
+        """
+        with self.connection() as conn:
+            run = conn.execute(
+                'SELECT id, run_type, started_at FROM dim_runs WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if run is None:
+                return None
+            rows = conn.execute(RUN_LENDER_ROWS_SQL, (run[0],)).fetchall()
+        return {'session_id': session_id, 'run_type': run[1], 'started_at': run[2]}, rows
+
+    def get_lender_trends(self, lender_name, limit=100):
+        """Get a lender's amounts and ranks across all scenarios, newest run first."""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT r.started_at, s.scenario_id, f.amount, f.rank_position, s.description
+                FROM fact_lender_results f
+                JOIN dim_runs r ON r.id = f.run_id
+                JOIN dim_scenarios s ON s.id = f.scenario_key
+                WHERE f.lender_id = (SELECT id FROM dim_lenders WHERE name = ?)
+                ORDER BY r.started_at DESC, r.id DESC, s.income
+                LIMIT ?
+            ''', (lender_name, limit)).fetchall()
+
+
+    def get_run_series(self, limit=20):
+        """
+        The newest `limit` runs with results, oldest first, as (started_at, run_type,
+        average positive Gen H rank or None, average Gen H difference).
+        """
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT r.started_at, r.run_type,
+                       AVG(CASE WHEN f.gen_h_rank > 0 THEN f.gen_h_rank END), AVG(f.gen_h_difference)
+                FROM dim_runs r
+                JOIN fact_scenario_results f ON f.run_id = r.id
+                GROUP BY r.id
+                ORDER BY r.started_at DESC, r.id DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        return rows[::-1]
+
+    def get_history_summary_row(self):
+        """(run count, average of per-run average Gen H ranks, best scenario_id, last run with results)."""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM dim_runs),
+                    (SELECT AVG(run_rank) FROM (
+                        SELECT AVG(CASE WHEN gen_h_rank > 0 THEN gen_h_rank END) AS run_rank
+                        FROM fact_scenario_results GROUP BY run_id
+                     ) WHERE run_rank > 0),
+                    (SELECT s.scenario_id FROM fact_scenario_results f
+                     JOIN dim_scenarios s ON s.id = f.scenario_key
+                     WHERE f.gen_h_rank > 0
+                     GROUP BY f.scenario_key ORDER BY AVG(f.gen_h_rank), s.scenario_id LIMIT 1),
+                    (SELECT MAX(r.started_at) FROM dim_runs r
+                     WHERE EXISTS (SELECT 1 FROM fact_scenario_results f WHERE f.run_id = r.id))
+            ''').fetchone()
+
+    def get_latest_scenario_ranks(self, runs=2):
+        """{scenario_id: gen_h_rank} for each of the newest `runs` runs with results, newest first."""
+        with self.connection() as conn:
+            run_ids = [row[0] for row in conn.execute('''
+                SELECT r.id FROM dim_runs r
+                WHERE EXISTS (SELECT 1 FROM fact_scenario_results f WHERE f.run_id = r.id)
+                ORDER BY r.started_at DESC, r.id DESC
+                LIMIT ?
+            ''', (runs,))]
+            return [
+                dict(conn.execute('''
+                    SELECT s.scenario_id, f.gen_h_rank FROM fact_scenario_results f
+                    JOIN dim_scenarios s ON s.id = f.scenario_key
+                    WHERE f.run_id = ?
+                ''', (run_id,)).fetchall())
+                for run_id in run_ids
+            ]
+
+    def _stored_scenario_matches(self, conn, session_id, scenario_id, values, lender_results):
+        """Whether a scenario is stored with these (gen_h_amount, average, difference, rank) and lender amounts."""
+        row = conn.execute(STORED_SCENARIO_SQL, (session_id, scenario_id)).fetchone()
+        if row is None or tuple(row[2:]) != values:
+            return False
+        stored = dict(conn.execute('''
+            SELECT l.name, lr.amount FROM fact_lender_results lr JOIN dim_lenders l ON l.id = lr.lender_id
+            WHERE lr.run_id = ? AND lr.scenario_key = ?
+        ''', row[:2]).fetchall())
+        return stored == lender_results
+
+    def apply_replica_rows(self, runs, scenarios):
+        """
+        Mirror Supabase rows into the local store in one transaction. `runs` are
+        (session_id, run_type, started_at, total_scenarios, successful_scenarios)
+        and `scenarios` are (session_id, scenario_id, description, recorded_at,
+        gen_h_amount, average_amount, gen_h_difference, gen_h_rank, lender_results).
+        Rows already stored as they are (such as runs made here coming back
+        through the mirror) are skipped, and a local finished_at is kept, so
+        re-mirroring unchanged records leaves the history revision alone.
+        Returns (rows applied, session_ids of the runs changed).
+        """
+        changed = set()
+        if not runs and not scenarios:
+            return 0, changed
+
+        applied = 0
+        with self.transaction(bump_revision=False) as conn:
+            run_ids = set()
+            for session_id, run_type, started_at, total_scenarios, successful_scenarios in runs:
+                stored = conn.execute(
+                    'SELECT run_type, total_scenarios, successful_scenarios, status FROM dim_runs WHERE session_id = ?',
+                    (session_id,)).fetchone()
+                if stored == (run_type, total_scenarios, successful_scenarios, 'completed'):
+                    continue
+                conn.execute(UPSERT_REPLICA_RUN_SQL, (session_id, run_type, started_at, started_at,
+                                                      total_scenarios, successful_scenarios))
+                self._run_ids.pop(session_id, None)
+                run_ids.add(self._run_key(conn, session_id))
+                changed.add(session_id)
+                applied += 1
+
+            scenario_rows = []
+            lender_rows = []
+            for (session_id, scenario_id, description, recorded_at, gen_h_amount, average_amount,
+                 gen_h_difference, gen_h_rank, lender_results) in scenarios:
+                values = (gen_h_amount, int(average_amount), int(gen_h_difference), gen_h_rank)
+                if self._stored_scenario_matches(conn, session_id, scenario_id, values, lender_results):
+                    continue
+                run_id = self._run_key(conn, session_id, recorded_at)
+                run_ids.add(run_id)
+                scenario_key = self._scenario_key(conn, scenario_id, description)
+                scenario_rows.append((run_id, scenario_key, recorded_at, *values, len(lender_results)))
+                # A corrected scenario replaces its lender rows, including lenders it no longer lists
+                conn.execute('DELETE FROM fact_lender_results WHERE run_id = ? AND scenario_key = ?',
+                             (run_id, scenario_key))
+                lender_rows.extend(self._lender_rows(conn, run_id, scenario_key, lender_results))
+                changed.add(session_id)
+                applied += 1
+
+            if applied:
+                conn.executemany(INSERT_SCENARIO_RESULT_SQL, scenario_rows)
+                conn.executemany(INSERT_LENDER_RESULT_SQL, lender_rows)
+                refresh_rollups(conn, run_ids)
+                conn.execute(BUMP_HISTORY_REVISION_SQL)
+        return applied, changed
+
+    def get_recent_scenario_ranks(self, runs=10):
+        """(run_age, started_at, scenario_id, gen_h_rank) for the newest `runs` runs with results (age 1 = newest)."""
+        with self.connection() as conn:
+            return conn.execute('''
+                WITH recent AS (
+                    SELECT r.id, r.started_at, ROW_NUMBER() OVER (ORDER BY r.started_at DESC, r.id DESC) AS age
+                    FROM dim_runs r
+                    WHERE EXISTS (SELECT 1 FROM fact_scenario_results f WHERE f.run_id = r.id)
+                )
+                SELECT recent.age, recent.started_at, s.scenario_id, f.gen_h_rank
+                FROM recent
+                JOIN fact_scenario_results f ON f.run_id = recent.id
+                JOIN dim_scenarios s ON s.id = f.scenario_key
+                WHERE recent.age <= ?
+            ''', (runs,)).fetchall()
+
+    def get_group_rollups(self, granularity, start=None, end=None, scenario_group=ALL_GROUPS):
+        """
+        (period_start, runs, scenarios, ranked_scenarios, rank_sum, gen_h_difference_sum,
+        gen_h_amount_sum, market_average_sum) per period in [start, end], oldest first.
+        """
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT period_start, runs, scenarios, ranked_scenarios, rank_sum,
+                       gen_h_difference_sum, gen_h_amount_sum, market_average_sum
+                FROM rollup_group_metrics
+                WHERE granularity = ? AND scenario_group = ? AND period_start >= ? AND period_start <= ?
+                ORDER BY period_start
+            ''', (granularity, scenario_group, start or '', end or '9999-12-31')).fetchall()
+
+    def get_lender_rollups(self, lender_name, granularity, start=None, end=None, scenario_group=ALL_GROUPS):
+        """(period_start, observations, amount_sum, rank_sum) for one lender per period, oldest first."""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT m.period_start, m.observations, m.amount_sum, m.rank_sum
+                FROM rollup_lender_metrics m
+                JOIN dim_lenders l ON l.id = m.lender_id
+                WHERE l.name = ? AND m.granularity = ? AND m.scenario_group = ?
+                  AND m.period_start >= ? AND m.period_start <= ?
+                ORDER BY m.period_start
+            ''', (lender_name, granularity, scenario_group, start or '', end or '9999-12-31')).fetchall()
+
+    def query_lender_results(self, filters=None, fields=DEFAULT_FIELDS, sort='date', descending=False,
+                             after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        One page of lender results as (rows, next_key). `filters` may hold
+        lenders, groups (name lists), income_min, income_max, credit (bool) and
+        start/end ('YYYY-MM-DD', inclusive). Rows are tuples of `fields`;
+        next_key is the sort key to pass back as `after`, or None on the last page.
+        """
+        filters = filters or {}
+        lower = filters.get('start') or ''
+        upper = (date.fromisoformat(filters['end']) + timedelta(days=1)).isoformat() if filters.get('end') else '9999'
+        with self.connection() as conn:
+            # Resolve dimension filters to keys first so the fact scan is a plain IN lookup
+            lender_ids = None
+            if filters.get('lenders'):
+                names = filters['lenders']
+                lender_ids = [row[0] for row in conn.execute(
+                    f"SELECT id FROM dim_lenders WHERE name IN ({','.join('?' * len(names))})", names)]
+                if not lender_ids:
+                    return [], None
+
+            scenario_keys = None
+            conditions, params = [], []
+            if filters.get('groups'):
+                conditions.append(f"scenario_group IN ({','.join('?' * len(filters['groups']))})")
+                params.extend(filters['groups'])
+            if filters.get('income_min') is not None:
+                conditions.append('income >= ?')
+                params.append(filters['income_min'])
+            if filters.get('income_max') is not None:
+                conditions.append('income <= ?')
+                params.append(filters['income_max'])
+            if filters.get('credit') is not None:
+                conditions.append('has_credit_commitments = ?')
+                params.append(1 if filters['credit'] else 0)
+            if conditions:
+                scenario_keys = [row[0] for row in conn.execute(
+                    f"SELECT id FROM dim_scenarios WHERE {' AND '.join(conditions)}", params)]
+                if not scenario_keys:
+                    return [], None
+
+            walk_index = True
+            if sort != 'date':
+                # Estimate the share of rows that match from the dimension sizes (cheap counts)
+                runs, lenders, scenarios, runs_in_range = conn.execute('''
+                    SELECT (SELECT COUNT(*) FROM dim_runs), (SELECT COUNT(*) FROM dim_lenders),
+                           (SELECT COUNT(*) FROM dim_scenarios),
+                           (SELECT COUNT(*) FROM dim_runs WHERE started_at >= ? AND started_at < ?)
+                ''', (lower, upper)).fetchone()
+                selectivity = runs_in_range / max(runs, 1)
+                if lender_ids is not None:
+                    selectivity *= len(lender_ids) / lenders
+                if scenario_keys is not None:
+                    selectivity *= len(scenario_keys) / scenarios
+                walk_index = walk_sort_index(limit, selectivity, runs * lenders * scenarios)
+
+            sql, params = build_lender_query(fields, sort, descending, lender_ids, scenario_keys,
+                                             lower, upper, after, limit + 1, walk_index)
+            rows = conn.execute(sql, params).fetchall()
+
+        width = len(fields)
+        next_key = list(rows[limit - 1][width:]) if len(rows) > limit else None
+        return [row[:width] for row in rows[:limit]], next_key
+
+    def get_replica_state(self):
+        """{table_name: (high_water_mark, last_id, rows_synced, synced_at)} for each mirrored Supabase table."""
+        with self.connection() as conn:
+            return {row[0]: row[1:] for row in conn.execute(
+                'SELECT table_name, high_water_mark, last_id, rows_synced, synced_at FROM replica_sync_state')}
+
+    def save_replica_state(self, table_name, high_water_mark, last_id, rows_synced, synced_at=None):
+        """Record a finished sync of one table; `rows_synced` is added to the running total."""
+        with self.transaction(bump_revision=False) as conn:
+            conn.execute('''
+                INSERT INTO replica_sync_state (table_name, high_water_mark, last_id, rows_synced, synced_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(table_name) DO UPDATE SET
+                    high_water_mark = excluded.high_water_mark,
+                    last_id = excluded.last_id,
+                    rows_synced = rows_synced + excluded.rows_synced,
+                    synced_at = excluded.synced_at
+            ''', (table_name, high_water_mark, last_id, rows_synced, synced_at or now_timestamp()))
+
+    def enqueue_outbox(self, records):
+        """
+        Queue (table_name, record_key, payload_json) records for Supabase.
+        Re-queuing a key replaces the pending row with a new id, so a flush
+        already in flight can't delete the newer payload, and clears any dead
+        row of that key.
+        """
+        now = now_timestamp()
+        with self.transaction(bump_revision=False) as conn:
+            conn.executemany('DELETE FROM supabase_outbox_dead WHERE table_name = ? AND record_key = ?',
+                             [(table_name, record_key) for table_name, record_key, _ in records])
+            conn.executemany('''
+                INSERT OR REPLACE INTO supabase_outbox (table_name, record_key, payload, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', [(table_name, record_key, payload, now) for table_name, record_key, payload in records])
+        return len(records)
+
+    def due_outbox(self, table_name, now, limit=500):
+        """Up to `limit` (id, payload, attempts) rows of a table that are due for a flush attempt, oldest first."""
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT id, payload, attempts FROM supabase_outbox
+                WHERE table_name = ? AND next_attempt_at <= ?
+                ORDER BY id
+                LIMIT ?
+            ''', (table_name, now, limit)).fetchall()
+
+    def pending_outbox(self, table_name):
+        """Number of queued rows of a table, due or backing off."""
+        with self.connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM supabase_outbox WHERE table_name = ?',
+                                (table_name,)).fetchone()[0]
+
+    def complete_outbox(self, ids):
+        """Remove flushed outbox rows."""
+        with self.transaction(bump_revision=False) as conn:
+            conn.executemany('DELETE FROM supabase_outbox WHERE id = ?', [(row_id,) for row_id in ids])
+
+    def retry_outbox(self, ids, next_attempt_at, error):
+        """Record a failed flush attempt and schedule the next one."""
+        with self.transaction(bump_revision=False) as conn:
+            conn.executemany('''
+                UPDATE supabase_outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            ''', [(next_attempt_at, error, row_id) for row_id in ids])
+
+    def bury_outbox(self, ids, error):
+        """Move outbox rows that can't be delivered to supabase_outbox_dead, so later rows keep flowing."""
+        now = now_timestamp()
+        with self.transaction(bump_revision=False) as conn:
+            for row_id in ids:
+                conn.execute('''
+                    INSERT OR REPLACE INTO supabase_outbox_dead
+                        (table_name, record_key, payload, attempts, last_error, created_at, failed_at)
+                    SELECT table_name, record_key, payload, attempts + 1, ?, created_at, ?
+                    FROM supabase_outbox WHERE id = ?
+                ''', (error, now, row_id))
+                conn.execute('DELETE FROM supabase_outbox WHERE id = ?', (row_id,))
+
+    def outbox_stats(self):
+        """
+        Pending outbox rows per table, with the most retried row's attempts and
+        error, and the dead rows set aside per table with their latest error.
+        """
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT table_name, COUNT(*), MAX(attempts), MIN(created_at) FROM supabase_outbox GROUP BY table_name
+            ''').fetchall()
+            error = conn.execute(
+                'SELECT last_error FROM supabase_outbox WHERE last_error IS NOT NULL ORDER BY attempts DESC LIMIT 1'
+            ).fetchone()
+            dead = conn.execute('''
+                SELECT table_name, COUNT(*), MAX(failed_at),
+                       (SELECT last_error FROM supabase_outbox_dead latest
+                        WHERE latest.table_name = d.table_name ORDER BY latest.id DESC LIMIT 1)
+                FROM supabase_outbox_dead d GROUP BY table_name
+            ''').fetchall()
+        return {
+            'pending': {table: {'records': count, 'max_attempts': attempts, 'oldest': oldest}
+                        for table, count, attempts, oldest in rows},
+            'last_error': error[0] if error else None,
+            'dead': {table: {'records': count, 'latest': latest, 'last_error': last_error}
+                     for table, count, latest, last_error in dead},
+        }
+
+
+def main():
+    """Import one or more automation results files: python3 history_database.py file.json ..."""
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python3 history_database.py <results.json> [...]")
+        return
+
+    db = DatabaseManager()
+    for path in sys.argv[1:]:
+        scenario_count, lender_count = db.import_results_file(path)
+        print(f"✅ Imported {path}: {scenario_count} scenarios, {lender_count} lender rows")
+    db.close_all()
+
+
+if __name__ == "__main__":
+    main()
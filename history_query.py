@@ -0,0 +1,151 @@
+"""
+Filtered, cursor-paginated queries over lender results
+Rows of fact_lender_results can be filtered by lender set, scenario group,
+income band, credit flag and run date range, projected to a subset of
+fields and sorted by run date, amount or rank (rows without an amount or
+rank are left out of those two orders). Pages are keyset-paginated: the
+cursor holds the sort key of the last row returned, so a deep page costs
+the same as the first. Broad queries walk an index in sort order; narrow
+ones collect their few matches by run and sort them.
+"""
+
+import base64
+import binascii
+from typing import List, Optional, Sequence, Tuple
+
+from fast_json import dumps, loads
+
+# Public field name -> SQL expression
+QUERY_FIELDS = {
+    'run_timestamp': 'r.started_at',
+    'session_id': 'r.session_id',
+    'run_type': 'r.run_type',
+    'scenario_id': 's.scenario_id',
+    'scenario_group': 's.scenario_group',
+    'income': 's.income',
+    'has_credit_commitments': 's.has_credit_commitments',
+    'lender_name': 'l.name',
+    'amount': 'lr.amount',
+    'rank_position': 'lr.rank_position',
+}
+
+DEFAULT_FIELDS = tuple(QUERY_FIELDS)
+
+# Sort value followed by the fact primary key, which makes every key unique
+SORT_KEYS = {
+    'date': ('r.started_at', 'r.id', 'lr.scenario_key', 'lr.lender_id'),
+    'amount': ('lr.amount', 'lr.run_id', 'lr.scenario_key', 'lr.lender_id'),
+    'rank': ('lr.rank_position', 'lr.run_id', 'lr.scenario_key', 'lr.lender_id'),
+}
+
+# Indexes whose order (with the fact primary key appended) is the keyset order
+SORT_INDEXES = {
+    'amount': 'idx_fact_amount',
+    'rank': 'idx_fact_rank',
+}
+
+# CROSS JOIN pins the outer table in SQLite. Runs first walks
+# idx_dim_runs_started and each run's fact rows, which is date order and the
+# cheap way to collect a narrow filter. Fact first walks a sort index.
+RUNS_FIRST = 'dim_runs r CROSS JOIN fact_lender_results lr ON lr.run_id = r.id'
+FACT_FIRST = 'fact_lender_results lr INDEXED BY {index} CROSS JOIN dim_runs r ON r.id = lr.run_id'
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque, URL-safe cursor for a sort key."""
+    return base64.urlsafe_b64encode(dumps(list(values)).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> List:
+    """Sort key from a cursor; raises ValueError if it is malformed or from another sort."""
+    try:
+        values = loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(SORT_KEYS[sort]):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Comma-separated projection, validated against QUERY_FIELDS (raises ValueError)."""
+    if not fields:
+        return DEFAULT_FIELDS
+    names = tuple(name.strip() for name in fields.split(',') if name.strip())
+    unknown = [name for name in names if name not in QUERY_FIELDS]
+    if unknown or not names:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(QUERY_FIELDS)}")
+    return names
+
+
+def parse_list(value: Optional[str]) -> Optional[List[str]]:
+    """Comma-separated filter values, or None when the filter is not set."""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def walk_sort_index(limit: int, selectivity: float, total_rows: int) -> bool:
+    """
+    Whether an amount/rank page should walk the sort index, reading about
+    limit / selectivity rows, rather than collect every match and sort them.
+    """
+    if selectivity <= 0:
+        return False
+    return limit / selectivity < total_rows * selectivity
+
+
+def build_lender_query(fields: Sequence[str], sort: str, descending: bool, lender_ids: Optional[List[int]],
+                       scenario_keys: Optional[List[int]], lower: str, upper: str, after: Optional[List],
+                       limit: int, walk_index: bool = True) -> Tuple[str, list]:
+    """
+    SQL and parameters for one page. Selects the projected fields followed by
+    the sort key, so the caller can build the next cursor from the last row.
+    """
+    keys = SORT_KEYS[sort]
+    conditions = ['r.started_at >= ?', 'r.started_at < ?']
+    params = [lower, upper]
+    if sort != 'date':
+        # NULL never compares in a row value, so unranked rows can't be paged by amount or rank
+        conditions.append(f'{keys[0]} IS NOT NULL')
+    if lender_ids is not None:
+        conditions.append(f"lr.lender_id IN ({','.join('?' * len(lender_ids))})")
+        params.extend(lender_ids)
+    if scenario_keys is not None:
+        conditions.append(f"lr.scenario_key IN ({','.join('?' * len(scenario_keys))})")
+        params.extend(scenario_keys)
+    if after is not None:
+        conditions.append(f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' * len(keys))})")
+        params.extend(after)
+
+    source = FACT_FIRST.format(index=SORT_INDEXES[sort]) if sort != 'date' and walk_index else RUNS_FIRST
+    direction = ' DESC' if descending else ''
+    sql = f'''
+        SELECT {', '.join(QUERY_FIELDS[name] for name in fields)}, {', '.join(keys)}
+        FROM {source}
+        JOIN dim_scenarios s ON s.id = lr.scenario_key
+        JOIN dim_lenders l ON l.id = lr.lender_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {', '.join(key + direction for key in keys)}
+        LIMIT ?
+    '''
+    params.append(limit)
+    return sql, params
+
+
+def lender_result_records(fields: Sequence[str], rows) -> List[dict]:
+    """Query rows as JSON records: ISO run timestamps and boolean credit flags."""
+    timestamp = fields.index('run_timestamp') if 'run_timestamp' in fields else None
+    credit = fields.index('has_credit_commitments') if 'has_credit_commitments' in fields else None
+    records = []
+    for row in rows:
+        record = dict(zip(fields, row))
+        if timestamp is not None:
+            record['run_timestamp'] = row[timestamp].replace(' ', 'T')
+        if credit is not None:
+            record['has_credit_commitments'] = bool(row[credit])
+        records.append(record)
+    return records
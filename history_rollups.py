@@ -0,0 +1,151 @@
+"""
+Daily, weekly and monthly rollups of the run history
+Gen H rank, Gen H difference, Gen H amount and market average per scenario
+group, and mean amount and rank per lender (zero amounts included, as in
+the scenario statistics), are stored as sums and counts per period. A finished run only recomputes the periods it falls in, so the
+long-range charts read one row per period instead of scanning every fact.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Rollup rows covering every scenario group
+ALL_GROUPS = '*'
+
+# Longest range (in days) charted at each granularity before moving to a coarser one
+GRANULARITY_MAX_DAYS = (('day', 62), ('week', 366))
+
+REFRESH_GROUP_SQL = '''
+    INSERT INTO rollup_group_metrics
+    (granularity, period_start, scenario_group, runs, scenarios, ranked_scenarios, rank_sum,
+     gen_h_difference_sum, gen_h_amount_sum, market_average_sum)
+    SELECT ?, ?, {group_column}, COUNT(DISTINCT f.run_id), COUNT(*),
+           SUM(f.gen_h_rank > 0), SUM(CASE WHEN f.gen_h_rank > 0 THEN f.gen_h_rank ELSE 0 END),
+           SUM(f.gen_h_difference), SUM(f.gen_h_amount), SUM(f.average_amount)
+    FROM dim_runs r
+    JOIN fact_scenario_results f ON f.run_id = r.id
+    JOIN dim_scenarios s ON s.id = f.scenario_key
+    WHERE r.started_at >= ? AND r.started_at < ?
+    GROUP BY 3
+'''
+
+REFRESH_LENDER_SQL = '''
+    INSERT INTO rollup_lender_metrics
+    (granularity, period_start, scenario_group, lender_id, observations, amount_sum, rank_sum)
+    SELECT ?, ?, {group_column}, l.lender_id, COUNT(*), SUM(l.amount), SUM(l.rank_position)
+    FROM dim_runs r
+    JOIN fact_lender_results l ON l.run_id = r.id
+    JOIN dim_scenarios s ON s.id = l.scenario_key
+    WHERE r.started_at >= ? AND r.started_at < ?
+    GROUP BY 3, 4
+'''
+
+GROUP_COLUMNS = ("COALESCE(s.scenario_group, 'other')", f"'{ALL_GROUPS}'")
+
+
+def period_bounds(granularity: str, timestamp: str) -> Tuple[str, str]:
+    """[start, end) of the day, ISO week (Monday first) or month containing a 'YYYY-MM-DD...' timestamp."""
+    day = date.fromisoformat(timestamp[:10])
+    if granularity == 'day':
+        start, end = day, day + timedelta(days=1)
+    elif granularity == 'week':
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+    elif granularity == 'month':
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return start.isoformat(), end.isoformat()
+
+
+def refresh_rollups(conn, run_ids: Iterable[int]) -> int:
+    """
+    Recompute every rollup period containing one of `run_ids` from the fact
+    tables, inside the caller's transaction. Recomputing whole periods keeps
+    the rollups exact when a run is re-imported or completed late.
+    Returns the number of periods refreshed.
+    """
+    run_ids = list(set(run_ids))
+    if not run_ids:
+        return 0
+    placeholders = ','.join('?' * len(run_ids))
+    started = [row[0] for row in conn.execute(
+        f'SELECT DISTINCT started_at FROM dim_runs WHERE id IN ({placeholders})', run_ids)]
+
+    periods = {(granularity, *period_bounds(granularity, timestamp))
+               for timestamp in started for granularity in GRANULARITIES}
+    for granularity, start, end in periods:
+        conn.execute('DELETE FROM rollup_group_metrics WHERE granularity = ? AND period_start = ?',
+                     (granularity, start))
+        conn.execute('DELETE FROM rollup_lender_metrics WHERE granularity = ? AND period_start = ?',
+                     (granularity, start))
+        for group_column in GROUP_COLUMNS:
+            conn.execute(REFRESH_GROUP_SQL.format(group_column=group_column), (granularity, start, start, end))
+            conn.execute(REFRESH_LENDER_SQL.format(group_column=group_column), (granularity, start, start, end))
+    return len(periods)
+
+
+def rebuild_rollups(conn) -> int:
+    """Recompute every rollup from scratch (schema upgrades)."""
+    conn.execute('DELETE FROM rollup_group_metrics')
+    conn.execute('DELETE FROM rollup_lender_metrics')
+    return refresh_rollups(conn, [row[0] for row in conn.execute('SELECT id FROM dim_runs')])
+
+
+def choose_granularity(start: Optional[str], end: Optional[str]) -> str:
+    """Coarsest-needed granularity that keeps a [start, end] chart to roughly 60 points or fewer."""
+    if not start:
+        return 'month'
+    end_day = date.fromisoformat(end[:10]) if end else date.today()
+    span = (end_day - date.fromisoformat(start[:10])).days
+    for granularity, max_days in GRANULARITY_MAX_DAYS:
+        if span <= max_days:
+            return granularity
+    return 'month'
+
+
+def _mean(total, count) -> float:
+    return round(total / count, 2) if count else 0
+
+
+def group_rollup_points(rows, granularity: str) -> List[Dict]:
+    """
+    Chart points from get_group_rollups rows. Points carry run_timestamp,
+    average_gen_h_rank and average_gap like the per-run series, so the same
+    charts can plot either.
+    """
+    return [{
+        'run_timestamp': f"{period_start}T00:00:00",
+        'period_start': period_start,
+        'granularity': granularity,
+        'runs': runs,
+        'scenarios': scenarios,
+        'average_gen_h_rank': _mean(rank_sum, ranked_scenarios),
+        'average_gap': _mean(difference_sum, scenarios),
+        'average_gen_h_amount': _mean(gen_h_sum, scenarios),
+        'market_average': _mean(market_sum, scenarios),
+    } for (period_start, runs, scenarios, ranked_scenarios, rank_sum, difference_sum, gen_h_sum,
+           market_sum) in rows]
+
+
+def lender_rollup_points(rows, granularity: str) -> List[Dict]:
+    """Chart points from get_lender_rollups rows."""
+    return [{
+        'run_timestamp': f"{period_start}T00:00:00",
+        'period_start': period_start,
+        'granularity': granularity,
+        'observations': observations,
+        'mean_amount': _mean(amount_sum, observations),
+        'mean_rank': _mean(rank_sum, observations),
+    } for period_start, observations, amount_sum, rank_sum in rows]
+
+
+def parse_range(start: Optional[str], end: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Validate optional 'YYYY-MM-DD' bounds (raises ValueError)."""
+    for value in (start, end):
+        if value:
+            datetime.fromisoformat(value)
+    return (start[:10] if start else None), (end[:10] if end else None)
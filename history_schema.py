@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Normalized, integer-keyed schema for the MBT history database
+Lenders, scenarios and runs live in dimension tables; scenario summaries and
+lender amounts are stored as integer-keyed fact rows with covering indexes
+for the endpoint query patterns. Runs carry full timestamps, so several runs
+on the same day no longer collide.
+
+Usage: python3 history_schema.py [db_path]   (migrates the legacy tables in place)
+"""
+
+import sqlite3
+import sys
+from datetime import datetime
+
+from history_rollups import rebuild_rollups
+from scenario_groups import scenario_attributes
+
+SCHEMA_VERSION = 12
+
+# Schema version that introduced the normalized tables; older databases
+# have their legacy rows migrated when they are upgraded past it.
+NORMALIZED_SCHEMA_VERSION = 2
+
+# Schema version that introduced the run catalog; materialized runs stored
+# before it are registered in the catalog on upgrade.
+RUN_CATALOG_SCHEMA_VERSION = 4
+
+# Schema version that introduced the period rollups; they are built from
+# the existing history on upgrade.
+ROLLUP_SCHEMA_VERSION = 8
+
+# Schema version that moved legacy run times to local time; databases
+# migrated before it have their legacy UTC timestamps converted on upgrade.
+LOCAL_TIME_SCHEMA_VERSION = 10
+
+# Schema version whose lender rollups count zero amounts; rollups built
+# before it left them out and are rebuilt on upgrade.
+LENDER_ROLLUP_SCHEMA_VERSION = 12
+
+# Pointer key that always tracks the newest finished run of any type
+ANY_RUN_TYPE = '*'
+
+SCHEMA_SQL = '''
+CREATE TABLE IF NOT EXISTS dim_lenders (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS dim_scenarios (
+    id INTEGER PRIMARY KEY,
+    scenario_id TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL DEFAULT '',
+    applicants TEXT NOT NULL DEFAULT 'unknown',       -- 'single' or 'joint'
+    employment_type TEXT NOT NULL DEFAULT 'unknown',  -- 'employed' or 'self-employed'
+    income INTEGER NOT NULL DEFAULT 0,
+    has_credit_commitments INTEGER NOT NULL DEFAULT 0,
+    scenario_group TEXT                                -- dashboard group, e.g. 'joint_employed_credit'
+);
+
+CREATE TABLE IF NOT EXISTS dim_runs (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL UNIQUE,
+    run_type TEXT NOT NULL DEFAULT 'unknown',
+    started_at TEXT NOT NULL,                          -- 'YYYY-MM-DD HH:MM:SS', server local time
+    finished_at TEXT,
+    total_scenarios INTEGER NOT NULL DEFAULT 0,
+    successful_scenarios INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running'
+);
+
+CREATE TABLE IF NOT EXISTS fact_scenario_results (
+    run_id INTEGER NOT NULL REFERENCES dim_runs(id),
+    scenario_key INTEGER NOT NULL REFERENCES dim_scenarios(id),
+    recorded_at TEXT NOT NULL,
+    gen_h_amount INTEGER,
+    average_amount INTEGER,
+    gen_h_difference INTEGER,
+    gen_h_rank INTEGER,
+    total_lenders INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, scenario_key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_lender_results (
+    run_id INTEGER NOT NULL REFERENCES dim_runs(id),
+    scenario_key INTEGER NOT NULL REFERENCES dim_scenarios(id),
+    lender_id INTEGER NOT NULL REFERENCES dim_lenders(id),
+    amount INTEGER,
+    rank_position INTEGER,
+    PRIMARY KEY (run_id, scenario_key, lender_id)
+) WITHOUT ROWID;
+
+-- Grouped results + summary statistics computed once per finished run
+CREATE TABLE IF NOT EXISTS materialized_results (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    run_type TEXT NOT NULL DEFAULT 'unknown',
+    format_version INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    document TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_materialized_results_session ON materialized_results(session_id);
+
+-- One row per finished run: its type, materialized document and results file
+CREATE TABLE IF NOT EXISTS run_catalog (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL UNIQUE,
+    run_type TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    materialized_version INTEGER NOT NULL REFERENCES materialized_results(version),
+    results_file TEXT,
+    scenario_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Latest finished run per run type ('*' = any type), resolved by primary key
+CREATE TABLE IF NOT EXISTS latest_run_pointers (
+    run_type TEXT PRIMARY KEY,
+    catalog_id INTEGER NOT NULL REFERENCES run_catalog(id)
+) WITHOUT ROWID;
+
+-- Bumped by every write transaction, HTTP ETags for history endpoints derive from it
+CREATE TABLE IF NOT EXISTS history_revision (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    revision INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO history_revision (id, revision) VALUES (1, 0);
+
+-- Records waiting to be upserted to Supabase, one row per (table, idempotency key)
+CREATE TABLE IF NOT EXISTS supabase_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    record_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,       -- unix time
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    UNIQUE (table_name, record_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_supabase_outbox_due ON supabase_outbox(table_name, next_attempt_at, id);
+
+-- Outbox records Supabase rejected or that ran out of attempts, kept for inspection
+CREATE TABLE IF NOT EXISTS supabase_outbox_dead (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    record_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    failed_at TEXT NOT NULL,
+    UNIQUE (table_name, record_key)
+);
+
+-- Local read replica of Supabase, the newest run_timestamp and row id mirrored per table
+CREATE TABLE IF NOT EXISTS replica_sync_state (
+    table_name TEXT PRIMARY KEY,
+    high_water_mark TEXT,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    rows_synced INTEGER NOT NULL DEFAULT 0,
+    synced_at TEXT
+) WITHOUT ROWID;
+
+-- Per-period sums and counts per scenario group ('*' = all groups), see history_rollups.py
+CREATE TABLE IF NOT EXISTS rollup_group_metrics (
+    granularity TEXT NOT NULL,                         -- 'day', 'week' or 'month'
+    scenario_group TEXT NOT NULL,
+    period_start TEXT NOT NULL,                        -- 'YYYY-MM-DD'
+    runs INTEGER NOT NULL,
+    scenarios INTEGER NOT NULL,
+    ranked_scenarios INTEGER NOT NULL,
+    rank_sum INTEGER NOT NULL,
+    gen_h_difference_sum INTEGER,
+    gen_h_amount_sum INTEGER,
+    market_average_sum INTEGER,
+    PRIMARY KEY (granularity, scenario_group, period_start)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_lender_metrics (
+    granularity TEXT NOT NULL,
+    lender_id INTEGER NOT NULL REFERENCES dim_lenders(id),
+    scenario_group TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    observations INTEGER NOT NULL,
+    amount_sum INTEGER,
+    rank_sum INTEGER,
+    PRIMARY KEY (granularity, lender_id, scenario_group, period_start)
+) WITHOUT ROWID;
+
+-- Rollup refreshes replace whole periods
+CREATE INDEX IF NOT EXISTS idx_rollup_lender_period ON rollup_lender_metrics(granularity, period_start);
+
+-- Run listings / "latest run" lookups
+CREATE INDEX IF NOT EXISTS idx_dim_runs_started ON dim_runs(started_at);
+
+-- /api/historical-data/{scenario_id}: newest runs for one scenario, fully covered
+CREATE INDEX IF NOT EXISTS idx_fact_scenario_history
+    ON fact_scenario_results(scenario_key, run_id, gen_h_amount, average_amount, gen_h_difference, gen_h_rank);
+
+-- /api/lender-trends/{lender_name}: one lender across runs and scenarios, fully covered
+CREATE INDEX IF NOT EXISTS idx_fact_lender_trend
+    ON fact_lender_results(lender_id, run_id, scenario_key, amount, rank_position);
+
+-- Scenario + lender history (DatabaseManager.get_historical_data with both filters)
+CREATE INDEX IF NOT EXISTS idx_fact_lender_scenario
+    ON fact_lender_results(scenario_key, lender_id, run_id, amount, rank_position);
+
+-- /api/lender-results by amount or rank: with the primary key appended these
+-- match the keyset order, so broad queries page by walking the index
+CREATE INDEX IF NOT EXISTS idx_fact_amount ON fact_lender_results(amount);
+CREATE INDEX IF NOT EXISTS idx_fact_rank ON fact_lender_results(rank_position);
+'''
+
+# Session ID prefix -> run type, matching the session IDs the server generates
+RUN_TYPE_PREFIXES = {
+    'complete-session': 'complete',
+    'credit-session': 'credit',
+    'full-session': 'full',
+    'sample-session': 'sample'
+}
+
+
+def run_type_from_session(session_id):
+    """Infer the run type from a generated session ID."""
+    for prefix, run_type in RUN_TYPE_PREFIXES.items():
+        if session_id.startswith(prefix):
+            return run_type
+    return 'unknown'
+
+
+def now_timestamp():
+    """
+    Current local time in the format of SQLite's CURRENT_TIMESTAMP. Run
+    times are stored in server local time throughout, like session IDs.
+    """
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+def table_exists(conn, name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def upsert_scenario_dimension(conn, scenario_id, description=''):
+    """Insert a scenario into dim_scenarios if missing and return its integer key."""
+    row = conn.execute('SELECT id FROM dim_scenarios WHERE scenario_id = ?', (scenario_id,)).fetchone()
+    if row:
+        return row[0]
+
+    attrs = scenario_attributes(scenario_id)
+    cursor = conn.execute('''
+        INSERT INTO dim_scenarios
+        (scenario_id, description, applicants, employment_type, income, has_credit_commitments, scenario_group)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (scenario_id, description, attrs['applicants'], attrs['employment_type'], attrs['income'],
+          attrs['has_credit_commitments'], attrs['scenario_group']))
+    return cursor.lastrowid
+
+
+def seed_scenario_dimension(conn):
+    """Copy the predefined scenarios table into dim_scenarios."""
+    if not table_exists(conn, 'scenarios'):
+        return 0
+
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(scenarios)')}
+    credit_column = 'has_credit_commitments' if 'has_credit_commitments' in columns else '0'
+    rows = conn.execute(f'''
+        SELECT scenario_id, description, applicants, employment_type, income, {credit_column}
+        FROM scenarios
+    ''').fetchall()
+
+    conn.executemany('''
+        INSERT OR IGNORE INTO dim_scenarios
+        (scenario_id, description, applicants, employment_type, income, has_credit_commitments, scenario_group)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (scenario_id, description, applicants, employment_type, income, 1 if has_credit else 0,
+         scenario_attributes(scenario_id)['scenario_group'])
+        for scenario_id, description, applicants, employment_type, income, has_credit in rows
+    ])
+    return len(rows)
+
+
+def migrate_legacy_history(conn):
+    """
+    Copy the legacy TEXT-keyed automation_runs / scenario_results / lender_results
+    rows into the normalized tables. Legacy tables are left in place untouched.
+    Legacy run_time is CURRENT_TIMESTAMP (UTC) and is converted to local time.
+    """
+    migrated = {'runs': 0, 'scenario_results': 0, 'lender_results': 0}
+    if not table_exists(conn, 'scenario_results'):
+        return migrated
+
+    # Runs: recorded runs first, then sessions that only appear in result rows
+    legacy_runs = conn.execute('''
+        SELECT session_id, datetime(MIN(run_time), 'localtime'), MAX(total_scenarios), MAX(successful_scenarios),
+               MAX(status)
+        FROM (
+            SELECT session_id, run_time, total_scenarios, successful_scenarios, status FROM automation_runs
+            UNION ALL
+            SELECT session_id, run_time, 0, 0, 'completed' FROM scenario_results
+        )
+        GROUP BY session_id
+    ''').fetchall() if table_exists(conn, 'automation_runs') else conn.execute('''
+        SELECT session_id, datetime(MIN(run_time), 'localtime'), 0, 0, 'completed'
+        FROM scenario_results GROUP BY session_id
+    ''').fetchall()
+
+    for session_id, run_time, total, successful, status in sorted(legacy_runs, key=lambda r: (r[1] or '', r[0])):
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO dim_runs
+            (session_id, run_type, started_at, finished_at, total_scenarios, successful_scenarios, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (session_id, run_type_from_session(session_id), run_time or now_timestamp(),
+              run_time if status != 'running' else None, total or 0, successful or 0, status or 'completed'))
+        migrated['runs'] += cursor.rowcount
+
+    # Scenarios referenced by results but missing from the predefined table
+    for (scenario_id,) in conn.execute('''
+        SELECT DISTINCT scenario_id FROM scenario_results
+        UNION SELECT DISTINCT scenario_id FROM lender_results
+    ''').fetchall():
+        upsert_scenario_dimension(conn, scenario_id)
+
+    conn.execute('INSERT OR IGNORE INTO dim_lenders (name) SELECT DISTINCT lender_name FROM lender_results')
+
+    cursor = conn.execute('''
+        INSERT OR REPLACE INTO fact_scenario_results
+        (run_id, scenario_key, recorded_at, gen_h_amount, average_amount, gen_h_difference, gen_h_rank, total_lenders)
+        SELECT r.id, s.id, COALESCE(datetime(sr.run_time, 'localtime'), r.started_at), sr.gen_h_amount, sr.average_amount,
+               sr.gen_h_difference, sr.gen_h_rank, sr.total_lenders
+        FROM scenario_results sr
+        JOIN dim_runs r ON r.session_id = sr.session_id
+        JOIN dim_scenarios s ON s.scenario_id = sr.scenario_id
+        ORDER BY sr.id
+    ''')
+    migrated['scenario_results'] = cursor.rowcount
+
+    cursor = conn.execute('''
+        INSERT OR REPLACE INTO fact_lender_results
+        (run_id, scenario_key, lender_id, amount, rank_position)
+        SELECT r.id, s.id, l.id, lr.amount, lr.rank_position
+        FROM lender_results lr
+        JOIN dim_runs r ON r.session_id = lr.session_id
+        JOIN dim_scenarios s ON s.scenario_id = lr.scenario_id
+        JOIN dim_lenders l ON l.name = lr.lender_name
+        ORDER BY lr.id
+    ''')
+    migrated['lender_results'] = cursor.rowcount
+    return migrated
+
+
+def localize_legacy_timestamps(conn):
+    """
+    Convert run times copied verbatim from the legacy tables (UTC) by
+    migrations before LOCAL_TIME_SCHEMA_VERSION to local time. Only values
+    still equal to their legacy UTC source are touched.
+    """
+    if not table_exists(conn, 'scenario_results'):
+        return 0
+
+    legacy_sources = 'SELECT session_id, run_time FROM scenario_results'
+    if table_exists(conn, 'automation_runs'):
+        legacy_sources += ' UNION ALL SELECT session_id, run_time FROM automation_runs'
+    cursor = conn.execute(f'''
+        UPDATE dim_runs SET
+            started_at = datetime(started_at, 'localtime'),
+            finished_at = CASE WHEN finished_at = started_at THEN datetime(finished_at, 'localtime')
+                               ELSE finished_at END
+        WHERE started_at = (SELECT MIN(run_time) FROM ({legacy_sources}) legacy
+                            WHERE legacy.session_id = dim_runs.session_id)
+    ''')
+    conn.execute('''
+        UPDATE fact_scenario_results SET recorded_at = datetime(recorded_at, 'localtime')
+        WHERE recorded_at IN (SELECT sr.run_time FROM scenario_results sr
+                              JOIN dim_runs r ON r.session_id = sr.session_id
+                              JOIN dim_scenarios s ON s.scenario_id = sr.scenario_id
+                              WHERE r.id = fact_scenario_results.run_id
+                                AND s.id = fact_scenario_results.scenario_key)
+    ''')
+    return cursor.rowcount
+
+
+def point_latest_run(conn, catalog_id, run_type):
+    """Move the run-type and any-type latest pointers to a catalog row unless they point at a newer run."""
+    for pointer in (run_type, ANY_RUN_TYPE):
+        conn.execute('''
+            INSERT INTO latest_run_pointers (run_type, catalog_id) VALUES (?, ?)
+            ON CONFLICT(run_type) DO UPDATE SET catalog_id = excluded.catalog_id
+            WHERE (SELECT finished_at FROM run_catalog WHERE id = excluded.catalog_id)
+               >= (SELECT finished_at FROM run_catalog WHERE id = latest_run_pointers.catalog_id)
+        ''', (pointer, catalog_id))
+
+
+def catalog_materialized_runs(conn):
+    """Register runs materialized before the run catalog existed."""
+    rows = conn.execute('''
+        SELECT session_id, run_type, created_at, MAX(version)
+        FROM materialized_results
+        GROUP BY session_id
+        ORDER BY MAX(version)
+    ''').fetchall()
+
+    for session_id, run_type, created_at, version in rows:
+        catalog_id = conn.execute('''
+            INSERT INTO run_catalog (session_id, run_type, finished_at, materialized_version)
+            VALUES (?, ?, ?, ?)
+        ''', (session_id, run_type, created_at, version)).lastrowid
+        point_latest_run(conn, catalog_id, run_type)
+    return len(rows)
+
+
+def ensure_schema(conn):
+    """
+    Create or upgrade the schema and migrate legacy rows once.
+    Uses PRAGMA user_version to record which upgrades have run.
+    Expects an autocommit connection; runs in its own transaction.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return None
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Another process may have migrated while we waited for the lock
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            conn.rollback()
+            return None
+
+        for statement in SCHEMA_SQL.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+
+        migrated = {}
+        if version < NORMALIZED_SCHEMA_VERSION:
+            seed_scenario_dimension(conn)
+            migrated = migrate_legacy_history(conn)
+        if version < RUN_CATALOG_SCHEMA_VERSION:
+            migrated['catalogued_runs'] = catalog_materialized_runs(conn)
+        if NORMALIZED_SCHEMA_VERSION <= version < LOCAL_TIME_SCHEMA_VERSION:
+            migrated['localized_runs'] = localize_legacy_timestamps(conn)
+        if version < LENDER_ROLLUP_SCHEMA_VERSION or migrated.get('localized_runs'):
+            migrated['rollup_periods'] = rebuild_rollups(conn)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+    return migrated
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "mbt_affordability_history.db"
+
+    print("🔧 MBT history schema migration")
+    print("=" * 50)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    migrated = ensure_schema(conn)
+    if migrated is None:
+        print(f"ℹ️  {db_path} is already at schema version {SCHEMA_VERSION}")
+    else:
+        print(f"✅ Migrated {db_path} to schema version {SCHEMA_VERSION}")
+        for name, count in migrated.items():
+            print(f"   {name}: {count} legacy rows migrated")
+
+    for table in ('dim_lenders', 'dim_scenarios', 'dim_runs', 'fact_scenario_results', 'fact_lender_results',
+                  'materialized_results', 'run_catalog'):
+        count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        print(f"   {table}: {count} rows")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+HTTP conditional request helpers (ETag / Last-Modified / 304)
+ETags are derived from run versions and history revisions, so unchanged
+data costs a header exchange instead of re-serialising the payload.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Browsers may keep the payload but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag built from the values that determine a response."""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    """Format a stored 'YYYY-MM-DD HH:MM:SS' local timestamp as an HTTP date."""
+    if not timestamp:
+        return None
+    try:
+        moment = datetime.fromisoformat(timestamp).astimezone(timezone.utc)
+    except ValueError:
+        return None
+    return format_datetime(moment, usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[str] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+def _etag_matches(header_value: str, etag: str) -> bool:
+    if header_value.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = [candidate.strip() for candidate in header_value.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    """True when the client's cached copy is still current."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    # If-Modified-Since is only consulted when no ETag was sent
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(etag: str, last_modified: Optional[str] = None) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, last_modified))
+
+
+def check_not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> Optional[Response]:
+    """A 304 response if the client's copy is current, otherwise None."""
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    return None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Columnar Parquet store of lender result history
+Each run is written as one Parquet file under a Hive-style partition
+layout, history_parquet/run_month=YYYY-MM/run_type=<type>/<session_id>.parquet,
+so pandas, pyarrow or DuckDB can load years of results with partition and
+column pruning. Appending a run only writes that run's file.
+
+Usage: python3 parquet_history.py [--db mbt_affordability_history.db] [--output history_parquet] [--rebuild]
+"""
+
+import argparse
+import os
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    print("⚠️ pyarrow not available - Parquet history export disabled")
+
+HISTORY_PARQUET_DIR = os.getenv("HISTORY_PARQUET_DIR", "history_parquet")
+
+if PYARROW_AVAILABLE:
+    # run_month and run_type come from the partition path, not the files
+    HISTORY_PARQUET_SCHEMA = pa.schema([
+        ('run_timestamp', pa.timestamp('s')),
+        ('session_id', pa.string()),
+        ('scenario_id', pa.string()),
+        ('description', pa.string()),
+        ('applicants', pa.string()),
+        ('employment_type', pa.string()),
+        ('income', pa.int32()),
+        ('has_credit_commitments', pa.bool_()),
+        ('scenario_group', pa.string()),
+        ('gen_h_amount', pa.int64()),
+        ('average_amount', pa.int64()),
+        ('gen_h_difference', pa.int64()),
+        ('gen_h_rank', pa.int16()),
+        ('lender_name', pa.string()),
+        ('amount', pa.int64()),
+        ('rank_position', pa.int16()),
+    ])
+
+
+def run_file_path(run, root=HISTORY_PARQUET_DIR):
+    """Partitioned file path for a run dict with session_id, run_type and started_at."""
+    month = (run['started_at'] or '0000-00')[:7]
+    run_type = run['run_type'] or 'unknown'
+    return os.path.join(root, f"run_month={month}", f"run_type={run_type}", f"{run['session_id']}.parquet")
+
+
+def run_table(run, rows):
+    """Arrow table for one run from RUN_LENDER_ROWS_COLUMNS-ordered rows."""
+    columns = list(zip(*rows)) if rows else [()] * 14
+    (scenario_ids, descriptions, applicants, employment_types, incomes, credit_flags, groups,
+     gen_h_amounts, averages, differences, gen_h_ranks, lender_names, amounts, ranks) = columns
+
+    run_timestamp = datetime.fromisoformat(run['started_at'])
+    arrays = [
+        pa.array([run_timestamp] * len(rows), pa.timestamp('s')),
+        pa.array([run['session_id']] * len(rows), pa.string()),
+        pa.array(scenario_ids, pa.string()),
+        pa.array(descriptions, pa.string()),
+        pa.array(applicants, pa.string()),
+        pa.array(employment_types, pa.string()),
+        pa.array(incomes, pa.int32()),
+        pa.array([bool(flag) for flag in credit_flags], pa.bool_()),
+        pa.array(groups, pa.string()),
+        pa.array(gen_h_amounts, pa.int64()),
+        pa.array(averages, pa.int64()),
+        pa.array(differences, pa.int64()),
+        pa.array(gen_h_ranks, pa.int16()),
+        pa.array(lender_names, pa.string()),
+        pa.array(amounts, pa.int64()),
+        pa.array(ranks, pa.int16()),
+    ]
+    return pa.Table.from_arrays(arrays, schema=HISTORY_PARQUET_SCHEMA)
+
+
+def write_run(db, session_id, root=HISTORY_PARQUET_DIR):
+    """
+    Write (or rewrite) one run's partition file. Returns the path, or None if
+    the run has no stored results.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is not installed")
+
+    stored = db.get_run_lender_rows(session_id)
+    if stored is None or not stored[1]:
+        return None
+    run, rows = stored
+
+    path = run_file_path(run, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Dot-prefixed temp files are ignored by dataset readers until the rename
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    pq.write_table(run_table(run, rows), tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_history(db, root=HISTORY_PARQUET_DIR, rebuild=False):
+    """Write every stored run that isn't in the dataset yet. Returns (written, skipped)."""
+    written = skipped = 0
+    for run in db.list_runs():
+        if not rebuild and os.path.exists(run_file_path(run, root)):
+            skipped += 1
+            continue
+        if write_run(db, run['session_id'], root):
+            written += 1
+        else:
+            skipped += 1
+    return written, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export lender result history to partitioned Parquet")
+    parser.add_argument("--db", default="mbt_affordability_history.db")
+    parser.add_argument("--output", default=HISTORY_PARQUET_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="rewrite runs already in the dataset")
+    args = parser.parse_args()
+
+    if not PYARROW_AVAILABLE:
+        print("❌ pyarrow is required: pip install pyarrow")
+        return
+
+    from history_database import DatabaseManager
+
+    db = DatabaseManager(args.db)
+    try:
+        written, skipped = export_history(db, args.output, rebuild=args.rebuild)
+    finally:
+        db.close_all()
+    print(f"✅ Parquet history in {args.output}: {written} runs written, {skipped} skipped")
+
+
+if __name__ == "__main__":
+    main()
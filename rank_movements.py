@@ -0,0 +1,129 @@
+"""
+Gen H rank movements across the last N runs
+Every backend reduces its history to a runs x scenarios rank matrix (NaN
+where a scenario has no ranked result) and this module derives rank deltas,
+net change, streaks and volatility for every scenario and scenario group in
+one vectorized pass. Positive changes are improvements (rank went down).
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from scenario_groups import GROUP_ORDER, scenario_group
+
+DEFAULT_RUNS = 10
+MAX_RUNS = 365
+
+STREAK_DIRECTIONS = {1.0: 'improving', -1.0: 'declining', 0.0: 'stable'}
+
+
+def rank_matrix_from_rows(rows) -> tuple:
+    """
+    (run labels oldest first, scenario_ids, rank matrix) from rows of
+    (run_age, run_label, scenario_id, gen_h_rank) where run_age 1 is the newest run.
+    """
+    rows = list(rows)
+    if not rows:
+        return [], [], np.empty((0, 0))
+    ages = np.array([row[0] for row in rows], dtype=np.intp)
+    runs = int(ages.max())
+    labels = [None] * runs
+    for age, label, _, _ in rows:
+        labels[runs - age] = label
+    scenario_ids, scenario_codes = np.unique([row[2] for row in rows], return_inverse=True)
+    ranks = np.full((runs, len(scenario_ids)), np.nan)
+    values = np.array([row[3] or 0 for row in rows], dtype=np.float64)
+    ranks[runs - ages, scenario_codes] = np.where(values > 0, values, np.nan)
+    return labels, scenario_ids.tolist(), ranks
+
+
+def _value(value):
+    """Rounded float with NaN as None, for JSON."""
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _values(array) -> List:
+    return [None if value != value else value for value in np.round(array, 2).tolist()]
+
+
+def _nan_mean(values, axis=0):
+    counts = np.sum(~np.isnan(values), axis=axis)
+    totals = np.nansum(values, axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+
+def rank_movements(run_labels: Sequence[str], scenario_ids: Sequence[str], ranks: np.ndarray) -> Dict:
+    """Per-scenario and per-group rank movement over the runs of `ranks` (oldest run first)."""
+    runs, count = ranks.shape
+    if runs < 2:
+        return {'error': 'Need at least 2 runs to calculate rank movements'}
+
+    present = ~np.isnan(ranks)
+    columns = np.arange(count)
+    first = ranks[np.argmax(present, axis=0), columns]
+    latest = ranks[runs - 1 - np.argmax(present[::-1], axis=0), columns]
+
+    # deltas[i] is the change from run i to run i + 1, positive = improved
+    deltas = ranks[:-1] - ranks[1:]
+    net_change = first - latest
+    mean_delta = _nan_mean(deltas)
+    volatility = np.sqrt(_nan_mean((deltas - mean_delta) ** 2))
+
+    # Streak: how many of the latest moves share the direction of the last one
+    signs = np.sign(deltas[::-1])
+    same = signs == signs[0]
+    streak = np.cumprod(same, axis=0).sum(axis=0)
+
+    groups = [scenario_group(scenario_id) or 'other' for scenario_id in scenario_ids]
+    scenarios = {}
+    for index, scenario_id in enumerate(scenario_ids):
+        last_sign = signs[0, index]
+        scenarios[scenario_id] = {
+            'group': groups[index],
+            'ranks': _values(ranks[:, index]),
+            'latest_rank': _value(latest[index]),
+            'net_change': _value(net_change[index]),
+            'latest_change': _value(deltas[-1, index]),
+            'volatility': _value(volatility[index]),
+            'streak': {'direction': None if np.isnan(last_sign) else STREAK_DIRECTIONS[float(last_sign)],
+                       'length': int(streak[index])},
+        }
+
+    # Group aggregates as one matrix product per measure
+    group_names = sorted(set(groups), key=lambda group: (GROUP_ORDER.get(group, len(GROUP_ORDER)), group))
+    membership = np.zeros((count, len(group_names)))
+    membership[columns, [group_names.index(group) for group in groups]] = 1.0
+
+    def group_mean(values):
+        values = np.atleast_2d(values)
+        valid = ~np.isnan(values)
+        totals = np.where(valid, values, 0.0) @ membership
+        counts = valid.astype(np.float64) @ membership
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+    rank_by_run = group_mean(ranks)
+    net_by_group = group_mean(net_change)[0]
+    latest_by_group = group_mean(deltas[-1])[0]
+    volatility_by_group = group_mean(volatility)[0]
+    direction = np.sign(np.nan_to_num(net_change))
+    improving = (direction > 0).astype(np.float64) @ membership
+    declining = (direction < 0).astype(np.float64) @ membership
+
+    group_movements = {}
+    for index, group in enumerate(group_names):
+        members = int(membership[:, index].sum())
+        group_movements[group] = {
+            'scenarios': members,
+            'average_rank_by_run': _values(rank_by_run[:, index]),
+            'net_change': _value(net_by_group[index]),
+            'latest_change': _value(latest_by_group[index]),
+            'volatility': _value(volatility_by_group[index]),
+            'improving': int(improving[index]),
+            'declining': int(declining[index]),
+            'stable': members - int(improving[index]) - int(declining[index]),
+        }
+
+    return {'runs': list(run_labels), 'scenarios': scenarios, 'groups': group_movements}
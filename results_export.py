@@ -0,0 +1,119 @@
+"""
+Streaming exports of automation results
+Rows are generated one scenario at a time and flushed to the client in
+buffered chunks, so nothing is written to the working directory and memory
+stays flat however large the export is.
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List
+
+from fast_json import dumps
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+RESULTS_HEADER = ['Scenario_ID', 'Description', 'Gen_H_Amount', 'Market_Average', 'Gen_H_Rank', 'Total_Lenders']
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def export_filename(extension: str, prefix: str = "mbt_export") -> str:
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+def attachment_headers(filename: str) -> Dict[str, str]:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def all_lender_names(results: Dict) -> List[str]:
+    lenders = set()
+    for scenario_data in results.values():
+        lenders.update(scenario_data.get('lender_results', {}).keys())
+    return sorted(lenders)
+
+
+def iter_result_rows(results: Dict) -> Iterator[list]:
+    """Header row, then one wide row per scenario with an amount column per lender."""
+    lenders = all_lender_names(results)
+    yield RESULTS_HEADER + lenders
+
+    for scenario_id, scenario_data in results.items():
+        stats = scenario_data.get('statistics', {})
+        lender_results = scenario_data.get('lender_results', {})
+        yield [
+            scenario_id,
+            scenario_data.get('description', ''),
+            stats.get('gen_h_amount', 0),
+            int(stats.get('average', 0) or 0),
+            stats.get('gen_h_rank', 0),
+            len(lender_results),
+        ] + [lender_results.get(lender, 0) for lender in lenders]
+
+
+def stream_csv(rows: Iterable[list], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode rows as CSV, yielding roughly `chunk_size` bytes at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_results_json(data: Dict, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """The {export_info, data} export document, with `results` written one scenario at a time."""
+    results = data.get('results', {})
+    export_info = {
+        'export_date': datetime.now().isoformat(),
+        'total_scenarios': len(results),
+        'format': 'json'
+    }
+    header = {key: value for key, value in data.items() if key != 'results'}
+
+    parts = [f'{{"export_info":{dumps(export_info)},"data":{dumps(header)[:-1]}']
+    parts.append(',"results":{' if header else '"results":{')
+    size = 0
+    for index, (scenario_id, scenario_data) in enumerate(results.items()):
+        part = f'{"," if index else ""}{dumps(scenario_id)}:{dumps(scenario_data)}'
+        parts.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    parts.append('}}}')
+    yield ''.join(parts).encode('utf-8')
+
+
+def stream_jsonl(columns, rows: Iterable, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode row tuples as JSON Lines objects keyed by `columns`."""
+    lines, size = [], 0
+    for row in rows:
+        line = dumps(dict(zip(columns, row)))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines, size = [], 0
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+async def stream_record_pages(columns, pages: AsyncIterable[List[Dict]], format_type: str) -> AsyncIterator[bytes]:
+    """CSV (with header) or JSON Lines from an async source of record pages, one page at a time."""
+    header = [list(columns)] if format_type == 'csv' else []
+    async for page in pages:
+        rows = [[record.get(column) for column in columns] for record in page]
+        chunks = stream_jsonl(columns, rows) if format_type == 'jsonl' else stream_csv(header + rows)
+        header = []
+        for chunk in chunks:
+            yield chunk
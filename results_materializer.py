@@ -0,0 +1,123 @@
+"""
+Materialized per-run results documents
+Grouping and summary statistics are computed once when a run finishes and
+stored as a versioned document; the read endpoint serves the document from
+an in-memory cache keyed by that version.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from scenario_groups import GROUP_HEADERS, GROUP_ORDER, income_from_description, scenario_group
+from statistics_engine import ResultsArray, lender_summary, rank_summary
+
+# Bump when the document shape changes; stored documents with an older
+# format are rebuilt from the run data they embed.
+MATERIALIZED_FORMAT_VERSION = 2
+
+
+def resolve_group(scenario_id):
+    """Dashboard group for a scenario, falling back like the original grouping did."""
+    group = scenario_group(scenario_id)
+    if group is None:
+        group = 'sole_employed_credit' if '_credit' in scenario_id else 'sole_employed'
+    return group
+
+
+def summarize_gen_h_ranks(results: Dict) -> Dict:
+    """Average Gen H rank and 1st/2nd/3rd/top-3 percentages over a results dict."""
+    summary = rank_summary(scenario_data.get('statistics', {}).get('gen_h_rank') for scenario_data in results.values())
+    ranked = summary['ranked']
+
+    def percent(count):
+        return round((count / ranked) * 100, 1) if ranked > 0 else 0
+
+    return {
+        'total_scenarios': len(results),
+        'scenarios_with_ranks': ranked,
+        'average_gen_h_rank': round(summary['average_rank'], 2) if ranked else 0,
+        'rank_percentages': {
+            'rank_1_percent': percent(summary['rank_counts'][1]),
+            'rank_2_percent': percent(summary['rank_counts'][2]),
+            'rank_3_percent': percent(summary['rank_counts'][3]),
+        },
+        'top_3_percent': percent(summary['top_3'])
+    }
+
+
+def build_materialized_results(data: Dict, aggregates=None) -> Dict:
+    """
+    Group scenarios by applicant/employment/credit type, sort each group by
+    income and attach summary statistics. Statistics are read from the run's
+    RunAggregates when given, otherwise computed from the results. Returns
+    `data` unchanged if it has no results.
+    """
+    results = data.get('results')
+    if not results:
+        return data
+
+    grouped_results = {group: {} for group in GROUP_ORDER}
+
+    ordered = sorted(
+        ((scenario_id, scenario_data, resolve_group(scenario_id),
+          income_from_description(scenario_data.get('description', '')))
+         for scenario_id, scenario_data in results.items()),
+        key=lambda item: (GROUP_ORDER.get(item[2], len(GROUP_ORDER)), item[3])
+    )
+    for scenario_id, scenario_data, group, _ in ordered:
+        grouped_results[group][scenario_id] = scenario_data
+
+    if aggregates is not None:
+        summary_statistics = aggregates.summary_statistics()
+        lender_statistics = aggregates.lender_statistics()
+    else:
+        summary_statistics = summarize_gen_h_ranks(results)
+        lender_statistics = lender_summary(ResultsArray.from_results(results))
+
+    return {
+        **data,
+        'grouped_results': grouped_results,
+        'summary_statistics': summary_statistics,
+        'lender_statistics': lender_statistics,
+        'group_headers': GROUP_HEADERS,
+        'materialized_format': MATERIALIZED_FORMAT_VERSION,
+        'materialized_at': datetime.now().isoformat()
+    }
+
+
+MATERIALIZED_FIELDS = ('grouped_results', 'group_headers', 'lender_statistics', 'materialized_format',
+                       'materialized_at', 'materialized_version')
+
+
+def strip_materialized_fields(document: Dict) -> Dict:
+    """The original run data embedded in a materialized document."""
+    return {key: value for key, value in document.items() if key not in MATERIALIZED_FIELDS}
+
+
+class MaterializedResultsCache:
+    """Small thread-safe LRU of materialized documents keyed by run version."""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: int) -> Optional[Dict]:
+        with self._lock:
+            document = self._entries.get(version)
+            if document is not None:
+                self._entries.move_to_end(version)
+            return document
+
+    def put(self, version: int, document: Dict) -> None:
+        with self._lock:
+            self._entries[version] = document
+            self._entries.move_to_end(version)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
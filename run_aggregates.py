@@ -0,0 +1,219 @@
+"""
+Online aggregates for a run in progress
+Running means, variances and rank histograms, overall, per lender and per
+scenario group, are updated as each scenario finishes. The run summary and
+partial-run dashboards read the accumulators instead of rescanning the
+results dict.
+"""
+
+import math
+import threading
+from bisect import insort
+from typing import Dict, List, Optional
+
+from scenario_groups import scenario_group
+from statistics_engine import FOCUS_LENDER
+
+
+class RunningStats:
+    """Welford running count, mean, population variance, min and max."""
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean': round(self.mean, 2),
+            'std': round(self.std, 2),
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+class RankHistogram:
+    """Counts of positive integer ranks; rank 0 / missing is ignored."""
+
+    __slots__ = ('counts', 'total', '_sum')
+
+    def __init__(self):
+        self.counts = [0]
+        self.total = 0
+        self._sum = 0
+
+    def add(self, rank) -> None:
+        if not isinstance(rank, int) or rank <= 0:
+            return
+        if rank >= len(self.counts):
+            self.counts.extend([0] * (rank + 1 - len(self.counts)))
+        self.counts[rank] += 1
+        self.total += 1
+        self._sum += rank
+
+    def count(self, rank: int) -> int:
+        return self.counts[rank] if rank < len(self.counts) else 0
+
+    def top(self, n: int) -> int:
+        return sum(self.counts[1:n + 1])
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self.total if self.total else 0.0
+
+    def percent(self, count: int) -> float:
+        return round((count / self.total) * 100, 1) if self.total else 0
+
+
+def _amount(value) -> Optional[float]:
+    """Lender amount as float, None when missing or not a number (as statistics_engine treats it)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _LenderAccumulator:
+    __slots__ = ('amounts', 'sorted_amounts', 'ranks', 'gap')
+
+    def __init__(self):
+        self.amounts = RunningStats()
+        self.sorted_amounts: List[float] = []
+        self.ranks = RankHistogram()
+        self.gap = RunningStats()
+
+    def median(self) -> float:
+        values, n = self.sorted_amounts, len(self.sorted_amounts)
+        return (values[(n - 1) // 2] + values[n // 2]) / 2 if n else 0
+
+
+class RunAggregates:
+    """Accumulators for one run, fed one scenario at a time."""
+
+    def __init__(self, focus_lender: str = FOCUS_LENDER):
+        self.focus_lender = focus_lender
+        self.scenarios = 0
+        self.gen_h_ranks = RankHistogram()
+        self.gen_h_difference = RunningStats()
+        self.lenders: Dict[str, _LenderAccumulator] = {}
+        self.groups: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_results(cls, results: Dict, focus_lender: str = FOCUS_LENDER) -> 'RunAggregates':
+        """Accumulate a finished results dict (automation file shape)."""
+        aggregates = cls(focus_lender)
+        for scenario_id, scenario_data in (results or {}).items():
+            aggregates.add_scenario(scenario_id, scenario_data.get('lender_results', {}),
+                                    scenario_data.get('statistics', {}))
+        return aggregates
+
+    def add_scenario(self, scenario_id: str, lender_amounts: Dict, statistics: Dict) -> None:
+        """Fold one completed scenario into every accumulator; O(lenders)."""
+        amounts = {lender: amount for lender, amount in
+                   ((lender, _amount(value)) for lender, value in lender_amounts.items()) if amount is not None}
+        ranked = sorted(amounts.values(), reverse=True)
+        # Competition ranks: 1 + number of strictly higher amounts
+        first_position = {}
+        for position, amount in enumerate(ranked, 1):
+            first_position.setdefault(amount, position)
+        scenario_mean = sum(ranked) / len(ranked) if ranked else 0.0
+
+        gen_h_rank = statistics.get('gen_h_rank')
+        group = scenario_group(scenario_id) or 'other'
+
+        with self._lock:
+            self.scenarios += 1
+            self.gen_h_ranks.add(gen_h_rank)
+            self.gen_h_difference.add(statistics.get('gen_h_difference', 0) or 0)
+
+            for lender, amount in amounts.items():
+                accumulator = self.lenders.get(lender)
+                if accumulator is None:
+                    accumulator = self.lenders[lender] = _LenderAccumulator()
+                accumulator.amounts.add(amount)
+                insort(accumulator.sorted_amounts, amount)
+                accumulator.ranks.add(first_position[amount])
+                accumulator.gap.add(amount - scenario_mean)
+
+            totals = self.groups.get(group)
+            if totals is None:
+                totals = self.groups[group] = {'scenarios': 0, 'ranks': RankHistogram(), 'difference': RunningStats()}
+            totals['scenarios'] += 1
+            totals['ranks'].add(gen_h_rank)
+            totals['difference'].add(statistics.get('gen_h_difference', 0) or 0)
+
+    def summary_statistics(self) -> Dict:
+        """Average Gen H rank and rank percentages, read straight off the histogram."""
+        with self._lock:
+            ranks = self.gen_h_ranks
+            return {
+                'total_scenarios': self.scenarios,
+                'scenarios_with_ranks': ranks.total,
+                'average_gen_h_rank': round(ranks.mean, 2),
+                'rank_percentages': {
+                    'rank_1_percent': ranks.percent(ranks.count(1)),
+                    'rank_2_percent': ranks.percent(ranks.count(2)),
+                    'rank_3_percent': ranks.percent(ranks.count(3)),
+                },
+                'top_3_percent': ranks.percent(ranks.top(3))
+            }
+
+    def lender_statistics(self) -> Dict[str, Dict]:
+        """Per-lender figures in the statistics_engine.lender_summary shape."""
+        with self._lock:
+            return {
+                lender: {
+                    'scenarios': accumulator.amounts.count,
+                    'mean_amount': round(accumulator.amounts.mean, 2),
+                    'median_amount': round(float(accumulator.median()), 2),
+                    'mean_rank': round(accumulator.ranks.mean, 2),
+                    'rank_1_percent': accumulator.ranks.percent(accumulator.ranks.count(1)),
+                    'mean_gap_to_average': round(accumulator.gap.mean, 2),
+                }
+                for lender, accumulator in sorted(self.lenders.items())
+            }
+
+    def group_statistics(self) -> Dict[str, Dict]:
+        """Gen H rank and difference per scenario group."""
+        with self._lock:
+            return {
+                group: {
+                    'scenarios': totals['scenarios'],
+                    'average_gen_h_rank': round(totals['ranks'].mean, 2),
+                    'top_3_percent': totals['ranks'].percent(totals['ranks'].top(3)),
+                    'gen_h_difference': totals['difference'].to_dict(),
+                }
+                for group, totals in self.groups.items()
+            }
+
+    def snapshot(self) -> Dict:
+        """Everything a partial-run dashboard needs."""
+        return {
+            'scenarios_completed': self.scenarios,
+            'summary_statistics': self.summary_statistics(),
+            'gen_h_difference': self.gen_h_difference.to_dict(),
+            'lender_statistics': self.lender_statistics(),
+            'group_statistics': self.group_statistics(),
+        }
@@ -0,0 +1,79 @@
+"""
+Scenario classification shared by the server, the history store and exports
+Scenario IDs follow `<single|joint>_<employed|self_employed>_<N>k[_credit]`.
+"""
+
+import re
+
+# Display order used by the dashboard: normal scenarios first, then credit versions
+GROUP_ORDER = {
+    'sole_employed': 0, 'sole_self_employed': 1, 'joint_employed': 2, 'joint_self_employed': 3,
+    'sole_employed_credit': 4, 'sole_self_employed_credit': 5, 'joint_employed_credit': 6, 'joint_self_employed_credit': 7
+}
+
+GROUP_HEADERS = {
+    'sole_employed': '👤 Sole Employed Scenarios (£20k - £200k)',
+    'sole_self_employed': '👤 Sole Self-Employed Scenarios (£20k - £200k)',
+    'joint_employed': '👥 Joint Employed Scenarios (£40k - £200k total)',
+    'joint_self_employed': '👥 Joint Self-Employed Scenarios (£40k - £200k total)',
+    'sole_employed_credit': '👤💳 Sole Employed with Credit Commitments (£20k - £100k)',
+    'sole_self_employed_credit': '👤💳 Sole Self-Employed with Credit Commitments (£20k - £100k)',
+    'joint_employed_credit': '👥💳 Joint Employed with Credit Commitments (£40k - £200k total)',
+    'joint_self_employed_credit': '👥💳 Joint Self-Employed with Credit Commitments (£40k - £200k total)'
+}
+
+_SCENARIO_ID_PATTERN = re.compile(r'^(single|joint)_(employed|self_employed)_(\d+)k(_credit)?$')
+_INCOME_PATTERN = re.compile(r'£(\d+)k')
+
+
+def scenario_group(scenario_id):
+    """Dashboard group for a scenario ID, or None if it doesn't follow the naming scheme."""
+    match = _SCENARIO_ID_PATTERN.match(scenario_id)
+    if not match:
+        return None
+    applicants, employment, _, credit = match.groups()
+    prefix = 'sole' if applicants == 'single' else 'joint'
+    return f"{prefix}_{employment}{'_credit' if credit else ''}"
+
+
+def scenario_attributes(scenario_id):
+    """Applicants, employment type, income and credit flag parsed from a scenario ID."""
+    match = _SCENARIO_ID_PATTERN.match(scenario_id)
+    if not match:
+        return {
+            'applicants': 'unknown',
+            'employment_type': 'unknown',
+            'income': 0,
+            'has_credit_commitments': 0,
+            'scenario_group': None
+        }
+    applicants, employment, income_k, credit = match.groups()
+    return {
+        'applicants': applicants,
+        'employment_type': employment.replace('_', '-'),
+        'income': int(income_k) * 1000,
+        'has_credit_commitments': 1 if credit else 0,
+        'scenario_group': scenario_group(scenario_id)
+    }
+
+
+def income_from_description(description):
+    """Income in pounds from a description such as 'Sole applicant, employed, £30k'."""
+    match = _INCOME_PATTERN.search(description or '')
+    if match:
+        return int(match.group(1)) * 1000
+    return 0
+
+
+def rank_changes_by_group(latest_ranks, previous_ranks):
+    """
+    Average Gen H rank change per group between two runs' {scenario_id: rank}
+    (positive = improved). Scenarios missing from the previous run count as unchanged.
+    """
+    changes = {}
+    for scenario_id, current_rank in latest_ranks.items():
+        group = scenario_group(scenario_id)
+        if group is None:
+            continue
+        changes.setdefault(group, []).append(previous_ranks.get(scenario_id, current_rank) - current_rank)
+    return {group: round(sum(values) / len(values), 1) for group, values in changes.items()}
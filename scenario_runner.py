@@ -5,7 +5,7 @@ Scenario runner and calculation engine for affordability benchmarking.
 import uuid
 from datetime import datetime
 from typing import Dict, List, Optional
-import statistics
+from statistics_engine import scenario_statistics
 from sqlalchemy.orm import Session
 from models import Scenario, AffordabilityResult, RunSummary, get_db, create_tables
 from mbt_automation_final import MBTAutomationFinal
@@ -128,23 +128,13 @@ class ScenarioRunner:
         if not results:
             return {'average': 0, 'gen_h_diff': 0, 'gen_h_rank': 0, 'gen_h_amount': 0}
         
-        # Remove zero values and calculate average
-        valid_amounts = [amount for amount in results.values() if amount > 0]
-        average = statistics.mean(valid_amounts) if valid_amounts else 0
-        
-        # Gen H specific calculations
-        gen_h_amount = results.get('Gen H', 0)
-        gen_h_diff = gen_h_amount - average
-        
-        # Calculate rank (1 = highest amount)
-        sorted_amounts = sorted(valid_amounts, reverse=True)
-        gen_h_rank = sorted_amounts.index(gen_h_amount) + 1 if gen_h_amount in sorted_amounts else len(sorted_amounts)
-        
+        # Zero amounts are left out of the runner's average
+        stats = scenario_statistics({lender: amount for lender, amount in results.items() if amount > 0})
         return {
-            'average': average,
-            'gen_h_diff': gen_h_diff,
-            'gen_h_rank': gen_h_rank,
-            'gen_h_amount': gen_h_amount
+            'average': stats['average'],
+            'gen_h_diff': stats['gen_h_amount'] - stats['average'],
+            'gen_h_rank': stats['gen_h_rank'],
+            'gen_h_amount': stats['gen_h_amount']
         }
     
     def save_scenario_to_db(self, scenario: Dict, db: Session) -> None:
@@ -0,0 +1,222 @@
+"""
+Vectorized statistics engine for lender results
+A run's results are loaded into a dense scenarios × lenders array with NaN
+marking lenders that returned nothing, and means, medians, percentiles,
+tie-aware ranks and gaps are computed for every scenario in one NumPy pass.
+Live runs score each scenario as it arrives (scenario_statistics); tables
+built from a whole run use results_statistics and results_lender_ranks.
+"""
+
+import warnings
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+FOCUS_LENDER = 'Gen H'
+
+
+def _amount(value) -> float:
+    """Lender amount as float, NaN when missing or not a number. Zero amounts count, as they always have."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ResultsArray:
+    """Dense float64 amounts[scenario, lender] with NaN for missing lenders."""
+
+    def __init__(self, amounts: np.ndarray, scenarios: List[str], lenders: List[str]):
+        self.amounts = amounts
+        self.scenarios = scenarios
+        self.lenders = lenders
+
+    @property
+    def valid(self) -> np.ndarray:
+        return ~np.isnan(self.amounts)
+
+    def lender_index(self, name: str) -> Optional[int]:
+        try:
+            return self.lenders.index(name)
+        except ValueError:
+            return None
+
+    @classmethod
+    def from_results(cls, results: Dict) -> 'ResultsArray':
+        """Build from a run's results dict, in the automation file shape."""
+        lenders = {}
+        for scenario_data in results.values():
+            for lender in scenario_data.get('lender_results', {}):
+                lenders.setdefault(lender, len(lenders))
+
+        amounts = np.full((len(results), len(lenders)), np.nan)
+        for row, scenario_data in zip(amounts, results.values()):
+            for lender, value in scenario_data.get('lender_results', {}).items():
+                row[lenders[lender]] = _amount(value)
+        return cls(amounts, list(results), list(lenders))
+
+    @classmethod
+    def from_lender_amounts(cls, lender_amounts: Dict[str, float]) -> 'ResultsArray':
+        """One scenario's {lender: amount} as a 1 × lenders array."""
+        return cls.from_results({'scenario': {'lender_results': lender_amounts}})
+
+
+def competition_ranks(amounts: np.ndarray) -> np.ndarray:
+    """
+    Tie-aware ranks along the last axis, highest amount = 1 and equal
+    amounts sharing the better rank (1, 2, 2, 4). Missing amounts rank 0.
+    """
+    valid = ~np.isnan(amounts)
+    filled = np.where(valid, amounts, -np.inf)
+    # greater[..., i] = number of lenders strictly above lender i
+    greater = (filled[..., None, :] > filled[..., :, None]).sum(axis=-1)
+    return np.where(valid, greater + 1, 0).astype(np.int32)
+
+
+def _percentiles(sorted_amounts: np.ndarray, count: np.ndarray, percents) -> List[np.ndarray]:
+    """
+    Linear-interpolated percentiles of each row of an ascending sort with
+    NaN last (np.sort order). Much faster than np.nanpercentile, which
+    falls back to a per-row Python loop when NaNs are present.
+    """
+    position = np.clip(count - 1, 0, None)[..., None] * (np.asarray(percents, dtype=float) / 100)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.ceil(position).astype(np.intp)
+    low = np.take_along_axis(sorted_amounts, lower, axis=-1)
+    high = np.take_along_axis(sorted_amounts, upper, axis=-1)
+    values = low + (high - low) * (position - lower)
+    values[count == 0] = np.nan
+    return [values[..., i] for i in range(len(percents))]
+
+
+def compute_statistics(array: ResultsArray, focus_lender: str = FOCUS_LENDER) -> Dict[str, np.ndarray]:
+    """
+    Per-scenario and per-lender statistics for the whole array.
+    Scenario-level arrays are [scenario]; lender-level arrays are
+    [scenario, lender]. Empty scenarios get count 0 and NaN stats.
+    """
+    amounts = array.amounts
+    valid = array.valid
+    count = valid.sum(axis=-1)
+
+    with warnings.catch_warnings():
+        # All-NaN scenarios (no lender answered) legitimately produce NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(amounts, axis=-1) if amounts.size else np.full(count.shape, np.nan)
+        std = np.nanstd(amounts, axis=-1) if amounts.size else np.full(count.shape, np.nan)
+    if amounts.size:
+        sorted_amounts = np.sort(amounts, axis=-1)
+        p25, median, p75, best = _percentiles(sorted_amounts, count, (25, 50, 75, 100))
+        worst = sorted_amounts[..., 0]
+    else:
+        p25 = median = p75 = best = worst = np.full(count.shape, np.nan)
+
+    ranks = competition_ranks(amounts)
+    statistics = {
+        'count': count,
+        'mean': mean,
+        'median': median,
+        'p25': p25,
+        'p75': p75,
+        'max': best,
+        'min': worst,
+        'std': std,
+        'ranks': ranks,
+        'gap_to_mean': amounts - mean[..., None],
+        'gap_to_best': amounts - best[..., None],
+    }
+
+    focus = array.lender_index(focus_lender)
+    if focus is None:
+        statistics['focus_amount'] = np.zeros(count.shape)
+        statistics['focus_rank'] = np.zeros(count.shape, dtype=np.int32)
+    else:
+        statistics['focus_amount'] = np.nan_to_num(amounts[..., focus])
+        statistics['focus_rank'] = ranks[..., focus]
+    # No difference is reported without a Gen H amount
+    statistics['focus_difference'] = np.where(statistics['focus_amount'] != 0,
+                                              statistics['focus_amount'] - np.nan_to_num(mean), 0.0)
+    return statistics
+
+
+def _scenario_dict(statistics, scenario, gen_h_amount) -> Dict:
+    mean = statistics['mean'][scenario]
+    median = statistics['median'][scenario]
+    return {
+        'average': 0 if np.isnan(mean) else float(mean),
+        'median': 0 if np.isnan(median) else float(median),
+        'gen_h_amount': gen_h_amount,
+        'gen_h_difference': float(statistics['focus_difference'][scenario]),
+        'gen_h_rank': int(statistics['focus_rank'][scenario]),
+    }
+
+
+def scenario_statistics(lender_amounts: Dict[str, float], focus_lender: str = FOCUS_LENDER) -> Dict:
+    """Average, median, Gen H amount, difference and tie-aware rank for one scenario."""
+    statistics = compute_statistics(ResultsArray.from_lender_amounts(lender_amounts), focus_lender)
+    return _scenario_dict(statistics, 0, lender_amounts.get(focus_lender, 0) or 0)
+
+
+def results_statistics(results: Dict, focus_lender: str = FOCUS_LENDER) -> Dict[str, Dict]:
+    """scenario_statistics for every scenario of a run, computed in one pass."""
+    array = ResultsArray.from_results(results)
+    statistics = compute_statistics(array, focus_lender)
+    return {
+        scenario_id: _scenario_dict(statistics, s,
+                                    results[scenario_id].get('lender_results', {}).get(focus_lender, 0) or 0)
+        for s, scenario_id in enumerate(array.scenarios)
+    }
+
+
+def results_lender_ranks(results: Dict) -> Dict[str, Dict[str, int]]:
+    """Tie-aware {lender: rank} of every scenario of a run (lenders without an amount left out), in one pass."""
+    array = ResultsArray.from_results(results)
+    ranks = competition_ranks(array.amounts)
+    return {
+        scenario_id: {lender: int(rank) for lender, rank in zip(array.lenders, ranks[s]) if rank}
+        for s, scenario_id in enumerate(array.scenarios)
+    }
+
+
+def lender_summary(array: ResultsArray, statistics: Optional[Dict] = None) -> Dict[str, Dict]:
+    """Per-lender mean/median amount, mean rank, share ranked 1st and mean gap to the scenario average."""
+    statistics = statistics or compute_statistics(array)
+    valid = array.valid
+    quoted = valid.sum(axis=0)
+    if not array.lenders:
+        return {}
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean_amount = np.nanmean(array.amounts, axis=0)
+        mean_gap = np.nanmean(statistics['gap_to_mean'], axis=0)
+    by_lender = np.sort(array.amounts.T, axis=-1)
+    median_amount = _percentiles(by_lender, quoted, (50,))[0]
+    rank_total = statistics['ranks'].sum(axis=0)
+    first = (statistics['ranks'] == 1).sum(axis=0)
+
+    summary = {}
+    for i, lender in enumerate(array.lenders):
+        n = int(quoted[i])
+        summary[lender] = {
+            'scenarios': n,
+            'mean_amount': round(float(mean_amount[i]), 2) if n else 0,
+            'median_amount': round(float(median_amount[i]), 2) if n else 0,
+            'mean_rank': round(float(rank_total[i]) / n, 2) if n else 0,
+            'rank_1_percent': round(float(first[i]) / n * 100, 1) if n else 0,
+            'mean_gap_to_average': round(float(mean_gap[i]), 2) if n else 0,
+        }
+    return summary
+
+
+def rank_summary(ranks: Iterable) -> Dict:
+    """Average rank and counts of 1st/2nd/3rd/top-3 over positive integer ranks."""
+    values = np.fromiter((rank for rank in ranks if isinstance(rank, (int, np.integer)) and rank > 0),
+                         dtype=np.int64)
+    counts = np.bincount(values, minlength=4) if values.size else np.zeros(4, dtype=np.int64)
+    return {
+        'ranked': int(values.size),
+        'average_rank': float(values.mean()) if values.size else 0.0,
+        'rank_counts': {1: int(counts[1]), 2: int(counts[2]), 3: int(counts[3])},
+        'top_3': int(counts[1:4].sum()),
+    }
@@ -0,0 +1,379 @@
+"""
+Async Supabase client for the server
+Same interface as SupabaseManager, but talks to PostgREST directly over one
+pooled httpx.AsyncClient (keep-alive, timeouts, connection limits), so
+historical reads and outbox uploads never block the event loop and
+concurrent dashboard requests overlap on the network.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+from rank_movements import DEFAULT_RUNS, rank_matrix_from_rows, rank_movements
+from scenario_groups import rank_changes_by_group
+from supabase_outbox import run_record, scenario_record
+
+load_dotenv()
+
+SUPABASE_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+SUPABASE_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10, keepalive_expiry=30.0)
+
+# Upper bound on how stale the cached historical summary can get
+SUMMARY_CACHE_SECONDS = 300
+
+# Bulk reads: ids per range and requests in flight
+PAGE_SIZE = 1000
+PAGE_CONCURRENCY = 4
+
+# PostgREST's max-rows (Supabase defaults to 1000); a page shorter than this ends a range
+MAX_ROWS = int(os.getenv("SUPABASE_MAX_ROWS", "1000"))
+
+# Columns projected by the bulk readers; the JSON blobs are opt-in
+AUTOMATION_RUN_COLUMNS = ('id', 'session_id', 'run_type', 'total_scenarios', 'successful_scenarios',
+                          'average_gen_h_rank', 'rank_1_percentage', 'rank_2_percentage', 'rank_3_percentage',
+                          'top_3_percentage', 'run_timestamp')
+SCENARIO_RESULT_COLUMNS = ('id', 'session_id', 'scenario_id', 'description', 'gen_h_amount',
+                           'average_lender_amount', 'gen_h_rank', 'gen_h_difference', 'gen_h_vs_average_gap',
+                           'total_lenders', 'run_timestamp')
+
+
+def historical_summary_from_row(row: Optional[Dict]) -> Dict:
+    """Dashboard summary dict from the get_historical_summary RPC result."""
+    row = row or {}
+    if not row.get('total_runs'):
+        return {
+            'total_runs': 0,
+            'average_gen_h_rank': 0,
+            'best_performing_scenario': 'No data',
+            'last_run': 'No runs yet'
+        }
+    return {
+        'total_runs': row['total_runs'],
+        'average_gen_h_rank': round(float(row.get('average_gen_h_rank') or 0), 2),
+        'best_performing_scenario': row.get('best_performing_scenario') or 'No data',
+        'last_run': row.get('last_run') or 'No runs'
+    }
+
+
+def _time_filters(since: Optional[str], until: Optional[str]) -> List[Tuple[str, str]]:
+    """PostgREST run_timestamp filters for an optional [since, until) range (repeated filters are ANDed)."""
+    filters = [('run_timestamp', f'gte.{since}')] if since else []
+    if until:
+        filters.append(('run_timestamp', f'lt.{until}'))
+    return filters
+
+
+class AsyncSupabaseManager:
+    """Non-blocking Supabase reads and writes over a shared connection pool."""
+
+    name = 'supabase'
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, transport=None,
+                 max_rows: int = MAX_ROWS):
+        self.url = url or os.getenv("SUPABASE_URL")
+        self.key = key or os.getenv("SUPABASE_ANON_KEY")
+        self.max_rows = max_rows
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._summary_cache = None
+        self._summary_lock = asyncio.Lock()
+
+        if not self.url or not self.key:
+            print("⚠️ Warning: Supabase credentials not found in environment variables")
+            print("   Please set SUPABASE_URL and SUPABASE_ANON_KEY in your .env file")
+        else:
+            print("✅ Async Supabase client configured")
+
+    def is_connected(self) -> bool:
+        """Check if Supabase credentials are configured."""
+        return bool(self.url and self.key)
+
+    async def revision(self):
+        """Remote data has no cheap change token, so history responses skip the ETag."""
+        return None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running server's event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.url.rstrip('/')}/rest/v1",
+                headers={'apikey': self.key, 'Authorization': f'Bearer {self.key}'},
+                timeout=SUPABASE_TIMEOUT,
+                limits=SUPABASE_LIMITS,
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _select(self, table: str, params, count: bool = False) -> httpx.Response:
+        headers = {'Prefer': 'count=exact'} if count else None
+        response = await self.client.get(f'/{table}', params=params, headers=headers)
+        response.raise_for_status()
+        return response
+
+    async def _rpc(self, function: str, arguments: Optional[Dict] = None):
+        response = await self.client.post(f'/rpc/{function}', json=arguments or {})
+        response.raise_for_status()
+        return response.json()
+
+    async def _id_bounds(self, table: str, filters: List[Tuple[str, str]]):
+        """Smallest and largest id matching `filters`, or None if nothing matches."""
+        first, last = await asyncio.gather(
+            self._select(table, [*filters, ('select', 'id'), ('order', 'id.asc'), ('limit', 1)]),
+            self._select(table, [*filters, ('select', 'id'), ('order', 'id.desc'), ('limit', 1)]),
+        )
+        first, last = first.json(), last.json()
+        if not first:
+            return None
+        return first[0]['id'], last[0]['id']
+
+    async def _read_id_range(self, table: str, select: str, filters: List[Tuple[str, str]], low: int, high: int,
+                             page_size: int, semaphore: asyncio.Semaphore) -> List[Dict]:
+        """Every row with low <= id < high, keyset-paged so a capped response can't truncate it."""
+        rows, after = [], low - 1
+        limit = min(page_size, self.max_rows)
+        while True:
+            async with semaphore:
+                response = await self._select(table, [
+                    *filters, ('select', select), ('order', 'id.asc'), ('limit', limit),
+                    ('id', f'gt.{after}'), ('id', f'lt.{high}')
+                ])
+            page = response.json()
+            rows.extend(page)
+            # A short page is the end of the range, however sparse the ids
+            if len(page) < limit or page[-1]['id'] >= high - 1:
+                return rows
+            after = page[-1]['id']
+
+    async def iter_pages(self, table: str, columns: Sequence[str], filters: Optional[List[Tuple[str, str]]] = None,
+                         page_size: int = PAGE_SIZE, concurrency: int = PAGE_CONCURRENCY) -> AsyncIterator[List[Dict]]:
+        """
+        Yield every matching row of `table` as pages in id order. The id span
+        is cut into page-sized ranges fetched `concurrency` at a time, each
+        keyset-paged on id, so results are complete however large the table
+        and whatever PostgREST's row cap.
+        """
+        filters = list(filters or [])
+        select = ','.join(columns if 'id' in columns else ('id', *columns))
+        bounds = await self._id_bounds(table, filters)
+        if bounds is None:
+            return
+
+        semaphore = asyncio.Semaphore(concurrency)
+        starts = iter(range(bounds[0], bounds[1] + 1, page_size))
+        pending = []
+        try:
+            while True:
+                # Keep `concurrency` ranges in flight and yield them in order
+                while len(pending) < concurrency:
+                    low = next(starts, None)
+                    if low is None:
+                        break
+                    pending.append(asyncio.ensure_future(self._read_id_range(
+                        table, select, filters, low, low + page_size, page_size, semaphore)))
+                if not pending:
+                    return
+                page = await pending.pop(0)
+                if page:
+                    yield page
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def iter_automation_runs(self, include_results: bool = False, since: Optional[str] = None,
+                             until: Optional[str] = None, **kwargs) -> AsyncIterator[List[Dict]]:
+        """Pages of automation_runs rows; results_json only when asked for."""
+        columns = AUTOMATION_RUN_COLUMNS + (('results_json',) if include_results else ())
+        return self.iter_pages('automation_runs', columns, _time_filters(since, until), **kwargs)
+
+    def iter_scenario_results(self, include_lender_results: bool = False, since: Optional[str] = None,
+                              until: Optional[str] = None, **kwargs) -> AsyncIterator[List[Dict]]:
+        """Pages of scenario_results rows; lender_results_json only when asked for."""
+        columns = SCENARIO_RESULT_COLUMNS + (('lender_results_json',) if include_lender_results else ())
+        return self.iter_pages('scenario_results', columns, _time_filters(since, until), **kwargs)
+
+    async def upsert_records(self, table: str, records: List[Dict], on_conflict: str) -> int:
+        """Insert-or-update many rows in one request. Raises on failure so the outbox can retry."""
+        if not self.is_connected():
+            raise RuntimeError("Supabase not connected")
+        response = await self.client.post(
+            f'/{table}', params={'on_conflict': on_conflict}, json=records,
+            headers={'Prefer': 'resolution=merge-duplicates,return=minimal'}
+        )
+        response.raise_for_status()
+        if table == 'automation_runs':
+            self.invalidate_summary()
+        return len(records)
+
+    async def save_automation_run(self, session_id: str, run_type: str, total_scenarios: int,
+                                  successful_scenarios: int, results_data: Dict) -> bool:
+        """Save automation run summary (idempotent on session_id)."""
+        if not self.is_connected():
+            print("❌ Supabase not connected - cannot save automation run")
+            return False
+        try:
+            await self.upsert_records('automation_runs', [run_record(
+                session_id, run_type, total_scenarios, successful_scenarios, results_data,
+                datetime.now(timezone.utc).isoformat())], 'session_id')
+            print(f"✅ Saved automation run {session_id} to Supabase")
+            return True
+        except Exception as e:
+            print(f"❌ Error saving automation run to Supabase: {e}")
+            return False
+
+    async def save_scenario_results(self, session_id: str, scenario_id: str, scenario_data: Dict) -> bool:
+        """Save one scenario's results (idempotent on session_id, scenario_id)."""
+        if not self.is_connected():
+            return False
+        try:
+            await self.upsert_records('scenario_results', [scenario_record(
+                session_id, scenario_id, scenario_data, datetime.now(timezone.utc).isoformat())],
+                'session_id,scenario_id')
+            return True
+        except Exception as e:
+            print(f"❌ Error saving scenario {scenario_id} to Supabase: {e}")
+            return False
+
+    async def get_historical_summary(self) -> Dict:
+        """
+        Run count, average Gen H rank, best scenario and last run from the
+        get_historical_summary RPC in one round-trip. The result is cached
+        until a run is saved (or SUMMARY_CACHE_SECONDS pass, for writes made
+        by other instances).
+        """
+        if not self.is_connected():
+            return {'error': 'Database not connected'}
+
+        async with self._summary_lock:
+            cached = self._summary_cache
+            if cached and time.monotonic() - cached[0] < SUMMARY_CACHE_SECONDS:
+                return cached[1]
+
+            try:
+                try:
+                    summary = historical_summary_from_row(await self._rpc('get_historical_summary'))
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code != 404:
+                        raise
+                    # Projects whose schema predates the RPC
+                    summary = await self._historical_summary_from_parts()
+            except Exception as e:
+                print(f"❌ Error getting historical summary: {e}")
+                return {'error': str(e)}
+
+            self._summary_cache = (time.monotonic(), summary)
+            return summary
+
+    async def _historical_summary_from_parts(self) -> Dict:
+        runs, latest, average_rank, best_scenario = await asyncio.gather(
+            self._select('automation_runs', {'select': 'id', 'limit': 1}, count=True),
+            self._select('automation_runs', {'select': 'run_timestamp', 'order': 'run_timestamp.desc', 'limit': 1}),
+            self._rpc('calculate_average_gen_h_rank'),
+            self._rpc('get_best_performing_scenario'),
+        )
+        latest_rows = latest.json()
+        return historical_summary_from_row({
+            # Content-Range: 0-0/<total>
+            'total_runs': int(runs.headers.get('content-range', '*/0').split('/')[-1] or 0),
+            'average_gen_h_rank': average_rank,
+            'best_performing_scenario': best_scenario,
+            'last_run': latest_rows[0]['run_timestamp'] if latest_rows else None
+        })
+
+    def invalidate_summary(self) -> None:
+        self._summary_cache = None
+
+    async def get_gen_h_rank_over_time(self, limit: int = 20) -> List[Dict]:
+        """Get Gen H rank over the latest `limit` runs for charting, oldest first."""
+        if not self.is_connected():
+            return []
+
+        try:
+            response = await self._select('automation_runs', {
+                'select': 'run_timestamp,average_gen_h_rank,run_type',
+                'order': 'run_timestamp.desc',
+                'limit': limit
+            })
+            return response.json()[::-1]
+        except Exception as e:
+            print(f"❌ Error getting Gen H rank over time: {e}")
+            return []
+
+    async def get_gen_h_vs_average_gap_over_time(self, limit: int = 20) -> List[Dict]:
+        """Get Gen H vs average lender gap over time."""
+        if not self.is_connected():
+            return []
+
+        try:
+            return await self._rpc('get_gen_h_gap_over_time', {'run_limit': limit})
+        except Exception as e:
+            print(f"❌ Error getting Gen H gap over time: {e}")
+            return []
+
+    async def get_rank_movements(self, runs: int = DEFAULT_RUNS) -> Dict:
+        """Rank deltas, streaks and volatility over the last `runs` runs (two reads plus paging)."""
+        if not self.is_connected():
+            return {'error': 'Database not connected'}
+
+        try:
+            recent_runs = (await self._select('automation_runs', {
+                'select': 'session_id,run_timestamp', 'order': 'run_timestamp.desc', 'limit': runs
+            })).json()
+            ages = {run['session_id']: (age, run['run_timestamp']) for age, run in enumerate(recent_runs, 1)}
+            if not ages:
+                return rank_movements(*rank_matrix_from_rows([]))
+
+            sessions = ','.join(f'"{session_id}"' for session_id in ages)
+            rows = []
+            async for page in self.iter_pages('scenario_results', ('session_id', 'scenario_id', 'gen_h_rank'),
+                                              [('session_id', f'in.({sessions})')]):
+                rows.extend((*ages[row['session_id']], row['scenario_id'], row['gen_h_rank']) for row in page)
+            return rank_movements(*rank_matrix_from_rows(rows))
+        except Exception as e:
+            print(f"❌ Error getting rank movements: {e}")
+            return {'error': str(e)}
+
+    async def get_scenario_rank_changes(self) -> Dict:
+        """Average Gen H rank change per scenario group between the last two runs."""
+        if not self.is_connected():
+            return {}
+
+        try:
+            recent_runs = (await self._select('automation_runs', {
+                'select': 'session_id,run_timestamp', 'order': 'run_timestamp.desc', 'limit': 2
+            })).json()
+            if len(recent_runs) < 2:
+                return {'error': 'Need at least 2 runs to calculate rank changes'}
+
+            latest_session = recent_runs[0]['session_id']
+            previous_session = recent_runs[1]['session_id']
+            latest_results, previous_results = await asyncio.gather(
+                self._select('scenario_results', {'select': 'scenario_id,gen_h_rank',
+                                                  'session_id': f'eq.{latest_session}'}),
+                self._select('scenario_results', {'select': 'scenario_id,gen_h_rank',
+                                                  'session_id': f'eq.{previous_session}'}),
+            )
+
+            return rank_changes_by_group(
+                {row['scenario_id']: row['gen_h_rank'] for row in latest_results.json()},
+                {row['scenario_id']: row['gen_h_rank'] for row in previous_results.json()}
+            )
+
+        except Exception as e:
+            print(f"❌ Error getting scenario rank changes: {e}")
+            return {'error': str(e)}
+
+
+# Global instance
+supabase_manager = AsyncSupabaseManager()
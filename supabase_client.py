@@ -6,9 +6,11 @@ Handles database operations for historical data storage and analytics
 import os
 from datetime import datetime, timezone
 from typing import Dict, List, Optional
-import json
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from blocking_io import run_blocking
+from supabase_outbox import run_record, scenario_record
+from supabase_async_client import historical_summary_from_row
 
 load_dotenv()
 
@@ -32,32 +34,28 @@ class SupabaseManager:
         """Check if Supabase client is properly initialized."""
         return self.client is not None
     
+    def upsert_records(self, table: str, records: List[Dict], on_conflict: str) -> int:
+        """
+        Insert-or-update many rows in one PostgREST request (blocking).
+        Raises on failure so the outbox can retry.
+        """
+        if not self.is_connected():
+            raise RuntimeError("Supabase not connected")
+        self.client.table(table).upsert(records, on_conflict=on_conflict).execute()
+        return len(records)
+    
     async def save_automation_run(self, session_id: str, run_type: str, total_scenarios: int, 
                                  successful_scenarios: int, results_data: Dict) -> bool:
-        """Save automation run summary to database."""
+        """Save automation run summary to database (idempotent on session_id)."""
         if not self.is_connected():
             print("❌ Supabase not connected - cannot save automation run")
             return False
         
         try:
-            # Extract summary statistics from results
-            summary_stats = results_data.get('summary_statistics', {})
-            
-            run_data = {
-                'session_id': session_id,
-                'run_type': run_type,  # 'normal', 'credit', 'full'
-                'total_scenarios': total_scenarios,
-                'successful_scenarios': successful_scenarios,
-                'average_gen_h_rank': summary_stats.get('average_gen_h_rank', 0),
-                'rank_1_percentage': summary_stats.get('rank_percentages', {}).get('rank_1_percent', 0),
-                'rank_2_percentage': summary_stats.get('rank_percentages', {}).get('rank_2_percent', 0),
-                'rank_3_percentage': summary_stats.get('rank_percentages', {}).get('rank_3_percent', 0),
-                'top_3_percentage': summary_stats.get('top_3_percent', 0),
-                'run_timestamp': datetime.now(timezone.utc).isoformat(),
-                'results_json': json.dumps(results_data)
-            }
-            
-            result = self.client.table('automation_runs').insert(run_data).execute()
+            run_data = run_record(session_id, run_type, total_scenarios, successful_scenarios, results_data,
+                                  datetime.now(timezone.utc).isoformat())
+            # The supabase client is synchronous - keep the round-trip off the event loop
+            await run_blocking(self.upsert_records, 'automation_runs', [run_data], 'session_id')
             print(f"✅ Saved automation run {session_id} to Supabase")
             return True
             
@@ -66,35 +64,14 @@ class SupabaseManager:
             return False
     
     async def save_scenario_results(self, session_id: str, scenario_id: str, scenario_data: Dict) -> bool:
-        """Save individual scenario results to database."""
+        """Save individual scenario results to database (idempotent on session_id, scenario_id)."""
         if not self.is_connected():
             return False
         
         try:
-            # Extract scenario details
-            stats = scenario_data.get('statistics', {})
-            lender_results = scenario_data.get('lender_results', {})
-            
-            # Calculate Gen H vs average gap
-            gen_h_amount = stats.get('gen_h_amount', 0)
-            average_amount = stats.get('average', 0)
-            gen_h_gap = gen_h_amount - average_amount if gen_h_amount and average_amount else 0
-            
-            scenario_record = {
-                'session_id': session_id,
-                'scenario_id': scenario_id,
-                'description': scenario_data.get('description', ''),
-                'gen_h_amount': gen_h_amount,
-                'average_lender_amount': average_amount,
-                'gen_h_rank': stats.get('gen_h_rank', 0),
-                'gen_h_difference': stats.get('gen_h_difference', 0),
-                'gen_h_vs_average_gap': gen_h_gap,
-                'total_lenders': len(lender_results),
-                'lender_results_json': json.dumps(lender_results),
-                'run_timestamp': datetime.now(timezone.utc).isoformat()
-            }
-            
-            result = self.client.table('scenario_results').insert(scenario_record).execute()
+            scenario_data = scenario_record(session_id, scenario_id, scenario_data,
+                                            datetime.now(timezone.utc).isoformat())
+            await run_blocking(self.upsert_records, 'scenario_results', [scenario_data], 'session_id,scenario_id')
             return True
             
         except Exception as e:
@@ -102,43 +79,13 @@ class SupabaseManager:
             return False
     
     def get_historical_summary(self) -> Dict:
-        """Get historical summary statistics from database."""
+        """Get historical summary statistics in one round-trip (get_historical_summary RPC)."""
         if not self.is_connected():
             return {'error': 'Database not connected'}
         
         try:
-            # Get total automation runs
-            runs_result = self.client.table('automation_runs').select('*').execute()
-            total_runs = len(runs_result.data)
-            
-            if total_runs == 0:
-                return {
-                    'total_runs': 0,
-                    'average_gen_h_rank': 0,
-                    'best_performing_scenario': 'No data',
-                    'last_run': 'No runs yet'
-                }
-            
-            # Get latest run
-            latest_run = self.client.table('automation_runs')\
-                .select('*')\
-                .order('run_timestamp', desc=True)\
-                .limit(1).execute()
-            
-            # Calculate average Gen H rank across all runs
-            avg_rank_result = self.client.rpc('calculate_average_gen_h_rank').execute()
-            avg_gen_h_rank = avg_rank_result.data if avg_rank_result.data else 0
-            
-            # Get best performing scenario (highest average Gen H rank)
-            best_scenario_result = self.client.rpc('get_best_performing_scenario').execute()
-            best_scenario = best_scenario_result.data if best_scenario_result.data else 'No data'
-            
-            return {
-                'total_runs': total_runs,
-                'average_gen_h_rank': round(avg_gen_h_rank, 2),
-                'best_performing_scenario': best_scenario,
-                'last_run': latest_run.data[0]['run_timestamp'] if latest_run.data else 'No runs'
-            }
+            result = self.client.rpc('get_historical_summary').execute()
+            return historical_summary_from_row(result.data)
             
         except Exception as e:
             print(f"❌ Error getting historical summary: {e}")
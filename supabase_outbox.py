@@ -0,0 +1,228 @@
+"""
+Durable outbox for Supabase writes
+Finished runs are queued in the local history database in one transaction
+and a background worker upserts them to Supabase in multi-row batches, with
+exponential backoff while Supabase is unreachable. Records Supabase rejects
+outright (a 4xx), or that run out of attempts, are moved to a dead-letter
+table so they can't hold up the rest of the queue. Records are keyed by
+session_id (automation_runs) and (session_id, scenario_id) (scenario_results),
+so retries and re-queued runs never create duplicates.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from blocking_io import run_blocking
+from fast_json import dumps, loads
+
+# Flush order matters: scenario_results references automation_runs(session_id)
+OUTBOX_TABLES = (
+    ('automation_runs', 'session_id'),
+    ('scenario_results', 'session_id,scenario_id'),
+)
+
+# Failed attempts before a record is set aside (about an hour at the default backoff)
+MAX_OUTBOX_ATTEMPTS = 20
+
+# Client errors that are worth retrying: request timeout and rate limiting
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+def permanent_failure(error: Exception) -> bool:
+    """Whether Supabase refused the request itself (e.g. a bad payload or missing constraint)."""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status is not None and 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS
+
+
+def run_record(session_id: str, run_type: str, total_scenarios: int, successful_scenarios: int,
+               results_data: Dict, run_timestamp: str) -> Dict:
+    """automation_runs row for a finished run."""
+    summary_stats = results_data.get('summary_statistics', {})
+    return {
+        'session_id': session_id,
+        'run_type': run_type,  # 'normal', 'credit', 'full'
+        'total_scenarios': total_scenarios,
+        'successful_scenarios': successful_scenarios,
+        'average_gen_h_rank': summary_stats.get('average_gen_h_rank', 0),
+        'rank_1_percentage': summary_stats.get('rank_percentages', {}).get('rank_1_percent', 0),
+        'rank_2_percentage': summary_stats.get('rank_percentages', {}).get('rank_2_percent', 0),
+        'rank_3_percentage': summary_stats.get('rank_percentages', {}).get('rank_3_percent', 0),
+        'top_3_percentage': summary_stats.get('top_3_percent', 0),
+        'run_timestamp': run_timestamp,
+        'results_json': dumps(results_data)
+    }
+
+
+def scenario_record(session_id: str, scenario_id: str, scenario_data: Dict, run_timestamp: str) -> Dict:
+    """scenario_results row for one scenario of a run."""
+    stats = scenario_data.get('statistics', {})
+    lender_results = scenario_data.get('lender_results', {})
+
+    # Gen H vs average gap
+    gen_h_amount = stats.get('gen_h_amount', 0)
+    average_amount = stats.get('average', 0)
+    gen_h_gap = gen_h_amount - average_amount if gen_h_amount and average_amount else 0
+
+    return {
+        'session_id': session_id,
+        'scenario_id': scenario_id,
+        'description': scenario_data.get('description', ''),
+        'gen_h_amount': gen_h_amount,
+        'average_lender_amount': average_amount,
+        'gen_h_rank': stats.get('gen_h_rank', 0),
+        'gen_h_difference': stats.get('gen_h_difference', 0),
+        'gen_h_vs_average_gap': gen_h_gap,
+        'total_lenders': len(lender_results),
+        'lender_results_json': dumps(lender_results),
+        'run_timestamp': run_timestamp
+    }
+
+
+def run_outbox_records(session_id: str, run_type: str, total_scenarios: int, successful_scenarios: int,
+                       results_data: Dict) -> List[Tuple[str, str, str]]:
+    """(table_name, record_key, payload) outbox rows for a run and all its scenarios."""
+    run_timestamp = datetime.now(timezone.utc).isoformat()
+    records = [('automation_runs', session_id, dumps(run_record(
+        session_id, run_type, total_scenarios, successful_scenarios, results_data, run_timestamp)))]
+    for scenario_id, scenario_data in results_data.get('results', {}).items():
+        records.append(('scenario_results', f"{session_id}/{scenario_id}",
+                        dumps(scenario_record(session_id, scenario_id, scenario_data, run_timestamp))))
+    return records
+
+
+class SupabaseOutbox:
+    """Queues Supabase records locally and flushes them in bulk upserts."""
+
+    def __init__(self, db, manager=None, batch_size: int = 500, interval: float = 5.0,
+                 base_delay: float = 2.0, max_delay: float = 300.0, max_attempts: int = MAX_OUTBOX_ATTEMPTS):
+        self.db = db
+        self.manager = manager
+        self.batch_size = batch_size
+        self.interval = interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.flushed = 0
+        self.last_flush_at = None
+        self._task = None
+        self._wake = None
+
+    def enqueue_run(self, session_id: str, run_type: str, total_scenarios: int, successful_scenarios: int,
+                    results_data: Dict) -> int:
+        """Queue a finished run and its scenarios (blocking, local only). Returns the record count."""
+        return self.db.enqueue_outbox(run_outbox_records(
+            session_id, run_type, total_scenarios, successful_scenarios, results_data))
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds until the next attempt after `attempts` failures, with jitter."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempts))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _send(self, table_name: str, conflict_columns: str, rows, now: float) -> Tuple[int, bool]:
+        """
+        Upsert outbox rows in one request. Returns the number flushed and
+        whether to carry on, which is False once a transient failure has
+        scheduled a retry. Rejected rows are sent one by one so only the ones
+        Supabase refuses are set aside.
+        """
+        ids = [row_id for row_id, _, _ in rows]
+        try:
+            await self.manager.upsert_records(table_name, [loads(payload) for _, payload, _ in rows],
+                                              conflict_columns)
+        except Exception as e:
+            attempts = max(row_attempts for _, _, row_attempts in rows) + 1
+            if permanent_failure(e) and len(rows) > 1:
+                flushed = 0
+                for row in rows:
+                    sent, carry_on = await self._send(table_name, conflict_columns, [row], now)
+                    flushed += sent
+                    if not carry_on:
+                        return flushed, False
+                return flushed, True
+            if permanent_failure(e) or attempts >= self.max_attempts:
+                await run_blocking(self.db.bury_outbox, ids, str(e)[:500])
+                print(f"❌ Supabase outbox: {len(ids)} {table_name} records set aside after "
+                      f"{attempts} attempt(s): {e}")
+                return 0, True
+            await run_blocking(self.db.retry_outbox, ids, now + self.backoff(attempts - 1), str(e)[:500])
+            print(f"⚠️ Supabase outbox: {len(ids)} {table_name} records failed "
+                  f"(attempt {attempts}), retrying later: {e}")
+            return 0, False
+        await run_blocking(self.db.complete_outbox, ids)
+        return len(ids), True
+
+    async def flush_once(self, now: Optional[float] = None) -> int:
+        """
+        Upsert every due record, one multi-row request per batch. Local
+        database work runs on the blocking I/O pool, uploads on the event loop.
+        Child tables wait while any parent row is still pending, failed now or
+        backing off from an earlier failure, so children never go out before
+        parents; rows set aside as dead no longer hold them back. Returns the
+        number of records flushed.
+        """
+        if self.manager is None or not self.manager.is_connected():
+            return 0
+
+        now = time.time() if now is None else now
+        flushed = 0
+        for table_name, conflict_columns in OUTBOX_TABLES:
+            while True:
+                rows = await run_blocking(self.db.due_outbox, table_name, now, self.batch_size)
+                if not rows:
+                    break
+                sent, carry_on = await self._send(table_name, conflict_columns, rows, now)
+                flushed += sent
+                if not carry_on:
+                    break
+                if len(rows) < self.batch_size:
+                    break
+            if await run_blocking(self.db.pending_outbox, table_name):
+                break
+
+        if flushed:
+            self.flushed += flushed
+            self.last_flush_at = datetime.now().isoformat()
+            print(f"☁️ Supabase outbox flushed {flushed} records")
+        return flushed
+
+    def wake(self) -> None:
+        """Flush now instead of waiting for the next interval."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.flush_once()
+            except Exception as e:
+                print(f"⚠️ Supabase outbox worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def stats(self) -> Dict:
+        return {
+            **self.db.outbox_stats(),
+            'flushed': self.flushed,
+            'last_flush_at': self.last_flush_at,
+            'connected': bool(self.manager and self.manager.is_connected())
+        }
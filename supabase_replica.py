@@ -0,0 +1,201 @@
+"""
+Local read replica of the Supabase history
+A background worker mirrors new and corrected automation_runs and
+scenario_results rows into the local history database, fetching only rows
+at or after each table's run_timestamp high-water mark. The dashboard's historical endpoints then read
+locally and report how fresh the replica is.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+from blocking_io import run_blocking
+from fast_json import loads
+from history_schema import run_type_from_session
+
+# Seconds between syncs, 0 disables the replica
+REPLICA_SYNC_INTERVAL = float(os.getenv("SUPABASE_REPLICA_INTERVAL", "0"))
+
+# Rows are re-read from this far behind the high-water mark, so records that
+# reach Supabase slightly out of timestamp order, or are re-upserted with
+# corrections, are still mirrored
+REPLICA_LOOKBACK = timedelta(minutes=5)
+
+
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def local_timestamp(value: Optional[str]) -> Optional[str]:
+    """Supabase TIMESTAMPTZ as local 'YYYY-MM-DD HH:MM:SS', the format of the local store."""
+    if not value:
+        return None
+    timestamp = parse_timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp.isoformat(sep=' ', timespec='seconds')
+
+
+def run_row(record: Dict):
+    """apply_replica_rows run tuple for an automation_runs record."""
+    session_id = record['session_id']
+    return (session_id, record.get('run_type') or run_type_from_session(session_id),
+            local_timestamp(record.get('run_timestamp')), record.get('total_scenarios') or 0,
+            record.get('successful_scenarios') or 0)
+
+
+def scenario_row(record: Dict):
+    """apply_replica_rows scenario tuple for a scenario_results record."""
+    lender_results = record.get('lender_results_json') or {}
+    if isinstance(lender_results, str):
+        lender_results = loads(lender_results)
+    return (record['session_id'], record['scenario_id'], record.get('description') or '',
+            local_timestamp(record.get('run_timestamp')), record.get('gen_h_amount') or 0,
+            record.get('average_lender_amount') or 0, record.get('gen_h_difference') or 0,
+            record.get('gen_h_rank') or 0, lender_results)
+
+
+class SupabaseReplica:
+    """Incrementally mirrors Supabase history into the local database."""
+
+    def __init__(self, db, manager, interval: float = 60.0, lookback: timedelta = REPLICA_LOOKBACK,
+                 on_change=None):
+        self.db = db
+        self.manager = manager
+        self.interval = interval
+        self.lookback = lookback
+        self.on_change = on_change
+        self.sync_count = 0
+        self.high_water_mark = None     # newest scenario_results run_timestamp mirrored
+        self.last_sync_at = None        # unix time of the last successful sync
+        self.last_error = None
+        self._task = None
+
+    def _since(self, high_water_mark: Optional[str]) -> Optional[str]:
+        if not high_water_mark:
+            return None
+        return (parse_timestamp(high_water_mark) - self.lookback).isoformat()
+
+    async def _sync_table(self, table_name: str, pages, to_row, high_water_mark: Optional[str],
+                          last_id: int) -> Tuple[int, Optional[str], Set[str]]:
+        """
+        Apply every page, then advance the table's high-water mark. Rows
+        re-read through the lookback window are applied again, so a corrected
+        row (same id) is mirrored; the database skips rows it already stores
+        unchanged, so a sync with nothing new leaves the history revision alone.
+        """
+        synced = 0
+        session_ids = set()
+        newest_id = last_id
+        async for page in pages:
+            if not page:
+                continue
+            rows = [to_row(record) for record in page]
+            if table_name == 'automation_runs':
+                applied, changed = await run_blocking(self.db.apply_replica_rows, rows, [])
+            else:
+                applied, changed = await run_blocking(self.db.apply_replica_rows, [], rows)
+            synced += applied
+            session_ids.update(changed)
+            newest_id = max(newest_id, max(record['id'] for record in page))
+            for record in page:
+                timestamp = record.get('run_timestamp')
+                if timestamp and (high_water_mark is None or
+                                  parse_timestamp(timestamp) > parse_timestamp(high_water_mark)):
+                    high_water_mark = timestamp
+        await run_blocking(self.db.save_replica_state, table_name, high_water_mark, newest_id, synced)
+        return synced, high_water_mark, session_ids
+
+    async def sync_once(self) -> int:
+        """
+        Mirror rows at or after each table's high-water mark (less the lookback).
+        Runs go first so scenario rows find their run. `on_change` is called
+        with the session_ids of the changed runs. Returns the rows applied.
+        """
+        if self.manager is None or not self.manager.is_connected():
+            return 0
+
+        state = await run_blocking(self.db.get_replica_state)
+        runs_mark, runs_id = state.get('automation_runs', (None, 0))[:2]
+        scenarios_mark, scenarios_id = state.get('scenario_results', (None, 0))[:2]
+        try:
+            synced, _, runs_changed = await self._sync_table(
+                'automation_runs', self.manager.iter_automation_runs(since=self._since(runs_mark)),
+                run_row, runs_mark, runs_id)
+            scenarios_synced, self.high_water_mark, scenarios_changed = await self._sync_table(
+                'scenario_results',
+                self.manager.iter_scenario_results(include_lender_results=True, since=self._since(scenarios_mark)),
+                scenario_row, scenarios_mark, scenarios_id)
+            synced += scenarios_synced
+        except Exception as e:
+            self.last_error = str(e)[:500]
+            raise
+
+        self.sync_count += 1
+        self.last_sync_at = time.time()
+        self.last_error = None
+        if synced and self.on_change is not None:
+            await run_blocking(self.on_change, sorted(runs_changed | scenarios_changed))
+        return synced
+
+    def marker(self) -> Dict:
+        """Replica position for response bodies; changes only when a sync completes."""
+        return {
+            'synced_at': datetime.fromtimestamp(self.last_sync_at).isoformat(timespec='seconds')
+            if self.last_sync_at else None,
+            'high_water_mark': self.high_water_mark,
+        }
+
+    def staleness(self, now: Optional[float] = None) -> Dict:
+        """Seconds since the last successful sync, and whether that is overdue."""
+        now = time.time() if now is None else now
+        age = round(now - self.last_sync_at, 1) if self.last_sync_at else None
+        return {
+            'age_seconds': age,
+            'stale': age is None or self.last_error is not None or age > 3 * self.interval,
+        }
+
+    def headers(self) -> Dict[str, str]:
+        """Staleness headers, current even on 304 responses."""
+        staleness = self.staleness()
+        headers = {'X-Replica-Stale': 'true' if staleness['stale'] else 'false'}
+        if staleness['age_seconds'] is not None:
+            headers['X-Replica-Age'] = str(int(staleness['age_seconds']))
+        return headers
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                synced = await self.sync_once()
+                if synced:
+                    print(f"🔁 Supabase replica mirrored {synced} rows")
+            except Exception as e:
+                print(f"⚠️ Supabase replica sync failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        return {
+            'tables': {table: {'high_water_mark': mark, 'last_id': last_id, 'rows_synced': rows,
+                               'synced_at': synced_at}
+                       for table, (mark, last_id, rows, synced_at) in self.db.get_replica_state().items()},
+            'sync_count': self.sync_count,
+            'last_error': self.last_error,
+            'interval': self.interval,
+            **self.staleness(),
+        }
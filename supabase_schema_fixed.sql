@@ -36,9 +36,15 @@ CREATE TABLE scenario_results (
     run_timestamp TIMESTAMPTZ NOT NULL,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     
+    -- Outbox upserts are idempotent on (session_id, scenario_id)
+    UNIQUE (session_id, scenario_id),
+    
     FOREIGN KEY (session_id) REFERENCES automation_runs(session_id) ON DELETE CASCADE
 );
 
+-- Existing projects: add the upsert key once (remove duplicate rows first)
+-- ALTER TABLE scenario_results ADD CONSTRAINT scenario_results_session_id_scenario_id_key UNIQUE (session_id, scenario_id);
+
 -- Indexes for performance
 CREATE INDEX idx_automation_runs_timestamp ON automation_runs(run_timestamp);
 CREATE INDEX idx_automation_runs_type ON automation_runs(run_type);
@@ -92,6 +98,24 @@ AS $$
     LIMIT run_limit;
 $$;
 
+-- Function: All historical summary fields in one round-trip
+CREATE OR REPLACE FUNCTION get_historical_summary()
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_runs', (SELECT COUNT(*) FROM automation_runs),
+        'average_gen_h_rank', (SELECT COALESCE(ROUND(AVG(average_gen_h_rank), 2), 0)
+                               FROM automation_runs WHERE average_gen_h_rank > 0),
+        'best_performing_scenario', COALESCE(
+            (SELECT scenario_id FROM scenario_results WHERE gen_h_rank > 0
+             GROUP BY scenario_id ORDER BY AVG(gen_h_rank::DECIMAL) ASC LIMIT 1),
+            'No data'),
+        'last_run', (SELECT MAX(run_timestamp) FROM automation_runs)
+    );
+$$;
+
 -- Function: Get scenario performance summary
 CREATE OR REPLACE FUNCTION get_scenario_performance_summary()
 RETURNS TABLE(
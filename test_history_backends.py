@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test that the SQLite and in-memory history backends return the same analytics
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+
+from history_backends import (HistoryBackend, SQLiteHistoryBackend, MemoryHistoryBackend, create_history_backend,
+                              EMPTY_SUMMARY)
+from history_cache import HistoryCache
+from history_database import DatabaseManager
+from test_history_cache import make_results
+
+
+async def read_all(backend):
+    return (await backend.get_historical_summary(),
+            await backend.get_gen_h_rank_over_time(limit=20),
+            await backend.get_gen_h_vs_average_gap_over_time(limit=20),
+            await backend.get_scenario_rank_changes())
+
+
+def test_sqlite_backend_matches_memory_backend():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        cache = HistoryCache()
+        cache.load(db)
+        sqlite_backend = SQLiteHistoryBackend(db)
+        memory_backend = MemoryHistoryBackend(cache)
+
+        summary, rank, gap, changes = asyncio.run(read_all(sqlite_backend))
+        assert summary == EMPTY_SUMMARY
+        assert rank == [] and gap == []
+        assert 'error' in changes
+
+        db.save_run_batch("full-session-a", make_results(3000, 5000), started_at="2031-01-15 09:00:00")
+        db.save_run_batch("credit-session-b", make_results(4500, 3500), started_at="2031-01-16 09:00:00")
+        cache.load(db)
+
+        sqlite_results = asyncio.run(read_all(sqlite_backend))
+        assert sqlite_results == asyncio.run(read_all(memory_backend))
+        summary, rank, _, changes = sqlite_results
+        assert summary['total_runs'] == 2 and summary['last_run'] == "2031-01-16T09:00:00"
+        assert [point['average_gen_h_rank'] for point in rank] == [3.0, 1.0]
+        assert changes == {'sole_employed': 2.0, 'joint_employed': 2.0}
+
+        revision = asyncio.run(sqlite_backend.revision())
+        db.save_run_batch("full-session-c", make_results(5000, 3000), started_at="2031-01-17 09:00:00")
+        assert asyncio.run(sqlite_backend.revision()) != revision
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_backend_selection():
+    cache = HistoryCache()
+    assert create_history_backend('sqlite', None, cache).name == 'sqlite'
+    assert create_history_backend('supabase', None, cache).name == 'memory'
+    assert create_history_backend('duckdb', None, cache).name == 'memory'
+    # A backend missing part of the read interface can't be constructed
+    try:
+        type('PartialBackend', (HistoryBackend,), {'get_historical_summary': None})()
+        assert False, "incomplete backends should be rejected"
+    except TypeError:
+        pass
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING HISTORY BACKENDS")
+    print("=" * 50)
+    test_sqlite_backend_matches_memory_backend()
+    print("✅ SQLite backend matches the in-memory backend")
+    test_backend_selection()
+    print("✅ HISTORY_BACKEND selection falls back to the history cache")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test the in-memory history cache against the database queries it replaces
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+
+from downsampling import downsample_rows
+from history_backends import create_history_backend
+from history_cache import HistoryCache
+from history_database import DatabaseManager
+
+
+def make_results(gen_h, other):
+    results = {}
+    for scenario_id, income in [("single_employed_30k", 30), ("single_employed_20k", 20), ("joint_employed_80k", 80)]:
+        lenders = {"Gen H": gen_h * income, "Accord": other * income, "Nationwide": 4000 * income}
+        ranked = sorted(lenders.values(), reverse=True)
+        average = sum(lenders.values()) / len(lenders)
+        results[scenario_id] = {
+            'lender_results': lenders,
+            'statistics': {'gen_h_amount': gen_h * income, 'average': average,
+                           'gen_h_difference': gen_h * income - average,
+                           'gen_h_rank': ranked.index(gen_h * income) + 1}
+        }
+    return results
+
+
+def test_cache_matches_database_and_appends():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        db.save_run_batch("full-session-a", make_results(3000, 5000), started_at="2031-01-15 09:00:00")
+        db.save_run_batch("full-session-b", make_results(4500, 3500), started_at="2031-01-16 09:00:00")
+
+        cache = HistoryCache()
+        cache.load(db)
+        assert cache.scenario_history("single_employed_30k") == \
+            db.get_historical_data(scenario_id="single_employed_30k", days=30)
+        assert cache.lender_trends("Accord") == db.get_lender_trends("Accord")
+        assert cache.lender_trends("Accord", limit=4) == db.get_lender_trends("Accord", limit=4)
+
+        # A completed run is appended without reloading
+        db.save_run_batch("credit-session-c", make_results(5000, 3000), started_at="2031-01-17 09:00:00")
+        version = cache.version
+        assert cache.add_run(db, "credit-session-c")
+        assert cache.version == version + 1
+        assert cache.lender_trends("Gen H") == db.get_lender_trends("Gen H")
+
+        assert [point['average_gen_h_rank'] for point in cache.rank_over_time()] == [3.0, 1.0, 1.0]
+        assert cache.rank_over_time(limit=1)[0]['run_type'] == 'credit'
+        assert cache.scenario_rank_changes() == {'sole_employed': 0.0, 'joint_employed': 0.0}
+        summary = cache.historical_summary()
+        assert summary['total_runs'] == 3
+        assert summary['last_run'] == "2031-01-17T09:00:00"
+        assert cache.memory_usage()['lender_rows'] == 27
+
+        # Within the point budget, downsampling returns every row
+        rows, total = cache.lender_trends_downsampled("Accord", 1000)
+        assert total == 9 and rows == cache.lender_trends("Accord", limit=total)
+        rows, total = cache.scenario_history_downsampled("joint_employed_80k", 3)
+        assert total == 3 and rows == cache.scenario_history("joint_employed_80k")
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_unloaded_cache_falls_back_to_database():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        for day, (gen_h, other) in enumerate([(3000, 5000), (4500, 3500), (3800, 3900), (5000, 3000)], 10):
+            db.save_run_batch(f"full-session-{day}", make_results(gen_h, other), started_at=f"2031-01-{day} 09:00:00")
+
+        cache = HistoryCache()
+        backend = create_history_backend('memory', db, cache)
+        assert not cache.is_loaded
+        assert asyncio.run(backend.get_historical_summary())['total_runs'] == 4
+
+        # The next completed run retries the full load
+        assert cache.add_run(db, "full-session-13") and cache.is_loaded
+        history = db.get_historical_data(scenario_id="single_employed_30k", days=-1)
+        assert downsample_rows(history, 3, value_index=1) == cache.scenario_history_downsampled("single_employed_30k", 3)[0]
+        trends = db.get_lender_trends("Accord", limit=-1)
+        assert sorted(downsample_rows(trends, 4, value_index=2, group_index=1)) == \
+            sorted(cache.lender_trends_downsampled("Accord", 4)[0])
+
+        # Reloading never reuses a version an ETag was built from
+        version = cache.version
+        cache.load(db)
+        assert cache.version > version
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_reload_keeps_serving_previous_history():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        db.save_run_batch("full-session-a", make_results(3000, 5000), started_at="2031-01-15 09:00:00")
+        cache = HistoryCache()
+        cache.load(db)
+        db.save_run_batch("full-session-b", make_results(4500, 3500), started_at="2031-01-16 09:00:00")
+
+        # Hold a reload part-way through reading the database
+        reading, release = threading.Event(), threading.Event()
+        iter_history_chunks = db.iter_history_chunks
+
+        def slow_chunks(*args):
+            reading.set()
+            release.wait(5)
+            yield from iter_history_chunks(*args)
+
+        db.iter_history_chunks = slow_chunks
+        reload = threading.Thread(target=cache.load, args=(db,))
+        reload.start()
+        assert reading.wait(5)
+        # Queries answer from the previous history instead of waiting for the reload
+        assert len(cache.lender_trends("Accord")) == 3 and cache.historical_summary()['total_runs'] == 1
+        release.set()
+        reload.join(5)
+        assert len(cache.lender_trends("Accord")) == 6 and cache.historical_summary()['total_runs'] == 2
+
+        # A batch of changed runs costs at most one rebuild
+        version = cache.version
+        assert cache.add_runs(db, ["full-session-a", "full-session-b"]) and cache.version == version + 1
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING HISTORY CACHE")
+    print("=" * 50)
+    test_cache_matches_database_and_appends()
+    print("✅ Cache matches database queries and appends completed runs")
+    test_unloaded_cache_falls_back_to_database()
+    print("✅ Database serves history until the cache has loaded")
+    test_reload_keeps_serving_previous_history()
+    print("✅ Reloads swap in a fresh copy while queries keep answering")
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Test the pooled WAL-mode history database layer
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from history_database import DatabaseManager
+from history_schema import SCHEMA_VERSION
+
+SOURCE_DB = "mbt_affordability_history.db"
+
+
+def make_test_db():
+    """Copy the history database into a temp dir so tests never touch the real file."""
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "history_test.db")
+    shutil.copy(SOURCE_DB, db_path)
+    return DatabaseManager(db_path, pool_size=4)
+
+
+def test_wal_and_pool_reuse():
+    """Connections should be reused and opened in WAL mode."""
+    db = make_test_db()
+
+    with db.connection() as conn:
+        first_id = id(conn)
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    with db.connection() as conn:
+        second_id = id(conn)
+
+    assert mode == "wal", f"expected WAL journal mode, got {mode}"
+    assert first_id == second_id, "pooled connection was not reused"
+    db.close_all()
+
+
+def test_reads_do_not_block_on_writes():
+    """A dashboard read must complete while a run write transaction is open."""
+    db = make_test_db()
+    read_done = threading.Event()
+
+    def reader():
+        db.get_scenarios()
+        read_done.set()
+
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT INTO dim_runs (session_id, started_at, status) VALUES (?, ?, ?)",
+            ("blocking-test", "2025-01-01 09:00:00", "running")
+        )
+        thread = threading.Thread(target=reader)
+        thread.start()
+        assert read_done.wait(timeout=5), "read blocked behind an open write transaction"
+        thread.join()
+
+    db.close_all()
+
+
+def test_save_round_trip():
+    """Saved scenario and lender rows should be readable through the same pool."""
+    db = make_test_db()
+    session_id = "pool-test-session"
+
+    db.save_automation_run(session_id, 1, 1, "completed")
+    db.save_scenario_result(session_id, "single_employed_30k", 150000, 140000, 10000, 2, 3)
+    db.save_lender_results(session_id, "single_employed_30k",
+                           {"Gen H": 150000, "Accord": 160000, "Leeds": 110000})
+
+    history = db.get_historical_data(scenario_id="single_employed_30k", lender_name="Gen H")
+    assert history and history[0][1] == 150000 and history[0][2] == 2
+    db.close_all()
+
+
+def test_scenario_bundle_is_atomic():
+    """A failing lender row must roll back its scenario summary too."""
+    db = make_test_db()
+    session_id = "atomic-test-session"
+
+    try:
+        # Lists sort fine but cannot be bound as SQLite parameters
+        db.save_scenario_bundle(session_id, "single_employed_30k", 1, 1, 0, 1,
+                                {"Gen H": [150000], "Accord": [160000]})
+        raise AssertionError("expected the lender insert to fail")
+    except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+        pass
+
+    with db.connection() as conn:
+        count = conn.execute(
+            "SELECT COUNT(*) FROM fact_scenario_results f JOIN dim_runs r ON r.id = f.run_id "
+            "WHERE r.session_id = ?", (session_id,)
+        ).fetchone()[0]
+    assert count == 0, "scenario summary was written without its lender rows"
+    db.close_all()
+
+
+def test_run_batch_import():
+    """A batch import should write the run, scenarios and ranked lender rows together."""
+    db = make_test_db()
+    results = {
+        "single_employed_20k": {
+            "lender_results": {"Gen H": 90000, "Accord": 95000},
+            "statistics": {"gen_h_amount": 90000, "average": 92500, "gen_h_difference": -2500, "gen_h_rank": 2}
+        },
+        "joint_employed_40k": {
+            "lender_results": {"Gen H": 190000, "Accord": 180000, "Leeds": 170000},
+            "statistics": {"gen_h_amount": 190000, "average": 180000, "gen_h_difference": 10000, "gen_h_rank": 1}
+        }
+    }
+
+    assert db.save_run_batch("batch-test-session", results) == (2, 5)
+
+    with db.connection() as conn:
+        ranks = conn.execute(
+            "SELECT l.name, f.rank_position FROM fact_lender_results f "
+            "JOIN dim_runs r ON r.id = f.run_id "
+            "JOIN dim_scenarios s ON s.id = f.scenario_key "
+            "JOIN dim_lenders l ON l.id = f.lender_id "
+            "WHERE r.session_id = ? AND s.scenario_id = ? ORDER BY f.rank_position",
+            ("batch-test-session", "joint_employed_40k")
+        ).fetchall()
+        run = conn.execute("SELECT successful_scenarios FROM dim_runs WHERE session_id = ?",
+                           ("batch-test-session",)).fetchone()
+    assert ranks == [("Gen H", 1), ("Accord", 2), ("Leeds", 3)]
+    assert run == (2,)
+    db.close_all()
+
+
+def test_legacy_migration():
+    """Every legacy result row should be migrated into the integer-keyed fact tables."""
+    db = make_test_db()
+
+    with db.connection() as conn:
+        legacy_scenarios = conn.execute("SELECT COUNT(*) FROM scenario_results").fetchone()[0]
+        legacy_lenders = conn.execute("SELECT COUNT(*) FROM lender_results").fetchone()[0]
+        migrated_scenarios = conn.execute("SELECT COUNT(*) FROM fact_scenario_results").fetchone()[0]
+        migrated_lenders = conn.execute("SELECT COUNT(*) FROM fact_lender_results").fetchone()[0]
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    assert version == SCHEMA_VERSION
+    assert migrated_scenarios == legacy_scenarios
+    assert migrated_lenders == legacy_lenders
+    db.close_all()
+
+
+def test_legacy_run_times_are_local():
+    """Legacy UTC run times become local on migration, and on upgrade if an older migration copied them."""
+    original_tz = os.environ.get("TZ")
+    os.environ["TZ"] = "Europe/London"
+    time.tzset()
+    try:
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, "history_test.db")
+        shutil.copy(SOURCE_DB, db_path)
+        with sqlite3.connect(SOURCE_DB) as legacy:
+            session_id, utc_time = legacy.execute(
+                "SELECT session_id, MIN(run_time) FROM scenario_results GROUP BY session_id").fetchone()
+        # August is British Summer Time, UTC+1
+        local_time = datetime.fromisoformat(utc_time) + timedelta(hours=1)
+        local_time = local_time.isoformat(sep=" ")
+
+        def migrate():
+            db = DatabaseManager(db_path, pool_size=1)
+            db.get_history_revision()
+            db.close_all()
+
+        def started_at():
+            with sqlite3.connect(db_path) as conn:
+                return conn.execute("SELECT started_at FROM dim_runs WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+        migrate()
+        assert started_at() == local_time
+
+        # A database migrated before run times were localized still holds the UTC copy
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE dim_runs SET started_at = ? WHERE session_id = ?", (utc_time, session_id))
+            conn.execute("PRAGMA user_version = 9")
+        migrate()
+        assert started_at() == local_time
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    finally:
+        if original_tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = original_tz
+        time.tzset()
+
+
+def test_same_day_runs_do_not_collide():
+    """Two runs on the same day must come back as separate, ordered history points."""
+    db = make_test_db()
+    lenders = {"Gen H": 100000, "Accord": 120000}
+    stats = {"gen_h_amount": 100000, "average": 110000, "gen_h_difference": -10000, "gen_h_rank": 2}
+
+    db.save_run_batch("morning-session", {"single_employed_20k": {"lender_results": lenders, "statistics": stats}},
+                      started_at="2030-01-01 09:00:00")
+    db.save_run_batch("evening-session", {"single_employed_20k": {"lender_results": lenders, "statistics": stats}},
+                      started_at="2030-01-01 18:00:00")
+
+    history = db.get_historical_data(scenario_id="single_employed_20k", days=2)
+    assert [row[0] for row in history] == ["2030-01-01 18:00:00", "2030-01-01 09:00:00"]
+    db.close_all()
+
+
+def test_latest_run_pointers():
+    """Latest pointers track the newest run per type and overall, and never move backwards."""
+    db = make_test_db()
+
+    credit_version = db.record_finished_run("credit-session-1", "credit", 1, "{}", finished_at="2030-01-02 10:00:00")
+    db.record_finished_run("complete-session-1", "complete", 1, "{}", finished_at="2030-01-01 10:00:00")
+
+    assert db.get_latest_run()["session_id"] == "credit-session-1"
+    assert db.get_latest_run("complete")["session_id"] == "complete-session-1"
+    assert db.get_latest_run("credit")["materialized_version"] == credit_version
+    assert db.get_latest_run("full") is None
+    db.close_all()
+
+
+
+def test_history_export_chunks():
+    """History export rows come back in bounded chunks, filtered by run date."""
+    db = make_test_db()
+    lenders = {"Gen H": 100000, "Accord": 120000, "Nationwide": 110000}
+    results = {f"single_employed_{k}k": {'lender_results': lenders, 'statistics': {'gen_h_amount': 100000}}
+               for k in (20, 30, 40)}
+    db.save_run_batch("full-session-export-1", results, started_at="2031-03-01 09:00:00")
+    db.save_run_batch("full-session-export-2", results, started_at="2031-04-01 09:00:00")
+
+    chunks = list(db.iter_history_chunks(start="2031-01-01", chunk_size=4))
+    rows = [row for chunk in chunks for row in chunk]
+    assert len(rows) == 18 and max(len(chunk) for chunk in chunks) == 4
+    assert rows[0][1] == "full-session-export-1" and rows[-1][1] == "full-session-export-2"
+
+    march = [row for chunk in db.iter_history_chunks("2031-03-01", "2031-03-01") for row in chunk]
+    assert {row[1] for row in march} == {"full-session-export-1"}
+
+    # A paused (or abandoned) export holds no pooled connection between chunks
+    pooled = db._pool.qsize()
+    chunks = db.iter_history_chunks(chunk_size=4)
+    next(chunks)
+    assert db._pool.qsize() == pooled
+    db.save_run_batch("full-session-export-3", results, started_at="2031-05-01 09:00:00")
+    # Later chunks see runs saved meanwhile
+    remaining = sum(len(chunk) for chunk in chunks)
+    assert remaining == sum(len(chunk) for chunk in db.iter_history_chunks()) - 4
+    db.close_all()
+
+if __name__ == "__main__":
+    print("🔍 TESTING POOLED HISTORY DATABASE")
+    print("=" * 50)
+    test_wal_and_pool_reuse()
+    print("✅ WAL mode and pool reuse")
+    test_reads_do_not_block_on_writes()
+    print("✅ Reads do not block on writes")
+    test_save_round_trip()
+    print("✅ Save round trip")
+    test_scenario_bundle_is_atomic()
+    print("✅ Scenario bundle is atomic")
+    test_run_batch_import()
+    print("✅ Run batch import")
+    test_legacy_migration()
+    print("✅ Legacy migration")
+    test_legacy_run_times_are_local()
+    print("✅ Legacy run times are local")
+    test_same_day_runs_do_not_collide()
+    print("✅ Same-day runs do not collide")
+    test_latest_run_pointers()
+    print("✅ Latest run pointers")
+    test_history_export_chunks()
+    print("✅ History export chunks")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test filtered, cursor-paginated lender result queries
+"""
+
+import os
+import shutil
+import tempfile
+
+from history_database import DatabaseManager
+from history_query import decode_cursor, encode_cursor, lender_result_records, parse_fields, walk_sort_index
+from test_history_cache import make_results
+
+
+def make_database(tmp_dir):
+    db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+    db.save_run_batch("full-session-a", make_results(3000, 5000), started_at="2031-01-15 09:00:00")
+    db.save_run_batch("full-session-b", make_results(4500, 3500), started_at="2031-01-15 15:00:00")
+    db.save_run_batch("credit-session-c", make_results(5000, 3000), started_at="2031-02-03 09:00:00")
+    return db
+
+
+def read_all_pages(db, filters, sort, descending, limit):
+    rows, after, pages = [], None, 0
+    while True:
+        page, after = db.query_lender_results(filters, ('session_id', 'scenario_id', 'lender_name', 'amount'),
+                                              sort, descending, after, limit)
+        rows.extend(page)
+        pages += 1
+        if after is None:
+            return rows, pages
+        # Keys survive the round trip through the client
+        after = decode_cursor(encode_cursor(after), sort)
+
+
+def test_pages_cover_every_row_in_order():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = make_database(tmp_dir)
+        every, pages = read_all_pages(db, {}, 'date', False, 1000)
+        assert len(every) == 27 and pages == 1
+
+        for sort in ('date', 'amount', 'rank'):
+            for descending in (False, True):
+                rows, pages = read_all_pages(db, {}, sort, descending, 4)
+                assert sorted(rows) == sorted(every) and pages == 7
+        by_amount, _ = read_all_pages(db, {}, 'amount', True, 5)
+        assert [row[3] for row in by_amount] == sorted((row[3] for row in every), reverse=True)
+        # A narrow filter collects its matches and sorts them instead of walking the index
+        accord, _ = read_all_pages(db, {'lenders': ['Accord'], 'groups': ['joint_employed']}, 'amount', True, 1)
+        assert [row[3] for row in accord] == [400000, 280000, 240000]
+        assert walk_sort_index(100, 1.0, 10 ** 6) and not walk_sort_index(100, 0.001, 10 ** 6)
+        newest, _ = read_all_pages(db, {}, 'date', True, 5)
+        assert newest[0][0] == "credit-session-c" and newest[-1][0] == "full-session-a"
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_filters_and_projection():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = make_database(tmp_dir)
+
+        def query(**filters):
+            return read_all_pages(db, filters, 'date', False, 2)[0]
+
+        accord = query(lenders=['Accord', 'Gen H'])
+        assert len(accord) == 18 and {row[2] for row in accord} == {'Accord', 'Gen H'}
+        assert {row[1] for row in query(groups=['joint_employed'])} == {'joint_employed_80k'}
+        assert {row[1] for row in query(income_min=25000, income_max=80000)} == \
+            {'single_employed_30k', 'joint_employed_80k'}
+        assert query(credit=True) == [] and len(query(credit=False)) == 27
+        assert {row[0] for row in query(start='2031-01-15', end='2031-01-15')} == {'full-session-a', 'full-session-b'}
+        assert query(lenders=['Unknown']) == [] and query(groups=['joint_self_employed']) == []
+
+        fields = parse_fields('run_timestamp,has_credit_commitments,amount')
+        rows, _ = db.query_lender_results({'lenders': ['Nationwide']}, fields, 'rank', False, None, 1)
+        assert lender_result_records(fields, rows) == [
+            {'run_timestamp': '2031-01-15T09:00:00', 'has_credit_commitments': False, 'amount': 120000}]
+        for invalid in ('amount,colour', ' , '):
+            try:
+                parse_fields(invalid)
+                assert False, "unknown fields should be rejected"
+            except ValueError:
+                pass
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING LENDER RESULT QUERIES")
+    print("=" * 50)
+    test_pages_cover_every_row_in_order()
+    print("✅ Cursor pages cover every row in sort order")
+    test_filters_and_projection()
+    print("✅ Lender, scenario and date filters with projection")
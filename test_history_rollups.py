@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test the daily, weekly and monthly history rollups
+"""
+
+import os
+import shutil
+import tempfile
+
+from history_database import DatabaseManager
+from history_rollups import choose_granularity, period_bounds, group_rollup_points, lender_rollup_points
+from test_history_cache import make_results
+
+
+def test_period_bounds_and_granularity():
+    assert period_bounds('day', '2031-01-15 09:00:00') == ('2031-01-15', '2031-01-16')
+    # 2031-01-15 is a Wednesday
+    assert period_bounds('week', '2031-01-15 09:00:00') == ('2031-01-13', '2031-01-20')
+    assert period_bounds('month', '2031-12-31 23:59:59') == ('2031-12-01', '2032-01-01')
+    assert choose_granularity('2031-01-01', '2031-02-15') == 'day'
+    assert choose_granularity('2031-01-01', '2031-10-01') == 'week'
+    assert choose_granularity('2029-01-01', '2031-10-01') == 'month'
+
+
+def test_rollups_follow_runs_incrementally():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        db.save_run_batch("full-session-a", make_results(3000, 5000), started_at="2031-01-15 09:00:00")
+        db.save_run_batch("full-session-b", make_results(4500, 3500), started_at="2031-01-15 15:00:00")
+        db.save_run_batch("full-session-c", make_results(5000, 3000), started_at="2031-02-03 09:00:00")
+
+        days = group_rollup_points(db.get_group_rollups('day'), 'day')
+        assert [(point['period_start'], point['runs']) for point in days] == [('2031-01-15', 2), ('2031-02-03', 1)]
+        # Ranks 3 and 1 over the three scenarios of each run on the 15th
+        assert days[0]['average_gen_h_rank'] == 2.0 and days[1]['average_gen_h_rank'] == 1.0
+
+        months = group_rollup_points(db.get_group_rollups('month', start='2031-01-01', end='2031-01-31'), 'month')
+        assert len(months) == 1 and months[0]['scenarios'] == 6
+        joint = db.get_group_rollups('month', scenario_group='joint_employed')
+        assert [row[2] for row in joint] == [2, 1]
+
+        accord = lender_rollup_points(db.get_lender_rollups('Accord', 'week'), 'week')
+        assert [point['period_start'] for point in accord] == ['2031-01-13', '2031-02-03']
+        assert accord[0]['mean_rank'] == 2.0
+
+        # A lender that returned nothing still counts, like in the scenario statistics
+        declined = {"single_employed_30k": {'lender_results': {"Gen H": 90000, "Accord": 0},
+                                            'statistics': {'gen_h_amount': 90000, 'gen_h_rank': 1}}}
+        db.save_run_batch("full-session-d", declined, started_at="2031-03-01 09:00:00")
+        march = lender_rollup_points(db.get_lender_rollups('Accord', 'day', start='2031-03-01'), 'day')
+        assert [(point['observations'], point['mean_amount'], point['mean_rank']) for point in march] == [(1, 0, 2)]
+
+        # Re-importing a run replaces its contribution instead of adding to it
+        db.save_run_batch("full-session-a", make_results(3000, 5000), started_at="2031-01-15 09:00:00")
+        assert db.get_group_rollups('day')[0][1:3] == (2, 6)
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING HISTORY ROLLUPS")
+    print("=" * 50)
+    test_period_bounds_and_granularity()
+    print("✅ Period bounds and automatic granularity")
+    test_rollups_follow_runs_incrementally()
+    print("✅ Rollups follow imported runs incrementally")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test the partitioned Parquet history store
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# The Parquet store is optional, so are its tests
+ds = pytest.importorskip("pyarrow.dataset")
+
+from history_database import DatabaseManager
+from parquet_history import export_history, write_run
+
+
+def test_runs_are_partitioned_and_appended():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        lenders = {"Gen H": 100000, "Accord": 120000}
+        results = {"joint_self_employed_60k_credit": {'lender_results': lenders,
+                                                      'statistics': {'gen_h_amount': 100000, 'gen_h_rank': 2}}}
+        db.save_run_batch("full-session-a", results, started_at="2031-01-15 09:00:00")
+        db.save_run_batch("credit-session-b", results, started_at="2031-02-15 09:00:00")
+        root = os.path.join(tmp_dir, "parquet")
+
+        assert export_history(db, root) == (2, 0)
+        assert os.path.exists(os.path.join(root, "run_month=2031-02", "run_type=credit", "credit-session-b.parquet"))
+
+        # Appending only writes the new run; existing files are skipped
+        db.save_run_batch("full-session-c", results, started_at="2031-02-20 09:00:00")
+        assert write_run(db, "full-session-c", root).endswith("full-session-c.parquet")
+        assert export_history(db, root) == (0, 3)
+
+        dataset = ds.dataset(root, partitioning="hive")
+        table = dataset.to_table(columns=["lender_name", "amount", "has_credit_commitments"],
+                                 filter=ds.field("run_month") == "2031-02")
+        assert table.num_rows == 4
+        assert table.column("has_credit_commitments").to_pylist() == [True] * 4
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING PARQUET HISTORY")
+    print("=" * 50)
+    test_runs_are_partitioned_and_appended()
+    print("✅ Runs partitioned and appended")
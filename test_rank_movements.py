@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test N-run Gen H rank movements and their backends
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from history_backends import MemoryHistoryBackend, SQLiteHistoryBackend
+from history_cache import HistoryCache
+from history_database import DatabaseManager
+from rank_movements import rank_matrix_from_rows, rank_movements
+from test_history_cache import make_results
+
+
+def test_movements_from_rank_matrix():
+    nan = np.nan
+    ranks = np.array([
+        # single_employed_30k, single_employed_20k, joint_employed_80k
+        [5, 2, nan],
+        [4, 2, 3],
+        [2, 3, 3],
+        [1, 3, 1],
+    ], dtype=float)
+    movements = rank_movements(['r1', 'r2', 'r3', 'r4'],
+                               ['single_employed_30k', 'single_employed_20k', 'joint_employed_80k'], ranks)
+
+    improving = movements['scenarios']['single_employed_30k']
+    assert improving['net_change'] == 4.0 and improving['latest_change'] == 1.0
+    assert improving['streak'] == {'direction': 'improving', 'length': 3}
+    # Deltas 1, 2, 1
+    assert improving['volatility'] == round(float(np.std([1, 2, 1])), 2)
+
+    steady = movements['scenarios']['single_employed_20k']
+    assert steady['net_change'] == -1.0 and steady['streak'] == {'direction': 'stable', 'length': 1}
+    # First ranked result is in the second run
+    assert movements['scenarios']['joint_employed_80k']['net_change'] == 2.0
+
+    sole = movements['groups']['sole_employed']
+    assert sole['average_rank_by_run'] == [3.5, 3.0, 2.5, 2.0]
+    assert (sole['improving'], sole['declining'], sole['stable']) == (1, 1, 0)
+    assert list(movements['groups']) == ['sole_employed', 'joint_employed']
+
+    labels, scenario_ids, matrix = rank_matrix_from_rows([(1, 'new', 'a', 1), (2, 'old', 'a', 0), (2, 'old', 'b', 4)])
+    assert labels == ['old', 'new'] and scenario_ids == ['a', 'b']
+    assert np.isnan(matrix[0, 0]) and matrix[1, 0] == 1 and np.isnan(matrix[1, 1])
+
+
+def test_backends_agree():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        for day, (gen_h, other) in enumerate([(3000, 5000), (4500, 3500), (3800, 3900), (5000, 3000)], 10):
+            db.save_run_batch(f"full-session-{day}", make_results(gen_h, other), started_at=f"2031-01-{day} 09:00:00")
+        cache = HistoryCache()
+        cache.load(db)
+
+        for runs in (2, 3, 10):
+            memory = asyncio.run(MemoryHistoryBackend(cache).get_rank_movements(runs))
+            sqlite = asyncio.run(SQLiteHistoryBackend(db).get_rank_movements(runs))
+            assert memory == sqlite
+        assert len(memory['runs']) == 4 and memory['runs'][0] == "2031-01-10T09:00:00"
+        assert memory['groups']['joint_employed']['average_rank_by_run'] == [3.0, 1.0, 3.0, 1.0]
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING RANK MOVEMENTS")
+    print("=" * 50)
+    test_movements_from_rank_matrix()
+    print("✅ Deltas, streaks and volatility from the rank matrix")
+    test_backends_agree()
+    print("✅ Memory and SQLite backends agree")
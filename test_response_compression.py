@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test fast JSON serialization and the response compression middleware
+"""
+
+import asyncio
+import gzip
+import json
+from datetime import datetime
+
+import numpy as np
+
+import fast_json
+from fast_json import dumps_bytes, loads
+from response_compression import CompressionMiddleware, choose_encoding
+
+
+def run_app(body_chunks, accept_encoding="gzip", content_type=b"application/json"):
+    """Drive the middleware with a tiny ASGI app and collect what it sends."""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type), (b"etag", b'"abc"')]})
+        for i, chunk in enumerate(body_chunks):
+            await send({"type": "http.response.body", "body": chunk,
+                        "more_body": i < len(body_chunks) - 1})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, None, send))
+    headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    return headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_fast_json_round_trip():
+    data = {"results": {"single_employed_20k": {"lender_results": {"Gen H": 120000}}}, 1: "rank"}
+    raw = dumps_bytes(data)
+    assert b": " not in raw and b", " not in raw, "default output should be compact"
+    assert loads(raw)["1"] == "rank"
+    assert json.loads(dumps_bytes(data, indent=True)) == loads(raw)
+
+
+def test_stdlib_fallback_writes_numpy_as_numbers():
+    data = {"rank": np.int64(3), "average": np.float64(125000.5), "ranks": np.array([1, 2, 3]),
+            "grid": np.zeros((2, 2), dtype=np.int32), "flag": np.bool_(True),
+            "at": datetime(2031, 1, 15, 9, 0)}
+    orjson_available = fast_json.ORJSON_AVAILABLE
+    fast_json.ORJSON_AVAILABLE = False
+    try:
+        raw = dumps_bytes(data)
+        try:
+            dumps_bytes({"unknown": object()})
+            assert False, "unsupported types should raise"
+        except TypeError:
+            pass
+    finally:
+        fast_json.ORJSON_AVAILABLE = orjson_available
+    assert json.loads(raw) == {"rank": 3, "average": 125000.5, "ranks": [1, 2, 3], "grid": [[0, 0], [0, 0]],
+                               "flag": True, "at": "2031-01-15T09:00:00"}
+    if orjson_available:
+        assert raw == dumps_bytes(data)
+
+
+def test_large_responses_are_compressed():
+    payload = dumps_bytes({"rows": list(range(500))})
+
+    headers, body = run_app([payload])
+    assert headers["content-encoding"] == "gzip"
+    assert headers["etag"] == 'W/"abc"'
+    assert gzip.decompress(body) == payload
+
+    # Streaming bodies are compressed chunk by chunk
+    headers, body = run_app([payload[:700], payload[700:]])
+    assert "content-length" not in headers
+    assert gzip.decompress(body) == payload
+
+
+def test_small_or_unaccepted_responses_pass_through():
+    headers, body = run_app([b'{"ok":true}'])
+    assert "content-encoding" not in headers and body == b'{"ok":true}'
+
+    headers, _ = run_app([b"x" * 500], accept_encoding="identity")
+    assert "content-encoding" not in headers
+
+    assert choose_encoding("gzip;q=0, deflate") is None
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING JSON SERIALIZATION AND COMPRESSION")
+    print("=" * 50)
+    test_fast_json_round_trip()
+    print("✅ Fast JSON round trip")
+    test_stdlib_fallback_writes_numpy_as_numbers()
+    print("✅ Stdlib fallback writes numpy values as numbers")
+    test_large_responses_are_compressed()
+    print("✅ Large responses compressed")
+    test_small_or_unaccepted_responses_pass_through()
+    print("✅ Small/unaccepted responses pass through")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test streaming result exports
+"""
+
+import csv
+import io
+import json
+
+from results_export import iter_result_rows, stream_csv, stream_results_json
+from xlsx_export import stream_results_xlsx
+
+
+def sample_data():
+    return {
+        'session_id': 'full-session-test',
+        'results': {
+            'single_employed_20k': {
+                'description': 'Sole applicant, employed, £20k',
+                'lender_results': {'Gen H': 90000, 'Nationwide': 85000},
+                'statistics': {'gen_h_amount': 90000, 'average': 87500.0, 'gen_h_difference': 2500, 'gen_h_rank': 1}
+            },
+            'joint_employed_80k': {
+                'description': 'Joint applicants, employed, £80k total',
+                'lender_results': {'Gen H': 320000, 'Barclays': 340000},
+                'statistics': {'gen_h_amount': 320000, 'average': 330000.0, 'gen_h_difference': -10000, 'gen_h_rank': 2}
+            },
+        }
+    }
+
+
+def test_csv_rows_stream_in_chunks():
+    chunks = list(stream_csv(iter_result_rows(sample_data()['results']), chunk_size=64))
+    assert len(chunks) > 1, "small chunk size should split the output"
+
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert rows[0][-3:] == ['Barclays', 'Gen H', 'Nationwide']
+    assert rows[1][:3] == ['single_employed_20k', 'Sole applicant, employed, £20k', '90000']
+    assert rows[2][-3:] == ['340000', '320000', '0'], "missing lenders export as 0"
+
+
+def test_json_stream_matches_document():
+    data = sample_data()
+    exported = json.loads(b''.join(stream_results_json(data, chunk_size=16)))
+
+    assert exported['export_info']['total_scenarios'] == 2
+    assert exported['data'] == data
+
+    empty = json.loads(b''.join(stream_results_json({'results': {}})))
+    assert empty['data'] == {'results': {}}
+
+
+def test_xlsx_workbook_has_numeric_cells():
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(b''.join(stream_results_xlsx(sample_data()))))
+    assert workbook.sheetnames == ['Summary', 'Detailed Results', 'Gen H Analysis', 'Statistics']
+
+    summary = workbook['Summary']
+    assert summary['E2'].value == 90000 and summary['E2'].number_format == '£#,##0'
+    assert summary['I3'].value == -10000
+    assert workbook['Detailed Results'].max_row == 5
+    assert workbook['Statistics']['B3'].value == 1.5
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING STREAMING EXPORTS")
+    print("=" * 50)
+    test_csv_rows_stream_in_chunks()
+    print("✅ CSV streamed in chunks")
+    test_json_stream_matches_document()
+    print("✅ JSON stream matches document")
+    test_xlsx_workbook_has_numeric_cells()
+    print("✅ XLSX workbook has numeric cells")
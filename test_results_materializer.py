@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test materialized per-run results and the version-keyed cache
+"""
+
+from results_materializer import build_materialized_results, MaterializedResultsCache
+
+
+def sample_run():
+    def scenario(description, rank):
+        return {'description': description, 'lender_results': {}, 'statistics': {'gen_h_rank': rank}}
+
+    return {
+        'session_id': 'complete-session-test',
+        'results': {
+            'joint_employed_80k': scenario('Joint applicants, employed, £80k total', 3),
+            'single_employed_40k_credit': scenario('Sole applicant, employed, £40k, with credit commitments', 1),
+            'single_employed_100k': scenario('Sole applicant, employed, £100k', 2),
+            'single_employed_20k': scenario('Sole applicant, employed, £20k', 1),
+        }
+    }
+
+
+def test_grouping_and_income_order():
+    """Scenarios land in their dashboard group, sorted by income within it."""
+    document = build_materialized_results(sample_run())
+    grouped = document['grouped_results']
+
+    assert list(grouped['sole_employed']) == ['single_employed_20k', 'single_employed_100k']
+    assert list(grouped['joint_employed']) == ['joint_employed_80k']
+    assert list(grouped['sole_employed_credit']) == ['single_employed_40k_credit']
+    assert document['session_id'] == 'complete-session-test'
+
+
+def test_summary_statistics():
+    stats = build_materialized_results(sample_run())['summary_statistics']
+
+    assert stats['scenarios_with_ranks'] == 4
+    assert stats['average_gen_h_rank'] == 1.75
+    assert stats['rank_percentages']['rank_1_percent'] == 50.0
+    assert stats['top_3_percent'] == 100.0
+
+
+def test_cache_is_keyed_by_version():
+    cache = MaterializedResultsCache(max_entries=2)
+    cache.put(1, {'v': 1})
+    cache.put(2, {'v': 2})
+    cache.put(3, {'v': 3})
+
+    assert cache.get(1) is None, "oldest version should have been evicted"
+    assert cache.get(3) == {'v': 3}
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING MATERIALIZED RESULTS")
+    print("=" * 50)
+    test_grouping_and_income_order()
+    print("✅ Grouping and income order")
+    test_summary_statistics()
+    print("✅ Summary statistics")
+    test_cache_is_keyed_by_version()
+    print("✅ Version-keyed cache")
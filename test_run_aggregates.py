@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test the online run aggregates against the batch statistics they replace
+"""
+
+import random
+
+import numpy as np
+
+from results_materializer import build_materialized_results, summarize_gen_h_ranks
+from run_aggregates import RunAggregates, RunningStats
+from statistics_engine import ResultsArray, lender_summary, scenario_statistics
+
+
+def make_results(seed=7):
+    rng = random.Random(seed)
+    results = {}
+    for applicants in ("single", "joint"):
+        for income in range(20, 110, 10):
+            scenario_id = f"{applicants}_employed_{income}k"
+            lenders = {name: rng.choice([0, rng.randint(50, 90) * 5000, 300000])
+                       for name in ("Gen H", "Accord", "Nationwide", "Halifax", "Skipton")}
+            results[scenario_id] = {'lender_results': lenders, 'statistics': scenario_statistics(lenders)}
+    return results
+
+
+def test_running_stats_match_numpy():
+    values = [random.Random(1).uniform(-5, 5) for _ in range(500)]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    assert abs(stats.mean - np.mean(values)) < 1e-9
+    assert abs(stats.std - np.std(values)) < 1e-9
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+
+def test_aggregates_match_batch_statistics():
+    results = make_results()
+    aggregates = RunAggregates()
+    for scenario_id, scenario_data in results.items():
+        aggregates.add_scenario(scenario_id, scenario_data['lender_results'], scenario_data['statistics'])
+
+    assert aggregates.summary_statistics() == summarize_gen_h_ranks(results)
+    assert aggregates.lender_statistics() == lender_summary(ResultsArray.from_results(results))
+    assert aggregates.snapshot()['group_statistics']['sole_employed']['scenarios'] == 9
+
+    document = build_materialized_results({'results': results}, aggregates)
+    assert document['summary_statistics'] == build_materialized_results({'results': results})['summary_statistics']
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING RUN AGGREGATES")
+    print("=" * 50)
+    test_running_stats_match_numpy()
+    print("✅ Running mean/variance match NumPy")
+    test_aggregates_match_batch_statistics()
+    print("✅ Online aggregates match batch statistics")
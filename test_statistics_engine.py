@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test the vectorized lender statistics engine
+"""
+
+import warnings
+
+import numpy as np
+
+from statistics_engine import (ResultsArray, compute_statistics, competition_ranks, rank_summary,
+                               results_lender_ranks, results_statistics, scenario_statistics)
+
+
+def test_tie_aware_ranks_and_missing_lenders():
+    ranks = competition_ranks(np.array([[100.0, 90.0, 90.0, np.nan, 80.0]]))
+    assert ranks.tolist() == [[1, 2, 2, 0, 4]]
+
+    stats = scenario_statistics({'Accord': 100, 'Gen H': 90, 'Barclays': 90, 'Atom': None, 'Halifax': 80})
+    assert stats['gen_h_rank'] == 2
+    assert stats['average'] == 90.0 and stats['median'] == 90.0
+    assert stats['gen_h_difference'] == 0.0
+
+    missing = scenario_statistics({'Accord': 100})
+    assert missing['gen_h_rank'] == 0 and missing['gen_h_amount'] == 0
+
+
+def test_zero_amounts_count_in_the_average():
+    stats = scenario_statistics({'Gen H': 300, 'Accord': 300, 'Atom': 0})
+    assert stats['average'] == 200.0 and stats['gen_h_rank'] == 1 and stats['gen_h_difference'] == 100.0
+
+    missing = scenario_statistics({'Accord': 300, 'Atom': 0})
+    assert missing['average'] == 150.0 and missing['gen_h_difference'] == 0 and missing['gen_h_rank'] == 0
+
+
+def test_vectorized_stats_match_numpy_reference():
+    rng = np.random.default_rng(7)
+    results = {
+        f"scenario_{s}": {'lender_results': {f"Lender {l}": int(rng.integers(50, 500)) * 1000
+                                             for l in range(12) if rng.random() > 0.2}}
+        for s in range(40)
+    }
+    array = ResultsArray.from_results(results)
+    stats = compute_statistics(array)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for key, percent in (('p25', 25), ('median', 50), ('p75', 75)):
+            assert np.allclose(stats[key], np.nanpercentile(array.amounts, percent, axis=-1), equal_nan=True)
+        assert np.allclose(stats['mean'], np.nanmean(array.amounts, axis=-1), equal_nan=True)
+
+
+def test_results_statistics_and_rank_summary():
+    results = {
+        'a': {'lender_results': {'Gen H': 300, 'Accord': 200}},
+        'b': {'lender_results': {'Gen H': 100, 'Accord': 200, 'Atom': 150}},
+    }
+    stats = results_statistics(results)
+    assert stats['a']['gen_h_rank'] == 1 and stats['b']['gen_h_rank'] == 3
+    assert stats['b']['average'] == 150.0
+    assert results_lender_ranks(results) == {'a': {'Gen H': 1, 'Accord': 2},
+                                             'b': {'Gen H': 3, 'Accord': 1, 'Atom': 2}}
+
+    summary = rank_summary([1, 3, 0, None, 2, 1])
+    assert summary['ranked'] == 4 and summary['average_rank'] == 1.75
+    assert summary['rank_counts'] == {1: 2, 2: 1, 3: 1} and summary['top_3'] == 4
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING STATISTICS ENGINE")
+    print("=" * 50)
+    test_tie_aware_ranks_and_missing_lenders()
+    print("✅ Tie-aware ranks and missing lenders")
+    test_zero_amounts_count_in_the_average()
+    print("✅ Zero amounts count in the average")
+    test_vectorized_stats_match_numpy_reference()
+    print("✅ Vectorized stats match NumPy reference")
+    test_results_statistics_and_rank_summary()
+    print("✅ Run statistics and rank summary")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test the async Supabase client against a simulated PostgREST endpoint
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from supabase_async_client import AsyncSupabaseManager
+
+LATENCY = 0.1
+
+
+async def postgrest(request: httpx.Request) -> httpx.Response:
+    """Minimal PostgREST stand-in with fixed network latency."""
+    await asyncio.sleep(LATENCY)
+    path, params = request.url.path, request.url.params
+    if path.endswith('/rpc/calculate_average_gen_h_rank'):
+        return httpx.Response(200, json=2.456)
+    if path.endswith('/rpc/get_best_performing_scenario'):
+        return httpx.Response(200, json='joint_employed_80k')
+    if path.endswith('/automation_runs') and request.headers.get('prefer') == 'count=exact':
+        return httpx.Response(200, json=[{'id': 1}], headers={'Content-Range': '0-0/12'})
+    if path.endswith('/automation_runs'):
+        return httpx.Response(200, json=[{'session_id': 'b', 'run_timestamp': '2031-01-02T09:00:00+00:00'},
+                                         {'session_id': 'a', 'run_timestamp': '2031-01-01T09:00:00+00:00'}])
+    if path.endswith('/scenario_results'):
+        rank = 1 if params['session_id'] == 'eq.b' else 3
+        return httpx.Response(200, json=[{'scenario_id': 'joint_employed_80k', 'gen_h_rank': rank}])
+    return httpx.Response(404)
+
+
+def make_manager():
+    return AsyncSupabaseManager("https://example.supabase.co", "anon-key",
+                                transport=httpx.MockTransport(postgrest))
+
+
+def test_reads_overlap_on_one_pool():
+    async def run():
+        manager = make_manager()
+        started = time.perf_counter()
+        summary, changes, rank = await asyncio.gather(
+            manager.get_historical_summary(),
+            manager.get_scenario_rank_changes(),
+            manager.get_gen_h_rank_over_time(limit=5),
+        )
+        elapsed = time.perf_counter() - started
+        await manager.aclose()
+        return summary, changes, rank, elapsed
+
+    summary, changes, rank, elapsed = asyncio.run(run())
+    assert summary == {'total_runs': 12, 'average_gen_h_rank': 2.46,
+                       'best_performing_scenario': 'joint_employed_80k',
+                       'last_run': '2031-01-02T09:00:00+00:00'}
+    assert changes == {'joint_employed': 2.0}
+    assert len(rank) == 2
+    # Eight round-trips; the longest dependency chain is two, so well under eight latencies
+    assert elapsed < LATENCY * 4, f"requests were serialised: {elapsed:.2f}s"
+
+
+def test_summary_is_one_cached_round_trip():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        if request.url.path.endswith('/rpc/get_historical_summary'):
+            return httpx.Response(200, json={'total_runs': 3, 'average_gen_h_rank': 1.5,
+                                             'best_performing_scenario': 'single_employed_30k',
+                                             'last_run': '2031-01-02T09:00:00+00:00'})
+        return httpx.Response(201)
+
+    async def run():
+        manager = AsyncSupabaseManager("https://example.supabase.co", "anon-key",
+                                       transport=httpx.MockTransport(handler))
+        first = await manager.get_historical_summary()
+        second = await manager.get_historical_summary()
+        # Saving a run invalidates the cached summary
+        await manager.upsert_records('automation_runs', [{'session_id': 'c'}], 'session_id')
+        await manager.get_historical_summary()
+        await manager.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second and first['total_runs'] == 3
+    assert calls == ['/rest/v1/rpc/get_historical_summary', '/rest/v1/automation_runs',
+                     '/rest/v1/rpc/get_historical_summary']
+
+
+def test_bulk_reader_pages_past_the_row_cap():
+    table = [{'id': row_id, 'session_id': f's{row_id // 64}', 'scenario_id': f'x{row_id}',
+              'lender_results_json': '{}'} for row_id in range(5, 7500, 3)]
+    max_rows, in_flight, peak, empty = 300, [0], [0], [0]
+
+    async def handler(request):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.001)
+        rows = table
+        for value in request.url.params.get_list('id'):
+            op, bound = value.split('.')
+            rows = [row for row in rows if (row['id'] > int(bound) if op == 'gt' else row['id'] < int(bound))]
+        if request.url.params['order'] == 'id.desc':
+            rows = rows[::-1]
+        columns = request.url.params['select'].split(',')
+        limit = min(int(request.url.params['limit']), max_rows)
+        in_flight[0] -= 1
+        empty[0] += not rows[:limit]
+        return httpx.Response(200, json=[{column: row[column] for column in columns} for row in rows[:limit]])
+
+    async def run():
+        manager = AsyncSupabaseManager("https://example.supabase.co", "anon-key",
+                                       transport=httpx.MockTransport(handler), max_rows=max_rows)
+        pages = [page async for page in manager.iter_pages('scenario_results', ('session_id', 'scenario_id'),
+                                                           page_size=1000, concurrency=3)]
+        await manager.aclose()
+        return pages
+
+    pages = asyncio.run(run())
+    rows = [row for page in pages for row in page]
+    assert [row['id'] for row in rows] == [row['id'] for row in table]
+    assert 'lender_results_json' not in rows[0]
+    assert peak[0] <= 3
+    # Sparse ids: every range stops on its short last page instead of asking again
+    assert empty[0] == 0
+
+
+def test_rank_over_time_is_the_latest_runs_oldest_first():
+    runs = [{'run_timestamp': f'2031-01-{day:02d}T09:00:00+00:00', 'average_gen_h_rank': day,
+             'run_type': 'full'} for day in range(1, 31)]
+
+    async def handler(request):
+        rows = runs[::-1] if request.url.params['order'] == 'run_timestamp.desc' else runs
+        return httpx.Response(200, json=rows[:int(request.url.params['limit'])])
+
+    async def run():
+        manager = AsyncSupabaseManager("https://example.supabase.co", "anon-key",
+                                       transport=httpx.MockTransport(handler))
+        points = await manager.get_gen_h_rank_over_time(limit=20)
+        await manager.aclose()
+        return points
+
+    assert [point['average_gen_h_rank'] for point in asyncio.run(run())] == list(range(11, 31))
+
+
+def test_upsert_uses_merge_duplicates():
+    seen = {}
+
+    async def handler(request):
+        seen['params'] = dict(request.url.params)
+        seen['prefer'] = request.headers['prefer']
+        return httpx.Response(201)
+
+    async def run():
+        manager = AsyncSupabaseManager("https://example.supabase.co", "anon-key",
+                                       transport=httpx.MockTransport(handler))
+        count = await manager.upsert_records('scenario_results', [{'session_id': 'a'}] * 3, 'session_id,scenario_id')
+        await manager.aclose()
+        return count
+
+    assert asyncio.run(run()) == 3
+    assert seen['params'] == {'on_conflict': 'session_id,scenario_id'}
+    assert 'resolution=merge-duplicates' in seen['prefer']
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING ASYNC SUPABASE CLIENT")
+    print("=" * 50)
+    test_reads_overlap_on_one_pool()
+    print("✅ Concurrent historical reads overlap")
+    test_summary_is_one_cached_round_trip()
+    print("✅ Historical summary is one cached round-trip")
+    test_bulk_reader_pages_past_the_row_cap()
+    print("✅ Bulk reader is complete past the row cap")
+    test_rank_over_time_is_the_latest_runs_oldest_first()
+    print("✅ Rank over time charts the latest runs, oldest first")
+    test_upsert_uses_merge_duplicates()
+    print("✅ Bulk upserts are idempotent merges")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test the durable Supabase outbox: local queueing, batched upserts, retry and idempotency
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+
+import httpx
+
+from history_database import DatabaseManager
+from supabase_outbox import SupabaseOutbox
+
+
+class RecordingSupabase:
+    """Stands in for SupabaseManager.upsert_records, optionally failing or rejecting some scenarios."""
+
+    def __init__(self, fail=False, reject=()):
+        self.fail = fail
+        self.reject = set(reject)
+        self.calls = []
+
+    def is_connected(self):
+        return True
+
+    async def upsert_records(self, table, records, on_conflict):
+        if self.fail:
+            raise ConnectionError("Supabase unavailable")
+        if any(record.get('scenario_id') in self.reject for record in records):
+            request = httpx.Request('POST', f'https://example.supabase.co/rest/v1/{table}')
+            raise httpx.HTTPStatusError("400 Bad Request", request=request, response=httpx.Response(400))
+        self.calls.append((table, len(records), on_conflict))
+        return len(records)
+
+
+def make_run(scenarios=64):
+    results = {f"single_employed_{i}k": {'lender_results': {'Gen H': 1000 * i},
+                                          'statistics': {'gen_h_amount': 1000 * i, 'gen_h_rank': 1}}
+               for i in range(scenarios)}
+    return {'results': results, 'summary_statistics': {'average_gen_h_rank': 1.0}}
+
+
+def test_outbox_survives_outage_and_batches_upserts():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        revision = db.get_history_revision()
+        supabase = RecordingSupabase(fail=True)
+        outbox = SupabaseOutbox(db, supabase, batch_size=50)
+
+        assert outbox.enqueue_run("complete-session-a", "complete", 64, 64, make_run()) == 65
+        # Re-queuing the same run replaces its records instead of duplicating them
+        assert outbox.enqueue_run("complete-session-a", "complete", 64, 64, make_run()) == 65
+        assert db.outbox_stats()['pending']['scenario_results']['records'] == 64
+        assert db.get_history_revision() == revision
+
+        # Outage: nothing is lost and the retry is backed off
+        assert asyncio.run(outbox.flush_once(now=1000.0)) == 0
+        stats = db.outbox_stats()
+        assert stats['pending']['automation_runs']['max_attempts'] == 1
+        assert "unavailable" in stats['last_error']
+        assert db.due_outbox('automation_runs', 1000.0) == []
+
+        # Supabase is back but the parent row is still backing off: its scenarios,
+        # though due, must not go out before it
+        supabase.fail = False
+        assert asyncio.run(outbox.flush_once(now=1000.5)) == 0
+        assert supabase.calls == [] and len(db.due_outbox('scenario_results', 1000.5, 100)) == 64
+
+        # Recovery: parent row first, then scenarios in multi-row batches
+        assert asyncio.run(outbox.flush_once(now=2000.0)) == 65
+        assert supabase.calls == [('automation_runs', 1, 'session_id'),
+                                  ('scenario_results', 50, 'session_id,scenario_id'),
+                                  ('scenario_results', 14, 'session_id,scenario_id')]
+        assert db.outbox_stats()['pending'] == {}
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_rejected_and_exhausted_records_are_set_aside():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        supabase = RecordingSupabase(reject={"single_employed_3k"})
+        outbox = SupabaseOutbox(db, supabase, batch_size=50, max_attempts=2)
+        outbox.enqueue_run("complete-session-a", "complete", 64, 64, make_run())
+
+        # A 400 is not retried: the batch is resent row by row and only the bad record is set aside
+        assert asyncio.run(outbox.flush_once(now=1000.0)) == 64
+        stats = outbox.stats()
+        assert stats['pending'] == {} and stats['dead']['scenario_results']['records'] == 1
+        assert "400" in stats['dead']['scenario_results']['last_error']
+
+        # A parent that keeps failing is set aside after max_attempts, and stops holding its children back
+        supabase.calls.clear()
+        outbox.enqueue_run("complete-session-b", "complete", 2, 2, make_run(scenarios=2))
+        supabase.fail = True
+        assert asyncio.run(outbox.flush_once(now=2000.0)) == 0
+        assert asyncio.run(outbox.flush_once(now=3000.0)) == 0
+        stats = db.outbox_stats()
+        assert stats['dead']['automation_runs']['records'] == 1
+        assert stats['pending']['scenario_results']['max_attempts'] == 1
+        supabase.fail = False
+        assert asyncio.run(outbox.flush_once(now=4000.0)) == 2
+        assert supabase.calls == [('scenario_results', 2, 'session_id,scenario_id')]
+
+        # Re-queuing a run clears its dead records
+        outbox.enqueue_run("complete-session-b", "complete", 2, 2, make_run(scenarios=2))
+        assert 'automation_runs' not in db.outbox_stats()['dead']
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING SUPABASE OUTBOX")
+    print("=" * 50)
+    test_outbox_survives_outage_and_batches_upserts()
+    print("✅ Outbox survives outages and flushes in batches")
+    test_rejected_and_exhausted_records_are_set_aside()
+    print("✅ Rejected and exhausted records are set aside without blocking the queue")
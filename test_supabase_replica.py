@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test incremental mirroring of Supabase history into the local database
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+
+from history_backends import SQLiteHistoryBackend
+from history_database import DatabaseManager
+from supabase_replica import SupabaseReplica, parse_timestamp
+
+
+class FakeSupabase:
+    """automation_runs and scenario_results tables with the paged reader interface."""
+
+    def __init__(self):
+        self.tables = {'automation_runs': [], 'scenario_results': []}
+        self.since = []
+
+    def is_connected(self):
+        return True
+
+    def add_run(self, session_id, run_timestamp, gen_h_rank):
+        runs, scenarios = self.tables['automation_runs'], self.tables['scenario_results']
+        runs.append({'id': len(runs) + 1, 'session_id': session_id, 'run_type': 'full', 'total_scenarios': 2,
+                     'successful_scenarios': 2, 'run_timestamp': run_timestamp})
+        for scenario_id in ('single_employed_30k', 'joint_employed_80k'):
+            scenarios.append({'id': len(scenarios) + 1, 'session_id': session_id, 'scenario_id': scenario_id,
+                              'description': '', 'gen_h_amount': 150000, 'average_lender_amount': 140000,
+                              'gen_h_rank': gen_h_rank, 'gen_h_difference': 10000,
+                              'lender_results_json': '{"Gen H": 150000, "Accord": 130000}',
+                              'run_timestamp': run_timestamp})
+
+    async def _pages(self, table, since):
+        self.since.append(since)
+        rows = [row for row in self.tables[table]
+                if since is None or parse_timestamp(row['run_timestamp']) >= parse_timestamp(since)]
+        for start in range(0, len(rows), 3):
+            yield rows[start:start + 3]
+
+    def iter_automation_runs(self, since=None, **kwargs):
+        return self._pages('automation_runs', since)
+
+    def iter_scenario_results(self, include_lender_results=False, since=None, **kwargs):
+        return self._pages('scenario_results', since)
+
+
+def test_replica_mirrors_incrementally():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        supabase = FakeSupabase()
+        supabase.add_run("full-session-a", "2031-01-15T09:00:00+00:00", 3)
+        supabase.add_run("full-session-b", "2031-01-16T09:00:00+00:00", 1)
+        changes = []
+        replica = SupabaseReplica(db, supabase, interval=60, on_change=changes.append)
+        assert replica.staleness()['stale']
+
+        assert asyncio.run(replica.sync_once()) == 6
+        assert replica.high_water_mark == "2031-01-16T09:00:00+00:00"
+        assert not replica.staleness()['stale'] and changes == [["full-session-a", "full-session-b"]]
+        ranks = asyncio.run(SQLiteHistoryBackend(db).get_gen_h_rank_over_time())
+        assert [point['average_gen_h_rank'] for point in ranks] == [3.0, 1.0]
+        assert len(db.get_lender_trends("Accord")) == 4
+
+        # Nothing new: the lookback window is re-read but nothing unchanged is re-applied
+        revision = db.get_history_revision()
+        assert asyncio.run(replica.sync_once()) == 0
+        assert db.get_history_revision() == revision and len(changes) == 1
+        assert supabase.since[-1] == "2031-01-16T08:55:00+00:00"
+
+        supabase.add_run("full-session-c", "2031-01-17T09:00:00+00:00", 2)
+        assert asyncio.run(replica.sync_once()) == 3
+        summary = asyncio.run(SQLiteHistoryBackend(db).get_historical_summary())
+        assert summary['total_runs'] == 3 and summary['average_gen_h_rank'] == 2.0
+        assert db.get_replica_state()['scenario_results'][1:3] == (6, 6)
+
+        # A corrected row re-upserted under its id within the lookback window is mirrored
+        supabase.tables['scenario_results'][-1]['gen_h_rank'] = 5
+        assert asyncio.run(replica.sync_once()) == 1
+        ranks = asyncio.run(SQLiteHistoryBackend(db).get_gen_h_rank_over_time())
+        assert [point['average_gen_h_rank'] for point in ranks] == [3.0, 1.0, 3.5]
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_local_runs_coming_back_are_left_alone():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(tmp_dir, "history.db"))
+        lenders = {"Gen H": 150000, "Accord": 130000}
+        results = {scenario_id: {'lender_results': lenders, 'statistics': {
+            'gen_h_amount': 150000, 'average': 140000, 'gen_h_difference': 10000, 'gen_h_rank': 2}}
+            for scenario_id in ('single_employed_30k', 'joint_employed_80k')}
+        db.save_run_batch("full-session-local", results, started_at="2031-01-15 09:00:00")
+        with db.connection() as conn:
+            conn.execute("UPDATE dim_runs SET finished_at = '2031-01-15 09:40:00'")
+        revision = db.get_history_revision()
+
+        # The outbox uploaded the run; the mirror brings the same records back
+        supabase = FakeSupabase()
+        supabase.add_run("full-session-local", "2031-01-15T09:00:05+00:00", 2)
+        changes = []
+        replica = SupabaseReplica(db, supabase, interval=60, on_change=changes.append)
+        assert asyncio.run(replica.sync_once()) == 0
+        assert db.get_history_revision() == revision and changes == []
+        with db.connection() as conn:
+            assert conn.execute("SELECT finished_at FROM dim_runs").fetchall() == [('2031-01-15 09:40:00',)]
+        db.close_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🔍 TESTING SUPABASE READ REPLICA")
+    print("=" * 50)
+    test_replica_mirrors_incrementally()
+    print("✅ Replica mirrors new and corrected Supabase rows past the high-water mark")
+    test_local_runs_coming_back_are_left_alone()
+    print("✅ Local runs mirrored back unchanged are left alone")
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Native XLSX export of automation results
+Writes the Summary, Detailed Results, Gen H Analysis and Statistics sheets
+in one pass over the results with xlsxwriter's constant-memory mode. Amounts
+are numeric cells with £ number formats rather than pre-formatted strings.
+Flat tables such as the full-history export use the same constant-memory mode.
+Usage: python3 xlsx_export.py [--input results.json] [--output file.xlsx]
+"""
+
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, Iterator
+
+from scenario_groups import income_from_description, scenario_attributes
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+    print("⚠️ xlsxwriter not available - XLSX export disabled")
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+SUMMARY_COLUMNS = ['Scenario', 'Employment Type', 'Applicant Type', 'Income', 'Gen H Amount',
+                   'Market Average', 'Gen H Rank', 'Total Lenders', 'Performance vs Average']
+DETAILED_COLUMNS = ['Scenario', 'Lender', 'Amount', 'Rank in Scenario', 'Employment Type', 'Applicant Type']
+GEN_H_COLUMNS = ['Scenario', 'Gen H Amount', 'Rank', 'Difference vs Average', 'Performance',
+                 'Employment Type', 'Income Level']
+
+
+def employment_label(scenario_id):
+    employment = scenario_attributes(scenario_id)['employment_type']
+    return {'employed': 'Employed', 'self-employed': 'Self-Employed'}.get(employment, 'Unknown')
+
+
+def applicant_label(scenario_id):
+    applicants = scenario_attributes(scenario_id)['applicants']
+    return {'single': 'Single', 'joint': 'Joint'}.get(applicants, 'Unknown')
+
+
+def performance_label(difference):
+    if difference > 0:
+        return 'Above Average'
+    if difference < 0:
+        return 'Below Average'
+    return 'At Average'
+
+
+def _add_sheet(workbook, name, columns, header_format, widths):
+    sheet = workbook.add_worksheet(name)
+    for col, (title, width) in enumerate(zip(columns, widths)):
+        sheet.set_column(col, col, width)
+        sheet.write_string(0, col, title, header_format)
+    sheet.freeze_panes(1, 0)
+    return sheet
+
+
+def _write_rank(sheet, row, col, rank):
+    if isinstance(rank, (int, float)) and rank > 0:
+        sheet.write_number(row, col, rank)
+    else:
+        sheet.write_string(row, col, 'N/A')
+
+
+def write_results_workbook(data: Dict, target) -> int:
+    """
+    Write the four-sheet results workbook to `target` (a filename or a
+    seekable binary file). Returns the number of scenarios written.
+    """
+    if not XLSXWRITER_AVAILABLE:
+        raise RuntimeError("xlsxwriter is not installed")
+
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    header = workbook.add_format({'bold': True, 'bg_color': '#E2E8F0', 'bottom': 1})
+    money = workbook.add_format({'num_format': '£#,##0'})
+    signed_money = workbook.add_format({'num_format': '+£#,##0;-£#,##0;£0'})
+    percent = workbook.add_format({'num_format': '0.0"%"'})
+
+    summary = _add_sheet(workbook, 'Summary', SUMMARY_COLUMNS, header, [45, 16, 14, 12, 15, 15, 11, 13, 22])
+    detailed = _add_sheet(workbook, 'Detailed Results', DETAILED_COLUMNS, header, [45, 22, 15, 16, 16, 14])
+    gen_h = _add_sheet(workbook, 'Gen H Analysis', GEN_H_COLUMNS, header, [45, 15, 8, 22, 15, 16, 13])
+
+    summary_row = detailed_row = gen_h_row = 1
+    ranks = []
+    rank_counts = {1: 0, 2: 0, 3: 0}
+
+    # Single pass: each scenario appends its rows to every sheet, which
+    # constant-memory mode requires (rows are flushed as soon as they're done)
+    results = data.get('results', {})
+    for scenario_id, scenario_data in results.items():
+        stats = scenario_data.get('statistics', {})
+        lenders = scenario_data.get('lender_results', {})
+        description = scenario_data.get('description', '') or scenario_id
+        employment = employment_label(scenario_id)
+        applicant = applicant_label(scenario_id)
+        income = income_from_description(description)
+        gen_h_amount = stats.get('gen_h_amount', 0) or 0
+        difference = stats.get('gen_h_difference', 0) or 0
+        rank = stats.get('gen_h_rank')
+
+        summary.write_string(summary_row, 0, description)
+        summary.write_string(summary_row, 1, employment)
+        summary.write_string(summary_row, 2, applicant)
+        summary.write_number(summary_row, 3, income, money)
+        summary.write_number(summary_row, 4, gen_h_amount, money)
+        summary.write_number(summary_row, 5, stats.get('average', 0) or 0, money)
+        _write_rank(summary, summary_row, 6, rank)
+        summary.write_number(summary_row, 7, len(lenders))
+        summary.write_number(summary_row, 8, difference, signed_money)
+        summary_row += 1
+
+        for lender_rank, (lender, amount) in enumerate(sorted(lenders.items(), key=lambda x: x[1], reverse=True), 1):
+            detailed.write_string(detailed_row, 0, description)
+            detailed.write_string(detailed_row, 1, lender)
+            detailed.write_number(detailed_row, 2, amount, money)
+            detailed.write_number(detailed_row, 3, lender_rank)
+            detailed.write_string(detailed_row, 4, employment)
+            detailed.write_string(detailed_row, 5, applicant)
+            detailed_row += 1
+
+        if gen_h_amount > 0:
+            gen_h.write_string(gen_h_row, 0, description)
+            gen_h.write_number(gen_h_row, 1, gen_h_amount, money)
+            _write_rank(gen_h, gen_h_row, 2, rank)
+            gen_h.write_number(gen_h_row, 3, difference, signed_money)
+            gen_h.write_string(gen_h_row, 4, performance_label(difference))
+            gen_h.write_string(gen_h_row, 5, employment)
+            gen_h.write_number(gen_h_row, 6, income, money)
+            gen_h_row += 1
+
+        if isinstance(rank, int) and rank > 0:
+            ranks.append(rank)
+            if rank in rank_counts:
+                rank_counts[rank] += 1
+
+    def share(count):
+        return round(count / len(ranks) * 100, 1) if ranks else 0
+
+    statistics = _add_sheet(workbook, 'Statistics', ['Metric', 'Value'], header, [22, 20])
+    statistics.write_string(1, 0, 'Total Scenarios')
+    statistics.write_number(1, 1, len(results))
+    statistics.write_string(2, 0, 'Average Gen H Rank')
+    if ranks:
+        statistics.write_number(2, 1, round(sum(ranks) / len(ranks), 2), workbook.add_format({'num_format': '0.00'}))
+    else:
+        statistics.write_string(2, 1, 'N/A')
+    for row, (label, count) in enumerate([('Ranked 1st (%)', rank_counts[1]), ('Ranked 2nd (%)', rank_counts[2]),
+                                          ('Ranked 3rd (%)', rank_counts[3]),
+                                          ('Top 3 Overall (%)', sum(rank_counts.values()))], 3):
+        statistics.write_string(row, 0, label)
+        statistics.write_number(row, 1, share(count), percent)
+    statistics.write_string(7, 0, 'Export Date')
+    statistics.write_datetime(7, 1, datetime.now().replace(microsecond=0),
+                              workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'}))
+
+    workbook.close()
+    return len(results)
+
+
+# Excel's row limit per sheet, header included
+XLSX_MAX_ROWS = 1048576
+
+
+def write_rows_workbook(columns, rows: Iterable, target, sheet_name: str = 'History',
+                        money_columns: Iterable[str] = ()) -> int:
+    """
+    Write a flat table to `target` in constant memory, rolling over to
+    '<sheet_name> 2', '<sheet_name> 3', ... when a sheet is full. Returns
+    the number of data rows written.
+    """
+    if not XLSXWRITER_AVAILABLE:
+        raise RuntimeError("xlsxwriter is not installed")
+
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    header = workbook.add_format({'bold': True, 'bg_color': '#E2E8F0', 'bottom': 1})
+    money = workbook.add_format({'num_format': '£#,##0'})
+    formats = [money if column in money_columns else None for column in columns]
+    widths = [max(12, len(column) + 2) for column in columns]
+
+    sheet, sheet_row, sheets, written = None, XLSX_MAX_ROWS, 0, 0
+    for row in rows:
+        if sheet_row == XLSX_MAX_ROWS:
+            sheets += 1
+            sheet = _add_sheet(workbook, sheet_name if sheets == 1 else f"{sheet_name} {sheets}",
+                               columns, header, widths)
+            sheet_row = 1
+        for col, value in enumerate(row):
+            # Typed writes skip xlsxwriter's per-cell type sniffing
+            if isinstance(value, str):
+                sheet.write_string(sheet_row, col, value)
+            elif value is not None:
+                sheet.write_number(sheet_row, col, value, formats[col])
+        sheet_row += 1
+        written += 1
+
+    if sheet is None:
+        _add_sheet(workbook, sheet_name, columns, header, widths)
+    workbook.close()
+    return written
+
+
+def _stream_workbook(write, chunk_size):
+    """Run `write(file)` against an anonymous temp file and yield the result in chunks."""
+    with tempfile.TemporaryFile() as workbook_file:
+        write(workbook_file)
+        workbook_file.seek(0)
+        while True:
+            chunk = workbook_file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_results_xlsx(data: Dict, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """The results workbook, yielded in chunks."""
+    return _stream_workbook(lambda target: write_results_workbook(data, target), chunk_size)
+
+
+def stream_rows_xlsx(columns, rows: Iterable, sheet_name: str = 'History', money_columns: Iterable[str] = (),
+                     chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """A flat-table workbook, yielded in chunks."""
+    return _stream_workbook(lambda target: write_rows_workbook(columns, rows, target, sheet_name, money_columns),
+                            chunk_size)
+
+
+def load_latest_catalogued_run():
+    """The newest catalogued run from the history database, or None."""
+    from history_database import DatabaseManager
+    from fast_json import loads
+    from results_materializer import strip_materialized_fields
+
+    db = DatabaseManager()
+    try:
+        latest = db.get_latest_run()
+        if latest is None:
+            return None
+        _, document_json = db.get_materialized_results(latest['materialized_version'])
+        return strip_materialized_fields(loads(document_json))
+    finally:
+        db.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export automation results to XLSX")
+    parser.add_argument("--input", help="results JSON file (default: latest catalogued run)")
+    parser.add_argument("--output", help="output .xlsx path (default: mbt_results_<timestamp>.xlsx)")
+    args = parser.parse_args()
+
+    if args.input:
+        from blocking_io import load_json_file
+        data = load_json_file(args.input)
+    else:
+        data = load_latest_catalogued_run()
+    if not data or not data.get('results'):
+        print("❌ No results found. Run automation first.")
+        return
+
+    output = args.output or f"mbt_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    scenarios = write_results_workbook(data, output)
+    print(f"✅ Excel exported: {output} ({scenarios} scenarios)")
+
+
+if __name__ == "__main__":
+    main()